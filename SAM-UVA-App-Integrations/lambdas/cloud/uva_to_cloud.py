@@ -1,161 +1,627 @@
+import math
 import os
-import requests
-import boto3
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from typing import NamedTuple, Optional, Union
+from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
+from uva_common import graphql, runtime
+from uva_common.cache import MISSING, TwoTierCache
+from uva_common.deadline import Deadline, DeadlineExceeded
+from uva_common.dynamodb import batch_get_items, decode_number
+from uva_common.filters import load_record_filter
+from uva_common.graphql import GraphQLError, Operation, get_graphql_client
+from uva_common.singleflight import single_flight
+from uva_common.streams import build_batch_response
+
+# Atributos de la imagen de la UVA que utiliza esta función, en el orden de los campos de UvaImage
+PROJECTED_ATTRIBUTES = ('id', 'racimoID', 'latitude', 'longitude')
+
+# Mismos patrones que FilterCriteria del mapeo de eventos (RecordFilters), aplicados de forma defensiva
+RECORD_FILTER = load_record_filter()
+
+# Índice secundario global de la tabla Organization con partición `linkage_code`
+ORGANIZATION_LINKAGE_INDEX = os.environ.get('OrganizationLinkageIndex', 'linkage_code-index')
+# Segmentos del escaneo paralelo usado cuando la tabla no tiene el índice
+ORGANIZATION_SCAN_SEGMENTS = int(os.environ.get('OrganizationScanSegments', '4'))
+# Tablas en las que ya se comprobó que el índice no existe (se conserva en contenedores calientes)
+_tables_without_linkage_index = set()
+
+# Hilos máximos para procesar en paralelo los registros de UVA distintas y enviar documentos GraphQL
+PROCESSING_CONCURRENCY = int(os.environ.get('ProcessingConcurrency', '4'))
+# Pools de hilos del contenedor, que se conservan entre invocaciones para que cada hilo reutilice
+# sus recursos de boto3 (`runtime.get_resource`/`get_table`) y las conexiones abiertas. Los
+# segmentos del escaneo tienen su propio pool porque el escaneo se lanza desde `_executor`.
+_executor = ThreadPoolExecutor(max_workers=PROCESSING_CONCURRENCY)
+_scan_executor = ThreadPoolExecutor(max_workers=ORGANIZATION_SCAN_SEGMENTS)
+
+# Modo upsert de ubicaciones: se intenta `updateLocation` sin leer antes la tabla Location y solo
+# si AppSync reporta que la ubicación no existe se recurre a `createLocation`
+LOCATION_UPSERT = os.environ.get('LocationUpsert', 'true').lower() == 'true'
+# errorType con el que AppSync reporta que la ubicación a actualizar no existe
+MISSING_ITEM_ERROR = 'DynamoDB:ConditionalCheckFailedException'
+# Distancia mínima (metros) entre la última ubicación escrita y la nueva para escribirla; los
+# desplazamientos menores se consideran ruido del GPS
+LOCATION_MIN_DISTANCE_METERS = float(os.environ.get('LocationMinDistanceMeters', '10'))
+# Radio medio de la Tierra (metros)
+EARTH_RADIUS_METERS = 6371008.8
+# Última ubicación escrita en MakeSensCloud de cada UVA, {uva_id: (latitud, longitud)}; las UVA
+# presentes tienen ubicación (se conserva en contenedores calientes)
+_known_locations = {}
+# Mutaciones que escriben la ubicación de una UVA
+LOCATION_FIELDS = ('createLocation', 'updateLocation')
+
+# Cachés de las relaciones racimo → LinkageCode y LinkageCode → organización, que casi nunca cambian.
+# Los resultados negativos (racimo sin LinkageCode, código sin organización) se cachean con un TTL corto.
+LOOKUP_CACHE_TTL = int(os.environ.get('LookupCacheTTL', '900'))
+LOOKUP_NEGATIVE_CACHE_TTL = int(os.environ.get('LookupNegativeCacheTTL', '60'))
+linkage_code_cache = TwoTierCache('racimo-linkage-code', ttl=LOOKUP_CACHE_TTL, negative_ttl=LOOKUP_NEGATIVE_CACHE_TTL)
+organization_cache = TwoTierCache('linkage-code-organization', ttl=LOOKUP_CACHE_TTL,
+                                  negative_ttl=LOOKUP_NEGATIVE_CACHE_TTL)
+# Conjunto de UVA con dispositivo ya creado en MakeSensCloud (valor True), persistido en /tmp. Un
+# acierto es probable pero no seguro (el dispositivo pudo borrarse), por eso se confirma con getDevice.
+PROVISIONED_DEVICE_TTL = int(os.environ.get('ProvisionedDeviceTTL', '86400'))
+provisioned_devices = TwoTierCache('provisioned-devices', max_entries=10000, ttl=PROVISIONED_DEVICE_TTL)
+
+
+class UvaImage(NamedTuple):
+    """Vista tipada de los atributos proyectados de una imagen (NewImage/OldImage) de la UVA."""
+    id: Optional[str]
+    racimo_id: Optional[str]
+    latitude: Optional[Union[str, int, float]]
+    longitude: Optional[Union[str, int, float]]
+
+    @property
+    def location(self):
+        """Ubicación de la UVA en el formato que esperan las mutaciones."""
+        return {'latitude': self.latitude, 'longitude': self.longitude}
+
+    @property
+    def has_location(self):
+        """True si la imagen tiene latitud y longitud."""
+        return self.latitude is not None and self.longitude is not None
+
+
+class UvaRecord(NamedTuple):
+    """Registro del stream de la UVA con sus imágenes ya proyectadas."""
+    event_name: str
+    sequence_number: Optional[str]
+    new_image: Optional[UvaImage]
+    old_image: Optional[UvaImage]
+
+
+class PendingMutation(NamedTuple):
+    """Mutación pendiente de enviar a AppSync junto al registro del stream que la originó."""
+    record: UvaRecord
+    operation: Operation
+
 
-# Inicializar el cliente de DynamoDB
-dynamodb = boto3.resource('dynamodb')
 def lambda_handler(event, context):
     racimoTable = os.environ['RACIMOTable']
     organizationTable = os.environ['OrganizationTable']
     locationTable =  os.environ['LocationTable']
     appsync_url = os.environ['AppSyncURL']
     api_key = os.environ['ApiKey']
+    # Límite de tiempo de la invocación: al agotarse se dejan de procesar registros y los
+    # pendientes se reportan para reintento
+    deadline = Deadline.from_context(context)
     
-    # Evaluar todos los eventos
-    records = event['Records']
-    for record in records:
-        # Si es un INSERT
-        if record['eventName'] == 'INSERT': 
-            process_insert_event(record, racimoTable, organizationTable, appsync_url, api_key)
-        elif record['eventName'] == 'MODIFY': 
-            process_modify_event(record, locationTable, appsync_url, api_key)
+    # Proyectar una sola vez los atributos necesarios de cada registro relevante
+    uva_records = [project_record(record) for record in event['Records'] if RECORD_FILTER(record)]
+    # Fusionar los MODIFY consecutivos de una misma UVA en su estado final
+    uva_records = coalesce_records(uva_records)
+
+    # Confirmar con una sola consulta los INSERT de UVA que probablemente ya tienen dispositivo
+    provisioned = confirm_provisioned_devices(uva_records, appsync_url, api_key, deadline)
+
+    # Leer por lotes los racimos y ubicaciones que necesita el lote antes de procesarlo
+    known_locations = prefetch_batch(uva_records, racimoTable, locationTable, provisioned, deadline)
+
+    # Evaluar todos los eventos (en paralelo entre UVA distintas), acumulando las mutaciones del lote
+    results, mutations = process_records(uva_records, racimoTable, organizationTable, locationTable,
+                                         known_locations, provisioned, deadline)
+    location_updates = {'applied': 0, 'skipped': 0}
+    for uva_record, result in zip(uva_records, results):
+        if uva_record.event_name == 'MODIFY' and isinstance(result, bool):
+            location_updates['applied' if result else 'skipped'] += 1
+    print(f"Actualizaciones de ubicación: {location_updates}")
+
+    # Enviar todas las mutaciones del lote en documentos GraphQL con alias
+    failed_mutations = execute_mutations(mutations, appsync_url, api_key, deadline)
+
+    # Registrar aciertos y fallos de las cachés (y búsquedas compartidas) para dimensionarlas
+    print(linkage_code_cache.stats(), organization_cache.stats(),
+          {'sharedLookups': get_linkage_code.flights.shared + get_organization_id.flights.shared})
+
+    # Se reintentan los registros cuyo procesamiento lanzó una excepción (incluidos los que no
+    # alcanzaron a procesarse antes del límite de tiempo) o cuya mutación falló. Un registro
+    # fusionado lleva el número de secuencia del primero de su serie, así el reintento la cubre.
+    failed_records = [
+        uva_record for uva_record, result in zip(uva_records, results) if isinstance(result, Exception)
+    ]
+    failed_records.extend(mutation.record for mutation in failed_mutations)
+    return build_batch_response(uva_record.sequence_number for uva_record in failed_records)
+
+def process_records(uva_records, racimoTable, organizationTable, locationTable, known_locations=None,
+                    provisioned=frozenset(), deadline=None):
+    """
+    Procesa los registros del lote con el pool de hilos del contenedor (`PROCESSING_CONCURRENCY`).
+
+    Los registros se particionan por UVA (`partition_by_uva`): cada partición se procesa en orden
+    en un solo hilo y las particiones de UVA distintas se procesan en paralelo, de modo que el
+    tiempo del lote lo marca la UVA más lenta y no la suma de todas. Un error inesperado en un
+    registro no detiene a los demás. Si vence `deadline`, los registros que aún no empezaron a
+    procesarse quedan con una excepción `DeadlineExceeded` para que se reporten como fallidos.
+
+    :param uva_records: Registros del lote ya proyectados.
+    :param known_locations: Existencia de ubicaciones leída por `prefetch_batch`.
+    :param provisioned: UVA con dispositivo confirmado (`confirm_provisioned_devices`).
+    :param deadline: `Deadline` de la invocación.
+    :return: Tupla (results, mutations): results tiene, por cada registro y en su orden, lo que
+             retornó `process_insert_event`/`process_modify_event` (o la excepción que lanzó);
+             mutations tiene las `PendingMutation` del lote, en orden dentro de cada UVA.
+    """
+    def process_partition(partition):
+        partition_mutations = []
+        outcomes = []
+        for index, uva_record in partition:
+            try:
+                if deadline is not None:
+                    deadline.check(f"procesar el registro {uva_record.sequence_number}")
+                if uva_record.event_name == 'INSERT':
+                    result = process_insert_event(uva_record, racimoTable, organizationTable, partition_mutations,
+                                                  provisioned, deadline)
+                elif uva_record.event_name == 'MODIFY':
+                    result = process_modify_event(uva_record, locationTable, partition_mutations, known_locations,
+                                                  deadline)
+                else:
+                    result = None
+            except Exception as e:
+                print(f"Error al procesar el registro {uva_record.sequence_number}: {e}")
+                result = e
+            outcomes.append((index, result))
+        return outcomes, partition_mutations
+
+    partitions = partition_by_uva(uva_records)
+    results = [None] * len(uva_records)
+    mutations = []
+    if not partitions:
+        return results, mutations
+
+    for outcomes, partition_mutations in _executor.map(process_partition, partitions):
+        for index, result in outcomes:
+            results[index] = result
+        mutations.extend(partition_mutations)
+    return results, mutations
+
+def partition_by_uva(uva_records):
+    """
+    Agrupa los registros por id de UVA conservando el orden del lote dentro de cada grupo.
+
+    :return: Lista de particiones (en orden de primera aparición), cada una con pares
+             (índice en el lote, registro). Los registros sin id forman una partición propia.
+    """
+    partitions = {}
+    for index, uva_record in enumerate(uva_records):
+        image = uva_record.new_image
+        key = image.id if image is not None and image.id is not None else ('record', index)
+        partitions.setdefault(key, []).append((index, uva_record))
+    return list(partitions.values())
 
 # Event ISERT
-def process_insert_event(record: dict, racimoTable: str, organizationTable: str, appsync_url: str, api_key: str):
+def process_insert_event(record: UvaRecord, racimoTable: str, organizationTable: str, mutations: list,
+                         provisioned=frozenset(), deadline=None):
     """
     Procesa un registro de tipo INSERT de DynamoDB Streams.
-    Extrae el racimoID del registro y obtiene el LinkageCode de DynamoDB.
+    Toma el racimoID de la imagen proyectada y obtiene el LinkageCode de DynamoDB.
+
+    Si la UVA se crea con coordenadas, después del dispositivo se escribe su ubicación (ver
+    `queue_location`), ya que un MODIFY posterior que no la mueva no la escribiría.
 
-    :param record: Registro individual del evento DynamoDB Streams.
+    :param record: Registro del stream ya proyectado (ver `project_record`).
     :param racimoTable: Nombre de la tabla DynamoDB.
+    :param mutations: Lista del lote a la que se agregan `createDevice` y la ubicación.
+    :param provisioned: UVA cuyo dispositivo ya existe; sus INSERT (reintentos o repeticiones
+                        del stream) se omiten sin consultar DynamoDB ni AppSync, salvo la
+                        escritura de la ubicación si no se sabe que ya existe.
+    :param deadline: `Deadline` de la invocación, que reciben las búsquedas en DynamoDB.
     :return: El LinkageCode si se encuentra, o un mensaje indicando que no se encontró racimoID.
     """
-    #Obtener el Id de la UVA del evento
-    uva_id = extract_uva_id(record)
+    image = record.new_image
+    if image is None:
+        return "El registro no contiene una NewImage."
+
+    if not image.id:
+        return "El registro no contiene el id de la UVA."
+
+    if image.id in provisioned:
+        if image.has_location and is_valid_location(image) and image.id not in _known_locations:
+            # Si la ubicación no existe, `execute_mutations` recurre a `createLocation`
+            mutations.append(PendingMutation(record, update_location(image.id, image.location)))
+        return "El dispositivo ya existe."
 
     # Obtener el ID del Racimo del evento
-    racimo_id = extract_racimo_id(record)
+    racimo_id = image.racimo_id
     if not racimo_id:
         return "No se encontró racimoID en el evento."
 
     # Obtener el código de vinculación del racimo
-    linkage_code = get_linkage_code(racimoTable, racimo_id)
+    linkage_code = get_linkage_code(racimoTable, racimo_id, deadline=deadline)
     if not linkage_code:
         return "El RACIMO no tiene un código de vinculación."
     
     # Obtener el ID de la organización asociada a la UVA 
-    organization_id = get_organization_id(organizationTable, linkage_code)
+    organization_id = get_organization_id(organizationTable, linkage_code, deadline=deadline)
+    if organization_id is None:
+        # `organizationDevicesId` es `ID!`: una variable nula invalidaría el documento con alias
+        # completo y haría fallar las mutaciones de los demás registros del lote
+        print(f"No se crea el dispositivo {image.id} del registro {record.sequence_number}: "
+              f"no hay organización con el código de vinculación {linkage_code}.")
+        return "No se encontró la organización del código de vinculación."
     # Crear un nuevo dispositivo vinculado a dicha organización
-    create_device(uva_id, organization_id, appsync_url, api_key)
+    mutations.append(PendingMutation(record, create_device(image.id, organization_id)))
+    if image.has_location and is_valid_location(image):
+        queue_location(record, mutations)
 
 # Event MODIFY
-def process_modify_event(record,locationTable, appsync_url, api_key):
-    uva_id = extract_uva_id(record)
-    location = extract_location(record)
+def process_modify_event(record: UvaRecord, locationTable, mutations: list, known_locations=None, deadline=None):
+    """
+    Procesa un registro de tipo MODIFY: crea o actualiza la ubicación de la UVA.
+
+    :param record: Registro del stream ya proyectado (ver `project_record`).
+    :param mutations: Lista del lote a la que se agrega la mutación de la ubicación.
+    :param known_locations: Resultado de la lectura por lotes (`prefetch_batch`); si la UVA no
+                            está en él se consulta la tabla Location para este registro.
+    :param deadline: `Deadline` de la invocación, que recibe esa consulta.
+
+    Las coordenadas se comparan con la última ubicación escrita (`written_location`), no con
+    `OldImage`: si no se alejaron más de `LOCATION_MIN_DISTANCE_METERS` (ver `location_changed`)
+    no se hace ninguna llamada, y un desplazamiento lento se escribe en cuanto acumula esa
+    distancia. Si no se conoce una ubicación escrita, se escribe. Ver `queue_location`.
+
+    :return: True si se agregó una mutación de ubicación, False si se omitió porque la ubicación
+             no cambió, None si el registro no trae coordenadas (o no son numéricas).
+    """
+    image = record.new_image
+    if image is None or not image.has_location or not image.id:
+        return None
+
+    if not is_valid_location(image):
+        # Las variables `Float` no numéricas invalidarían el documento con alias completo
+        print(f"Coordenadas no numéricas en el registro {record.sequence_number} ({image.id}): {image.location}")
+        return None
+
+    if not location_changed(written_location(image.id, mutations), image):
+        return False
 
-    if all(value is not None for value in location.values()):
+    queue_location(record, mutations, known_locations, locationTable, deadline)
+    return True
+
+
+def queue_location(record: UvaRecord, mutations: list, known_locations=None, locationTable=None, deadline=None):
+    """
+    Agrega al lote la escritura de la ubicación de la `NewImage` del registro.
+
+    Se envía `updateLocation` si la ubicación existe (está en `_known_locations` o el lote ya la
+    escribe) y `createLocation` si el mismo lote crea el dispositivo de la UVA. En otro caso, en
+    modo upsert (`LOCATION_UPSERT`) no se lee la tabla Location: se envía `updateLocation` y
+    `execute_mutations` recurre a `createLocation` si la ubicación no existe; sin él, se consulta
+    la existencia en `known_locations` (lectura por lotes) o en la tabla Location.
+
+    :param record: Registro del stream ya proyectado, con coordenadas válidas.
+    :param mutations: Lista de mutaciones de la UVA en el lote.
+    :param known_locations: Resultado de la lectura por lotes (`prefetch_batch`).
+    :param deadline: `Deadline` de la invocación, que recibe la consulta a la tabla Location.
+    """
+    image = record.new_image
+    queued_fields = {
+        mutation.operation.field for mutation in mutations if mutation.record.new_image.id == image.id
+    }
+    if image.id in _known_locations or queued_fields.intersection(LOCATION_FIELDS):
+        uva_created = True
+    elif 'createDevice' in queued_fields:
+        uva_created = False
+    elif LOCATION_UPSERT:
+        uva_created = True
+    else:
         # Validar si ya esta la ubicación de la UVA creada
-        uva_created = get_uva_location(uva_id, locationTable)
+        uva_created = (known_locations or {}).get(image.id)
+        if uva_created is None:
+            uva_created = get_uva_location(image.id, locationTable, deadline)
         print(uva_created)
-        if uva_created:
-            update_location(uva_id, location, appsync_url, api_key)
-        else:
-            create_location(uva_id, location, appsync_url, api_key)         
+    if uva_created:
+        mutations.append(PendingMutation(record, update_location(image.id, image.location)))
+    else:
+        mutations.append(PendingMutation(record, create_location(image.id, image.location)))
 
 # Service
-def extract_location(record):
+def coalesce_records(uva_records):
     """
-    Extrae la latitude y latitude de un registro individual de DynamoDB Streams.
-
-    :param record: Registro individual del evento de DynamoDB Streams.
-    :return: location si existe, de lo contrario None.
+    Agrupa el lote por UVA y fusiona los MODIFY sucesivos de una misma UVA en uno solo con el
+    estado final, para no enviar a MakeSensCloud las ubicaciones intermedias.
+
+    El registro fusionado conserva la posición, el número de secuencia y la `OldImage` del
+    primer MODIFY de la serie (el estado previo al lote) y toma la `NewImage` del último. Un
+    INSERT seguido de varios MODIFY queda en el INSERT más un único MODIFY, que
+    `process_modify_event` compara con la ubicación que escribe el INSERT (o, si no trae
+    coordenadas, escribe como primera ubicación), no con la `OldImage`: a lo sumo hay una
+    escritura de ubicación por cada posición distinta. Los demás registros se conservan sin cambios.
+
+    :param uva_records: Registros del lote ya proyectados, en orden.
+    :return: Lista de registros fusionados, en orden.
+    """
+    coalesced = []
+    # Posición en `coalesced` del último registro de cada UVA
+    last_position = {}
+    for uva_record in uva_records:
+        image = uva_record.new_image
+        uva_id = image.id if image is not None else None
+        if uva_id is None:
+            coalesced.append(uva_record)
+            continue
+
+        position = last_position.get(uva_id)
+        if uva_record.event_name == 'MODIFY' and position is not None \
+                and coalesced[position].event_name == 'MODIFY':
+            coalesced[position] = coalesced[position]._replace(new_image=image)
+            continue
+        last_position[uva_id] = len(coalesced)
+        coalesced.append(uva_record)
+
+    if len(coalesced) < len(uva_records):
+        print(f"Registros fusionados: {len(uva_records)} -> {len(coalesced)}")
+    return coalesced
+
+def location_changed(written, new_image):
     """
+    Indica si la ubicación de la UVA se alejó lo suficiente de la última escrita para escribirla.
+
+    :param written: Coordenadas (latitud, longitud) de la última ubicación escrita, o None si no
+                    se conoce.
+    :param new_image: Imagen nueva proyectada, con coordenadas.
+    :return: False si las coordenadas son iguales a las escritas o están a menos de
+             `LOCATION_MIN_DISTANCE_METERS`; True en otro caso (incluidas coordenadas no numéricas
+             o una ubicación escrita desconocida).
+    """
+    if written is None:
+        return True
     try:
-        location = {}
-        if 'NewImage' in record['dynamodb']:
-            location['latitude'] = record['dynamodb']['NewImage'].get('latitude', {}).get('S')
-            location['longitude'] = record['dynamodb']['NewImage'].get('longitude', {}).get('S')
-        return location
-    except KeyError as e:
-        print(f"Clave faltante en el registro: {e}")
-        return None
+        new_point = location_point(new_image)
+    except (TypeError, ValueError):
+        return True
+    if written == new_point:
+        return False
+    return haversine_distance(*written, *new_point) >= LOCATION_MIN_DISTANCE_METERS
 
-def extract_uva_id(record):
+
+def written_location(uva_id, mutations):
     """
-    Extrae el uva_id de un registro individual de DynamoDB Streams.
+    Coordenadas de la última ubicación escrita de la UVA: las de la última escritura ya agregada
+    al lote (por ejemplo, la del INSERT con coordenadas) o, si no hay, las de `_known_locations`.
 
-    :param record: Registro individual del evento de DynamoDB Streams.
-    :return: Valor del uvaID si está presente, de lo contrario None.
+    :param mutations: Lista de mutaciones de la UVA en el lote.
+    :return: Tupla (latitud, longitud), o None si no se conoce una ubicación escrita.
+    """
+    for mutation in reversed(mutations):
+        if mutation.record.new_image.id == uva_id and mutation.operation.field in LOCATION_FIELDS:
+            return location_point(mutation.record.new_image)
+    return _known_locations.get(uva_id)
+
+
+def location_point(image):
+    """Coordenadas (latitud, longitud) de la imagen como números."""
+    return float(image.latitude), float(image.longitude)
+
+
+def is_valid_location(image):
+    """
+    Indica si la latitud y la longitud de la imagen son números finitos (como texto o número),
+    valores que aceptan las variables `Float` de las mutaciones de ubicación.
     """
     try:
-        # Validar que sea un evento con NewImage (INSERT o MODIFY típicamente)
-        if 'NewImage' in record['dynamodb']:
-            # Extraer el racimoID si está presente
-            racimo_id = record['dynamodb']['NewImage'].get('id', {}).get('S')
-            return racimo_id
+        return all(math.isfinite(float(value)) for value in (image.latitude, image.longitude))
+    except (TypeError, ValueError):
+        return False
+
+
+def haversine_distance(latitude1, longitude1, latitude2, longitude2):
+    """
+    Distancia sobre la superficie terrestre (fórmula del haversine) entre dos puntos.
+
+    :return: Distancia en metros.
+    """
+    phi1 = math.radians(latitude1)
+    phi2 = math.radians(latitude2)
+    delta_phi = phi2 - phi1
+    delta_lambda = math.radians(longitude2 - longitude1)
+    a = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(min(1.0, a)))
+
+
+def confirm_provisioned_devices(uva_records, appsync_url, api_key, deadline=None):
+    """
+    Confirma qué UVA de los INSERT del lote ya tienen dispositivo en MakeSensCloud.
+
+    Solo se consultan las UVA que `provisioned_devices` marca como probablemente creadas, con un
+    único documento `getDevice` con alias para todo el lote. Las que no existen se quitan del
+    conjunto; si la consulta falla, ninguna se considera confirmada y el INSERT sigue su curso.
+
+    :param uva_records: Registros del lote ya proyectados.
+    :param deadline: `Deadline` de la invocación.
+    :return: frozenset con los ids de las UVA cuyo dispositivo existe.
+    """
+    candidates = list(dict.fromkeys(
+        uva_record.new_image.id
+        for uva_record in uva_records
+        if uva_record.event_name == 'INSERT' and uva_record.new_image is not None
+        and uva_record.new_image.id is not None and provisioned_devices.peek(uva_record.new_image.id) is True
+    ))
+    if not candidates:
+        return frozenset()
+
+    operations = [Operation('getDevice', {'id': ('ID!', uva_id)}, input_object=False) for uva_id in candidates]
+    results = get_graphql_client(appsync_url, api_key).execute_batch(operations, kind='query', deadline=deadline)
+
+    confirmed = set()
+    for uva_id, result in zip(candidates, results):
+        if isinstance(result, GraphQLError):
+            print(f"No se pudo confirmar el dispositivo {uva_id}: {result}")
+        elif result is None:
+            # El dispositivo ya no existe: volver a crearlo
+            provisioned_devices.set(uva_id, None)
         else:
-            print("El registro no contiene una NewImage.")
-            return None
-    except KeyError as e:
-        # Manejar cualquier excepción de clave faltante
-        print(f"Clave faltante en el registro: {e}")
-        return None
-    
-def extract_racimo_id(record):
+            confirmed.add(uva_id)
+    if confirmed:
+        print(f"INSERT omitidos de dispositivos ya creados: {sorted(confirmed)}")
+    return frozenset(confirmed)
+
+def prefetch_batch(uva_records, racimoTable, locationTable, provisioned=frozenset(), deadline=None):
     """
-    Extrae el racimoID de un registro individual de DynamoDB Streams.
+    Fase de planificación del lote: reúne los racimoID de los INSERT (que no estén ya en
+    `linkage_code_cache`) y las claves `A{uva_id}` de los MODIFY con coordenadas, y los lee con
+    `BatchGetItem` en lugar de un `GetItem` por registro.
+
+    Los LinkageCode leídos (y los racimos inexistentes o sin código) quedan en `linkage_code_cache`,
+    donde los encuentra `get_linkage_code`. Las claves que no se pudieron leer se omiten y cada
+    registro las consulta individualmente.
+
+    :param uva_records: Registros del lote ya proyectados.
+    :param provisioned: UVA con dispositivo confirmado, cuyos racimos no se leen.
+    :param deadline: `Deadline` de la invocación.
+    :return: dict {uva_id: bool} con la existencia de la ubicación de cada UVA leída.
+    """
+    racimo_ids = []
+    uva_ids = []
+    for uva_record in uva_records:
+        image = uva_record.new_image
+        if image is None:
+            continue
+        if uva_record.event_name == 'INSERT' and image.racimo_id and image.id not in provisioned \
+                and linkage_code_cache.peek(f"{racimoTable}/{image.racimo_id}") is MISSING:
+            racimo_ids.append(image.racimo_id)
+        elif uva_record.event_name == 'MODIFY' and image.has_location and not LOCATION_UPSERT \
+                and image.id not in _known_locations:
+            uva_ids.append(image.id)
+
+    if not racimo_ids and not uva_ids:
+        return {}
+
+    keys_by_table = {}
+    if racimo_ids:
+        keys_by_table[racimoTable] = racimo_ids
+    if uva_ids:
+        keys_by_table[locationTable] = [f"A{uva_id}" for uva_id in uva_ids]
+    found, missing = batch_get_items(
+        keys_by_table,
+        projections={racimoTable: ['LinkageCode'], locationTable: ['latitude']},
+        deadline=deadline
+    )
+
+    for racimo_id, item in found.get(racimoTable, {}).items():
+        linkage_code_cache.set(f"{racimoTable}/{racimo_id}", item.get('LinkageCode'))
+    for racimo_id in missing.get(racimoTable, ()):
+        linkage_code_cache.set(f"{racimoTable}/{racimo_id}", None)
+
+    known_locations = {}
+    for location_id, item in found.get(locationTable, {}).items():
+        known_locations[location_id[1:]] = 'latitude' in item
+    for location_id in missing.get(locationTable, ()):
+        known_locations[location_id[1:]] = False
+    return known_locations
+
+def project_record(record):
+    """
+    Proyecta un registro individual de DynamoDB Streams a una vista tipada.
+
+    Extrae una sola vez, de `NewImage` y `OldImage`, únicamente los atributos declarados en
+    `PROJECTED_ATTRIBUTES`; el resto de atributos de la imagen no se decodifica.
 
     :param record: Registro individual del evento de DynamoDB Streams.
-    :return: Valor del racimoID si está presente, de lo contrario None.
+    :return: UvaRecord con el tipo de evento, el número de secuencia y las imágenes proyectadas
+             (None si el registro no trae esa imagen).
     """
-    try:
-        # Validar que sea un evento con NewImage (INSERT o MODIFY típicamente)
-        if 'NewImage' in record['dynamodb']:
-            # Extraer el racimoID si está presente
-            racimo_id = record['dynamodb']['NewImage'].get('racimoID', {}).get('S')
-            return racimo_id
-        else:
-            print("El registro no contiene una NewImage.")
-            return None
-    except KeyError as e:
-        # Manejar cualquier excepción de clave faltante
-        print(f"Clave faltante en el registro: {e}")
+    stream_data = record.get('dynamodb', {})
+    return UvaRecord(
+        event_name=record.get('eventName'),
+        sequence_number=stream_data.get('SequenceNumber'),
+        new_image=project_image(stream_data.get('NewImage')),
+        old_image=project_image(stream_data.get('OldImage'))
+    )
+
+def project_image(image):
+    """
+    Decodifica solo los atributos de `PROJECTED_ATTRIBUTES` de una imagen de DynamoDB.
+
+    :param image: Imagen de DynamoDB (dict de atributos tipados) o None.
+    :return: UvaImage con los valores decodificados (None para atributos ausentes), o None si no hay imagen.
+    """
+    if image is None:
         return None
+    return UvaImage._make(decode_scalar(image.get(name)) for name in PROJECTED_ATTRIBUTES)
+
+def decode_scalar(attribute):
+    """
+    Decodifica un atributo escalar de DynamoDB (S, N o NULL).
 
-def get_linkage_code(table_name, racimo_id):
+    :param attribute: Atributo tipado, por ejemplo {"S": "uva123"}, o None si no existe.
+    :return: str para S, int o float para N, None para NULL, atributos ausentes o tipos no escalares.
+    """
+    if not attribute:
+        return None
+    (data_type, data_value), = attribute.items()
+    if data_type == 'S':
+        return data_value
+    if data_type == 'N':
+        return decode_number(data_value)
+    return None
+
+@single_flight
+def get_linkage_code(table_name, racimo_id, deadline=None):
     """
     Consulta DynamoDB para obtener el código de vinculación (LinkageCode) de un racimo por su ID.
 
+    El resultado (incluido "sin LinkageCode") se guarda en `linkage_code_cache`; los errores de
+    DynamoDB no se cachean. Las llamadas concurrentes con el mismo racimo comparten una sola
+    consulta (`single_flight`).
+
     :param table_name: Nombre de la tabla DynamoDB.
     :param racimo_id: ID del racimo a consultar.
+    :param deadline: `Deadline` de la invocación; si ya venció no se consulta DynamoDB.
     :return: Código de vinculación (LinkageCode) o None si no existe.
+    :raises ClientError: Si la lectura falla; el registro se reporta para reintento en lugar de
+                         tratarse como un racimo sin LinkageCode.
+    :raises DeadlineExceeded: Si no queda tiempo para la consulta.
     """
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(table_name)
-
-    try:
-        # Obtener el elemento por su clave primaria
-        response = table.get_item(
-            Key={
-                'id': racimo_id  # Clave primaria
-            }
-        )
-
-        # Retornar el código de vinculación si el elemento existe
-        return response['Item'].get('LinkageCode') if 'Item' in response else None
+    cache_key = f"{table_name}/{racimo_id}"
+    linkage_code = linkage_code_cache.get(cache_key)
+    if linkage_code is not MISSING:
+        return linkage_code
+
+    if deadline is not None:
+        deadline.check(f"leer el racimo {racimo_id}")
+    table = runtime.get_table(table_name)
+
+    # Obtener el elemento por su clave primaria
+    response = table.get_item(
+        Key={
+            'id': racimo_id  # Clave primaria
+        }
+    )
 
-    except ClientError:
-        # En caso de error, retornar None
-        return None
+    # Retornar el código de vinculación si el elemento existe
+    linkage_code = response['Item'].get('LinkageCode') if 'Item' in response else None
+    linkage_code_cache.set(cache_key, linkage_code)
+    return linkage_code
 
-def get_organization_id(table_name, linkage_code):
+@single_flight
+def get_organization_id(table_name, linkage_code, deadline=None):
     """
     Obtiene el ID de una organización desde una tabla DynamoDB utilizando el valor de `linkage_code`.
 
-    Esta función realiza una operación de escaneo en la tabla DynamoDB, buscando registros que coincidan con el valor
-    proporcionado de `linkage_code`. Si encuentra al menos un registro que cumpla con la condición, retorna el `id`
-    del primer registro encontrado. Si no encuentra registros o hay un error en el proceso, retorna `None`.
+    La búsqueda se hace con un `Query` sobre el índice secundario global `ORGANIZATION_LINKAGE_INDEX`
+    (partición `linkage_code`), que solo lee los elementos que coinciden. Si la tabla no tiene ese
+    índice, se recurre a un escaneo paralelo paginado (`scan_organization_id`) y se recuerda que el
+    índice no existe para no volver a intentarlo en las invocaciones siguientes del contenedor.
 
     :param table_name: str
         El nombre de la tabla DynamoDB donde se realizará la búsqueda. Esta tabla debe contener un atributo `linkage_code`.
@@ -163,202 +629,300 @@ def get_organization_id(table_name, linkage_code):
     :param linkage_code: str
         El valor del `linkage_code` que se usará para filtrar los registros de la tabla.
 
+    :param deadline: Deadline | None
+        Límite de tiempo de la invocación: no se inician consultas ni páginas del escaneo después de él.
+
     :return: str | None
         Retorna el valor de `id` del primer registro encontrado que coincida con el `linkage_code`, o `None` si no
-        se encontró ningún registro o si ocurrió un error en la operación de DynamoDB.
+        se encontró ningún registro.
+
+    :raises: ClientError
+        Si falla la consulta a DynamoDB; el registro se reporta para reintento en lugar de tratarse
+        como un código sin organización.
+
+    :raises: DeadlineExceeded
+        Si se agota el tiempo antes de terminar la búsqueda (el resultado no se cachea).
 
-    :raises: Exception
-        En caso de que ocurra un error al interactuar con DynamoDB, la función captura la excepción y la imprime.
+    El resultado (incluido "sin organización") se guarda en `organization_cache`; los errores de
+    DynamoDB no se cachean. Las llamadas concurrentes con el mismo código comparten una sola
+    búsqueda (`single_flight`).
     """
-    # Crear un cliente de DynamoDB
-    dynamodb = boto3.resource('dynamodb')
-    # Obtener la tabla específica
-    table = dynamodb.Table(table_name)
+    cache_key = f"{table_name}/{linkage_code}"
+    organization_id = organization_cache.get(cache_key)
+    if organization_id is not MISSING:
+        return organization_id
+
+    organization_id = None
+    if table_name not in _tables_without_linkage_index:
+        if deadline is not None:
+            deadline.check(f"buscar la organización de {linkage_code}")
+        try:
+            organization_id = query_organization_id(table_name, linkage_code)
+        except ClientError as e:
+            if not is_missing_index_error(e):
+                raise
+            print(f"La tabla {table_name} no tiene el índice {ORGANIZATION_LINKAGE_INDEX}, se usará un escaneo.")
+            _tables_without_linkage_index.add(table_name)
+
+    if table_name in _tables_without_linkage_index:
+        organization_id = scan_organization_id(table_name, linkage_code, deadline=deadline)
+
+    if organization_id is None:
+        print("No se encontró ningún elemento con el linkage_code proporcionado.")
+    organization_cache.set(cache_key, organization_id)
+    return organization_id
+
+def query_organization_id(table_name, linkage_code):
+    """
+    Busca la organización con un `Query` sobre el índice de `linkage_code`.
 
-    try:
-        # Realizar un escaneo para buscar elementos con el `linkage_code` proporcionado
-        response = table.scan(
-            FilterExpression="linkage_code = :value",  # Filtrar registros por `linkage_code`
-            ExpressionAttributeValues={":value": linkage_code}  # Asignar el valor de `linkage_code`
-        )
-        
-        # Obtener la lista de elementos que coinciden con el filtro
-        items = response.get("Items", [])
-        
-        # Si se encontraron elementos, retornar el id del primer elemento
-        if items:
-            return items[0]['id']
-        else:
-            # Si no se encontraron elementos, imprimir un mensaje y retornar None
-            print("No se encontró ningún elemento con el linkage_code proporcionado.")
-            return None
-    except Exception as e:
-        # Si ocurrió un error al interactuar con DynamoDB, imprimir el error y retornar None
-        print(f"Error al buscar en DynamoDB: {e}")
-        return None
+    :return: `id` de la organización o None si no hay coincidencias.
+    :raises ClientError: Si la consulta falla (incluido el caso de índice inexistente).
+    """
+    response = runtime.get_table(table_name).query(
+        IndexName=ORGANIZATION_LINKAGE_INDEX,
+        KeyConditionExpression=Key('linkage_code').eq(linkage_code),
+        ProjectionExpression='#id',
+        ExpressionAttributeNames={'#id': 'id'},
+        Limit=1
+    )
+    items = response.get('Items', [])
+    return items[0]['id'] if items else None
 
-def get_uva_location(uva_id,table_name):
+def scan_organization_id(table_name, linkage_code, total_segments=None, deadline=None):
     """
-    Consulta DynamoDB para obtener el código de vinculación (LinkageCode) de un racimo por su ID.
+    Respaldo cuando no existe el índice: escaneo paralelo de la tabla Organization.
+
+    Cada segmento recorre todas sus páginas (siguiendo `LastEvaluatedKey`) y todos los segmentos
+    se detienen en cuanto alguno encuentra una coincidencia. Si vence `deadline`, los segmentos
+    no piden más páginas y la espera termina con `DeadlineExceeded`: un escaneo incompleto no
+    equivale a "sin organización".
 
     :param table_name: Nombre de la tabla DynamoDB.
-    :param racimo_id: ID del racimo a consultar.
-    :return: Código de vinculación (LinkageCode) o None si no existe.
+    :param linkage_code: Código de vinculación buscado.
+    :param total_segments: Número de segmentos (por defecto `ORGANIZATION_SCAN_SEGMENTS`).
+    :param deadline: `Deadline` de la invocación.
+    :return: `id` de la organización o None si no hay coincidencias.
+    :raises DeadlineExceeded: Si el tiempo se agota antes de recorrer todos los segmentos.
     """
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(table_name)
-  
-    try:
-        # Obtener el elemento por su clave primaria
-        response = table.get_item(
-            Key={
-                'id': f"A{uva_id}"  # Clave primaria
-            }
-        )
-        # Retornar el código de vinculación si el elemento existe
-        return 'latitude' in response.get('Item', {})
-    except ClientError:
-        # En caso de error, retornar None
+    total_segments = total_segments or ORGANIZATION_SCAN_SEGMENTS
+    # Se activa al encontrar una coincidencia o al dejar de esperar, y detiene los segmentos
+    found = threading.Event()
+
+    def scan_segment(segment):
+        # Cada hilo usa su propio recurso de DynamoDB
+        table = runtime.get_table(table_name)
+        scan_kwargs = {
+            'FilterExpression': Attr('linkage_code').eq(linkage_code),
+            'ProjectionExpression': '#id',
+            'ExpressionAttributeNames': {'#id': 'id'},
+            'Segment': segment,
+            'TotalSegments': total_segments
+        }
+        while not found.is_set():
+            if deadline is not None:
+                deadline.check(f"escanear el segmento {segment} de {table_name}")
+            response = table.scan(**scan_kwargs)
+            items = response.get('Items', [])
+            if items:
+                found.set()
+                return items[0]['id']
+            if 'LastEvaluatedKey' not in response:
+                return None
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
         return None
 
+    futures = [_scan_executor.submit(scan_segment, segment) for segment in range(total_segments)]
+    try:
+        for future in as_completed(futures, timeout=None if deadline is None else deadline.remaining()):
+            organization_id = future.result()
+            if organization_id is not None:
+                return organization_id
+    except FutureTimeoutError:
+        raise DeadlineExceeded(f"Tiempo agotado al escanear {table_name}") from None
+    finally:
+        found.set()
+    return None
+
+def is_missing_index_error(error):
+    """
+    True si el ClientError indica que la tabla no tiene el índice solicitado
+    (DynamoDB responde ValidationException; algunos emuladores locales, ResourceNotFoundException).
+    """
+    details = error.response.get('Error', {})
+    return details.get('Code') in ('ValidationException', 'ResourceNotFoundException') \
+        and 'index' in details.get('Message', '').lower()
+
+def get_uva_location(uva_id,table_name, deadline=None):
+    """
+    Consulta DynamoDB para saber si la ubicación `A{uva_id}` de una UVA ya existe.
+
+    :param uva_id: ID de la UVA.
+    :param table_name: Nombre de la tabla Location.
+    :param deadline: `Deadline` de la invocación; si ya venció no se consulta DynamoDB.
+    :return: True si la ubicación existe (tiene latitud), False si no.
+    :raises ClientError: Si la lectura falla; el registro se reporta para reintento en lugar de
+                         enviar `createLocation` para una ubicación que puede existir.
+    :raises DeadlineExceeded: Si no queda tiempo para la consulta.
+    """
+    if deadline is not None:
+        deadline.check(f"leer la ubicación de {uva_id}")
+    table = runtime.get_table(table_name)
+
+    # Obtener el elemento por su clave primaria
+    response = table.get_item(
+        Key={
+            'id': f"A{uva_id}"  # Clave primaria
+        }
+    )
+    return 'latitude' in response.get('Item', {})
+
     
 # mutations
 
-def create_device(uva_id, organization_id, appsync_url, api_key):
+def execute_mutations(mutations, appsync_url, api_key, deadline=None):
     """
-    Crea un dispositivo en el sistema mediante una mutación GraphQL.
+    Envía las mutaciones del lote a AppSync en documentos GraphQL con alias.
 
-    Args:
-        uva_id (str): Identificador único del dispositivo a crear. Este valor se usará para el ID, descripción y nombre del dispositivo.
-        organization_id (str): Identificador único de la organización a la que pertenece el dispositivo.
+    Cada documento lleva a lo sumo `GraphQLMaxBatchOperations` mutaciones, que AppSync ejecuta en
+    orden (un `createDevice` precede a la ubicación de la misma UVA). Los errores se asignan a la
+    mutación que los produjo y se reportan con el número de secuencia de su registro.
 
-    Raises:
-        ValueError: Si la respuesta de la API no tiene éxito.
-    """   
-
-    # La mutación GraphQL para crear un dispositivo
-    mutation = """
-    mutation createDevice($id: ID!, $description: String!, $organizationDevicesId: ID!, $name: String!, $deviceModelId: ID!) {
-        createDevice(input: {id: $id, description: $description, organizationDevicesId: $organizationDevicesId, name: $name, deviceModelId: $deviceModelId}) {
-            id
-            description
-            organizationDevicesId
-            name
-            deviceModelId
-        }
-    }
-    """
+    Los ids de los dispositivos y ubicaciones son determinísticos, por lo que las mutaciones
+    pueden reintentarse.
 
-    # Variables para la mutación
-    variables = {
-        "id": uva_id,
-        "description": uva_id,
-        "organizationDevicesId": organization_id,
-        "name": uva_id,
-        "deviceModelId": "UVA"
-    }
+    Los `updateLocation` que fallan porque la ubicación no existe (`is_missing_item_error`) se
+    reenvían como `createLocation` en un segundo documento. Las coordenadas de las ubicaciones
+    creadas o actualizadas se recuerdan en `_known_locations`, y los dispositivos creados (o que ya
+    existían, cuando `createDevice` falla la condición de unicidad) en `provisioned_devices`.
 
-    # Encabezados con la API Key
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": api_key  # Usamos el API Key para autenticarnos
-    }
+    Los documentos que no alcanzan a enviarse antes de `deadline` fallan con
+    `GraphQLDeadlineExceeded` y sus registros se reportan para reintento.
 
-    # Realizar la solicitud POST
-    response = requests.post(
-        appsync_url,
-        headers=headers,
-        json={'query': mutation, 'variables': variables}
-    )
+    :param mutations: Lista de `PendingMutation`.
+    :param deadline: `Deadline` de la invocación.
+    :return: Lista de las `PendingMutation` que fallaron.
+    """
+    client = get_graphql_client(appsync_url, api_key)
+    failed = []
+    while mutations:
+        # Documentos sin repartir una UVA entre varios: se envían en paralelo sin alterar el
+        # orden de las mutaciones de cada UVA
+        documents = pack_documents(mutations, graphql.MAX_BATCH_OPERATIONS)
+        document_results = _executor.map(
+            lambda document: client.execute_batch([mutation.operation for mutation in document],
+                                                  deadline=deadline),
+            documents
+        )
+        mutations = [mutation for document in documents for mutation in document]
+        results = [result for document_result in document_results for result in document_result]
+
+        fallbacks = []
+        for mutation, result in zip(mutations, results):
+            record = mutation.record
+            field = mutation.operation.field
+            if isinstance(result, GraphQLError) and field == 'createDevice' and is_missing_item_error(result):
+                # El dispositivo ya existía (reintento o repetición del stream): no es una falla
+                result = None
+            if isinstance(result, GraphQLError):
+                if field == 'updateLocation' and is_missing_item_error(result):
+                    # La ubicación aún no existe: crearla
+                    _known_locations.pop(record.new_image.id, None)
+                    fallbacks.append(PendingMutation(record, create_location(record.new_image.id,
+                                                                             record.new_image.location)))
+                    continue
+                print(f"Error al ejecutar la mutación {field} del registro "
+                      f"{record.sequence_number} ({record.new_image.id}): {result}")
+                failed.append(mutation)
+            else:
+                if field in LOCATION_FIELDS:
+                    _known_locations[record.new_image.id] = location_point(record.new_image)
+                elif field == 'createDevice':
+                    provisioned_devices.set(record.new_image.id, True)
+                print(f"{field} successfully:", result)
+        mutations = fallbacks
+    return failed
+
+def pack_documents(mutations, max_operations):
+    """
+    Reparte las mutaciones en documentos de a lo sumo `max_operations` sin separar las de una
+    misma UVA (una UVA con más mutaciones que el máximo ocupa su propio documento, que
+    `execute_batch` divide en peticiones sucesivas).
 
-    # Verificar la respuesta
-    if response.status_code == 200:
-        data = response.json()
-        print("Device created successfully:", data)
-    else:
-        print(f"Error al ejecutar la mutación: {response.status_code}, {response.text}")
+    :return: Lista de documentos (listas de `PendingMutation`).
+    """
+    groups = {}
+    for mutation in mutations:
+        groups.setdefault(mutation.record.new_image.id, []).append(mutation)
+
+    documents = []
+    current = []
+    for group in groups.values():
+        if current and len(current) + len(group) > max_operations:
+            documents.append(current)
+            current = []
+        current.extend(group)
+    if current:
+        documents.append(current)
+    return documents
+
+def is_missing_item_error(error):
+    """
+    True si AppSync reporta que falló la condición de la escritura: en una actualización, que el
+    elemento no existe; en una creación, que ya existe.
+    """
+    return MISSING_ITEM_ERROR in getattr(error, 'error_types', ())
 
-def create_location(uva_id, location, appsync_url, api_key):
+def create_device(uva_id, organization_id):
     """
-    Crea un dispositivo en el sistema mediante una mutación GraphQL.
+    Construye la mutación GraphQL que crea el dispositivo de una UVA.
 
     Args:
         uva_id (str): Identificador único del dispositivo a crear. Este valor se usará para el ID, descripción y nombre del dispositivo.
         organization_id (str): Identificador único de la organización a la que pertenece el dispositivo.
 
-    Raises:
-        ValueError: Si la respuesta de la API no tiene éxito.
+    Returns:
+        Operation: Mutación `createDevice` para `execute_mutations`.
     """
-    # La mutación GraphQL para crear un dispositivo
-    mutation = """
-    mutation createLocation($id: ID!, $deviceLocationsId: ID!, $latitude: Float, $length: Float) {
-        createLocation(input: {deviceLocationsId: $deviceLocationsId, latitude: $latitude, length: $length, id: $id}) {
-            id
-        }
-        }
+    return Operation('createDevice', {
+        "id": ('ID!', uva_id),
+        "description": ('String!', uva_id),
+        "organizationDevicesId": ('ID!', organization_id),
+        "name": ('String!', uva_id),
+        "deviceModelId": ('ID!', "UVA")
+    }, selection='id description organizationDevicesId name deviceModelId')
+
+def create_location(uva_id, location):
     """
+    Construye la mutación GraphQL que crea la ubicación `A{uva_id}` de una UVA.
 
-    # Variables para la mutación
-    variables = {
-        "id": f"A{uva_id}",
-        "deviceLocationsId": uva_id,
-        "latitude": location['latitude'],
-        "length": location['longitude']
-    }
-
-    # Encabezados con la API Key
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": api_key  # Usamos el API Key para autenticarnos
-    }
-
-    # Realizar la solicitud POST
-    response = requests.post(
-        appsync_url,
-        headers=headers,
-        json={'query': mutation, 'variables': variables}
-    )
+    Args:
+        uva_id (str): Identificador único del dispositivo dueño de la ubicación.
+        location (dict): Coordenadas con `latitude` y `longitude`.
 
-    # Verificar la respuesta
-    if response.status_code == 200:
-        data = response.json()
-        print("Location created successfully:", data)
-    else:
-        print(f"Error al ejecutar la mutación: {response.status_code}, {response.text}")
-
-def update_location(uva_id, location, appsync_url, api_key ):
-    # La mutación GraphQL para crear un dispositivo
-    mutation = """
-    mutation updateLocation($id: ID!,  $latitude: Float, $length: Float) {
-        updateLocation(input: {latitude: $latitude, length: $length, id: $id}) {
-            id
-          }
-        }
+    Returns:
+        Operation: Mutación `createLocation` para `execute_mutations`.
     """
+    return Operation('createLocation', {
+        "deviceLocationsId": ('ID!', uva_id),
+        "latitude": ('Float', location['latitude']),
+        "length": ('Float', location['longitude']),
+        "id": ('ID!', f"A{uva_id}")
+    })
+
+def update_location(uva_id, location):
+    """
+    Construye la mutación GraphQL que actualiza la ubicación `A{uva_id}` de una UVA.
 
-    # Variables para la mutación
-    variables = {
-        "id": f"A{uva_id}",
-        "latitude": location['latitude'],
-        "length": location['longitude']
-    }
-
-    # Encabezados con la API Key
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": api_key  # Usamos el API Key para autenticarnos
-    }
-
-    # Realizar la solicitud POST
-    response = requests.post(
-        appsync_url,
-        headers=headers,
-        json={'query': mutation, 'variables': variables}
-    )
+    Args:
+        uva_id (str): Identificador único del dispositivo dueño de la ubicación.
+        location (dict): Coordenadas con `latitude` y `longitude`.
 
-    # Verificar la respuesta
-    if response.status_code == 200:
-        data = response.json()
-        print("Location update successfully:", data)
-    else:
-        print(f"Error al ejecutar la mutación: {response.status_code}, {response.text}")
\ No newline at end of file
+    Returns:
+        Operation: Mutación `updateLocation` para `execute_mutations`.
+    """
+    return Operation('updateLocation', {
+        "latitude": ('Float', location['latitude']),
+        "length": ('Float', location['longitude']),
+        "id": ('ID!', f"A{uva_id}")
+    })
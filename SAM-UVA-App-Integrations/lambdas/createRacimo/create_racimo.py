@@ -1,9 +1,6 @@
-import boto3
 import os
 import json
-import requests
-from botocore.awsrequest import AWSRequest
-from botocore.auth import SigV4Auth
+from uva_common.graphql import GraphQLError, GraphQLHTTPError, get_graphql_client
 
 def lambda_handler(event, context):
     # Cargar variables de entorno
@@ -66,34 +63,23 @@ def create_racimo(linkage_code, name, graphql_api):
         "configuration": f"racimos/{linkage_code}/config.json"    # Asume que `name` está definido
     }
 
-    # Crea el cuerpo de la solicitud con las variables
-    post_body = json.dumps({
-        "query": query,
-        "operationName": "MyMutation",
-        "variables": variables
-    })
-
-    signed_request = sign_request(graphql_api, "POST", post_body, region)
-    response = requests.post(
-        signed_request["url"],
-        headers=signed_request["headers"],
-        data=signed_request["body"]
-    )
-
-    # Verificar la respuesta
-    if response.status_code == 200:
-        response_data = response.json()
-        
-        # Comprobar si la creación fue exitosa
-        if 'data' in response_data and 'createRACIMO' in response_data['data']:
-            racimo_id = response_data['data']['createRACIMO']['id']
-            return racimo_id  # Solo retornar el ID del racimo
-        else:
-            # Si no se encuentra el ID en la respuesta, lanzar una excepción
-            raise Exception("Error al crear el racimo. No se recibió el ID esperado.")
-    else:
+    # Ejecutar la mutación firmada con SigV4 (no idempotente: solo se reintenta ante throttling)
+    client = get_graphql_client(graphql_api, region=region)
+    try:
+        response_data = client.execute(query, variables, operation_name="MyMutation", idempotent=False)
+    except GraphQLHTTPError as e:
         # Si no se obtiene un código 200, lanzar una excepción con el error
-        raise Exception(f"Error al procesar la solicitud: {response.status_code} - {response.text}")
+        raise Exception(f"Error al procesar la solicitud: {e.status_code} - {e.body}")
+    except GraphQLError as e:
+        raise Exception(f"Error al procesar la solicitud: {e}")
+
+    # Comprobar si la creación fue exitosa
+    if response_data.get('createRACIMO'):
+        racimo_id = response_data['createRACIMO']['id']
+        return racimo_id  # Solo retornar el ID del racimo
+    else:
+        # Si no se encuentra el ID en la respuesta, lanzar una excepción
+        raise Exception("Error al crear el racimo. No se recibió el ID esperado.")
 
 def check_racimo_exists(linkage_code, graphql_api):
     # Validar si existe un RACIMO
@@ -116,73 +102,36 @@ def check_racimo_exists(linkage_code, graphql_api):
         "linkageCode": linkage_code  # Suponiendo que `linkage_code` está definido en tu código
     }
 
-    # Crea el cuerpo de la solicitud con las variables
-    post_body = json.dumps({
-        "query": query,
-        "operationName": "MyQuery",
-        "variables": variables
-    })
-
-    signed_request = sign_request(graphql_api, "POST", post_body, region)
-    response = requests.post(
-        signed_request["url"],
-        headers=signed_request["headers"],
-        data=signed_request["body"]
-    )
-
-    if response.status_code == 200:
-        response_data = response.json()
-
-        # Extraer los items de la respuesta
-        items = response_data.get("data", {}).get("listRACIMOS", {}).get("items", [])
-
-        # Validar si items está vacío
-        if not items:
-            result = False
-            racimo_data = None  # No hay racimo
+    # Ejecutar la consulta firmada con SigV4
+    client = get_graphql_client(graphql_api, region=region)
+    try:
+        response_data = client.execute(query, variables, operation_name="MyQuery")
+    except GraphQLError as e:
+        print(f"Error: {e}")
+        raise Exception(f"GraphQL request failed: {e}")
+
+    # Extraer los items de la respuesta
+    items = (response_data.get("listRACIMOS") or {}).get("items", [])
+
+    # Validar si items está vacío
+    if not items:
+        result = False
+        racimo_data = None  # No hay racimo
+    else:
+        # Validar que el LinkageCode coincida
+        racimo = items[0] 
+        if racimo.get("LinkageCode") == linkage_code:
+            result = True
+            racimo_data = {
+                "Name": racimo.get("Name"),
+                "LinkageCode": racimo.get("LinkageCode")
+            }
         else:
-            # Validar que el LinkageCode coincida
-            racimo = items[0] 
-            if racimo.get("LinkageCode") == linkage_code:
-                result = True
-                racimo_data = {
-                    "Name": racimo.get("Name"),
-                    "LinkageCode": racimo.get("LinkageCode")
-                }
-            else:
-                result = False
-                racimo_data = None  # No hay racimo con el LinkageCode correcto
-
-        # Devolvemos solo el diccionario con el estado y los datos del racimo
-        return {
-            "success": result,
-            "racimo_data": racimo_data
-        }
+            result = False
+            racimo_data = None  # No hay racimo con el LinkageCode correcto
 
-    else:
-        print(f"Error: {response.status_code} - {response.text}")
-        raise Exception(f"GraphQL request failed: {response.text}")
-
-def sign_request(url, method, data, region):
-    """Firma la solicitud HTTP con IAM usando SigV4."""
-    credentials = get_aws_credentials()
-    request = AWSRequest(
-        method=method.upper(),
-        url=url,
-        data=data,
-        headers={"Content-Type": "application/json"}
-    )
-    SigV4Auth(credentials, "appsync", region).add_auth(request)
+    # Devolvemos solo el diccionario con el estado y los datos del racimo
     return {
-        "url": url,
-        "headers": dict(request.headers.items()),
-        "body": request.data,
-        "method": request.method,
+        "success": result,
+        "racimo_data": racimo_data
     }
-
-def get_aws_credentials():
-    """Obtiene credenciales de AWS desde el entorno."""
-    session = boto3.Session()
-    credentials = session.get_credentials().get_frozen_credentials()
-    return credentials
-
@@ -1,16 +1,58 @@
-import boto3
 import os
 import json
 from datetime import datetime
+from botocore.exceptions import BotoCoreError, ClientError
+from uva_common import runtime
+from uva_common.deadline import Deadline
+from uva_common.dynamodb import decode_number
+from uva_common.filters import load_record_filter
+from uva_common.last_seen import record_last_seen
+from uva_common.streams import build_batch_response
+
+# Tamaño máximo de un mensaje SNS (cuerpo + atributos)
+SNS_MAX_MESSAGE_BYTES = 256 * 1024
+# Tamaño máximo del total agregado de una llamada PublishBatch
+SNS_MAX_BATCH_BYTES = 256 * 1024
+# Número máximo de entradas por llamada PublishBatch
+SNS_MAX_BATCH_ENTRIES = 10
+# Mismo patrón que FilterCriteria del mapeo de eventos (RecordFilters), aplicado de forma defensiva
+RECORD_FILTER = load_record_filter()
+# Tabla del índice de última conexión por UVA (opcional: sin ella no se actualiza el índice)
+LAST_SEEN_TABLE = os.environ.get('LastSeenTable')
 
 def lambda_handler(event, context):
     sns_topic_arn = os.environ.get('SNSTopicARN')
 
     records = event['Records']
+    # Límite de tiempo de la invocación: al agotarse se deja de procesar y publicar, y los
+    # registros pendientes se reportan para reintento
+    deadline = Deadline.from_context(context)
     new_records = []
-    for record in records:
-        new_record = process_data(record)
+    # Número de secuencia del registro del stream de cada elemento de `new_records`
+    sequence_numbers = []
+    failed_sequence_numbers = []
+    for position, record in enumerate(records):
+        if deadline.expired():
+            pending = [r['dynamodb']['SequenceNumber'] for r in records[position:] if RECORD_FILTER(r)]
+            print(f"Tiempo agotado: {len(pending)} registro(s) sin procesar")
+            failed_sequence_numbers.extend(pending)
+            break
+        # Descartar los eventos que el filtro del mapeo ya debió excluir
+        if not RECORD_FILTER(record):
+            continue
+        sequence_number = record['dynamodb']['SequenceNumber']
+        try:
+            new_record = process_data(record)
+        except (KeyError, TypeError, ValueError) as e:
+            # Un registro mal formado fallaría igual en cada reintento y bloquearía el shard: se
+            # registra completo en el log y se descarta sin reportarlo
+            print(f"Registro {sequence_number} descartado por mal formado: {e!r} {json.dumps(record, default=str)}")
+            continue
+        # Los eventos que no son INSERT no se publican (antes se enviaban como null)
+        if new_record is None:
+            continue
         new_records.append(new_record)
+        sequence_numbers.append(sequence_number)
 
     # Publicar en el SNS
     attributes = {
@@ -18,8 +60,57 @@ def lambda_handler(event, context):
         "typeData": "RAW"
     }
     print(new_records)
-    rta= send_message_to_topic_sns(sns_topic_arn, new_records, attributes)
-    print(rta)
+    if LAST_SEEN_TABLE and new_records:
+        update_last_seen(LAST_SEEN_TABLE, new_records, deadline)
+    if new_records:
+        rta= send_message_to_topic_sns(sns_topic_arn, new_records, attributes, deadline)
+        print(rta)
+        # Un registro que por sí solo excede el límite de SNS no se publicará en ningún reintento
+        oversized = set(rta['oversizedRecords'])
+        for index in oversized:
+            print(f"Registro {sequence_numbers[index]} descartado por exceder el tamaño máximo de SNS: "
+                  f"{json.dumps(new_records[index], default=str)}")
+        failed_sequence_numbers.extend(
+            sequence_numbers[index] for index in rta['failedRecords'] if index not in oversized
+        )
+
+    return build_batch_response(failed_sequence_numbers)
+
+
+def update_last_seen(table_name, records, deadline=None):
+    """
+    Actualiza el índice de última conexión con el `ts` máximo de cada UVA del lote.
+
+    Es una actualización de mejor esfuerzo: si falla para una UVA (un error de DynamoDB o de
+    transporte, como un límite de tiempo agotado) se registra el error y el lote continúa (la
+    siguiente medición de esa UVA corrige el índice), sin reintentar ni volver a publicar los
+    registros en SNS. Por la misma razón, si vence `deadline` las UVAs restantes
+    se omiten.
+
+    Args:
+        table_name (str): Nombre de la tabla LastSeen.
+        records (list): Registros procesados por `process_data`.
+        deadline (Deadline): Límite de tiempo de la invocación (opcional).
+
+    Returns:
+        int: Número de UVAs cuyo índice avanzó.
+    """
+    latest = {}
+    for record in records:
+        uva_id = record.get('id')
+        if uva_id and record['ts'] > latest.get(uva_id, -1):
+            latest[uva_id] = record['ts']
+
+    updated = 0
+    for uva_id, ts in latest.items():
+        if deadline is not None and deadline.expired():
+            print(f"Tiempo agotado: índice de última conexión sin actualizar para {uva_id} y siguientes")
+            break
+        try:
+            updated += record_last_seen(table_name, uva_id, ts)
+        except (ClientError, BotoCoreError) as e:
+            print(f"Error al actualizar la última conexión de {uva_id}: {e}")
+    return updated
 
 
 def process_data(record):
@@ -60,92 +151,248 @@ def process_data(record):
 
 def remove_data_types(data):
     """
-    Recorre una estructura de datos que puede ser una lista de diccionarios o un diccionario anidado,
-    y elimina los tipos de datos específicos de DynamoDB, convirtiendo valores numéricos a int o float,
-    y valores booleanos a True o False.
+    Elimina los tipos de datos específicos de DynamoDB de una imagen (o lista de imágenes) de un
+    stream, convirtiendo cada atributo a su valor nativo de Python.
+
+    Soporta el conjunto completo de tipos de DynamoDB:
+        - S → str, N → int o float, BOOL → bool, NULL → None
+        - M → dict, L → list
+        - SS → list de str, NS → list de números, B / BS → texto base64 (tal como llega en el stream)
+
+    Los mapas y listas anidados se recorren de forma iterativa (con una pila explícita), por lo
+    que la profundidad de `data` o `logs` no está limitada por el límite de recursión de Python.
 
     Args:
-        data (list or dict): Estructura de datos a ser procesada, puede ser una lista de diccionarios o un diccionario anidado.
+        data (list or dict): Imagen de DynamoDB (dict de atributos) o lista de imágenes.
 
     Returns:
-        list or dict: Estructura de datos procesada sin tipos de datos, con valores numéricos convertidos a int o float,
-        y valores booleanos convertidos a True o False.
+        list or dict: Estructura de datos procesada sin tipos de datos.
+
+    Raises:
+        ValueError: Si `data` no es una lista o diccionario, o si algún atributo tiene un tipo no soportado.
     """
-    
-     # Si es una lista de diccionarios
-    if isinstance(data, list):  
-        new_items = []
-        for item in data:
-            new_items.append(remove_data_types(item))
-        return new_items
-        
-    # Si es un diccionario
-    elif isinstance(data, dict):  
-        new_item = {}
-        for key, value in data.items():
-            data_type, data_value = list(value.items())[0]
-
-            if data_type == 'N':
-                try:
-                    new_item[key] = int(data_value)
-                except ValueError:
-                    new_item[key] = float(data_value)
-            elif data_type == 'BOOL':
-                new_item[key] = data_value == 'true'
+    if isinstance(data, list):
+        return [decode_image(item) for item in data]
+    elif isinstance(data, dict):
+        return decode_image(data)
+    else:
+        raise ValueError(
+            'No se puede procesar, el elemento no es una lista o diccionario con estructura de items dynamo'
+        )
+
+def decode_image(image):
+    """
+    Decodifica una imagen de DynamoDB (dict de atributos tipados) sin recursión.
+
+    Cada contenedor (M o L) se crea una sola vez, se asigna en su padre y se encola en la pila
+    junto con sus atributos de origen; los escalares se asignan directamente.
+
+    Args:
+        image (dict): Imagen de DynamoDB, por ejemplo `record['dynamodb']['NewImage']`.
+
+    Returns:
+        dict: Imagen con valores nativos de Python.
+    """
+    root = {}
+    stack = [(root, image.items())]
+    while stack:
+        target, items = stack.pop()
+        for key, attribute in items:
+            (data_type, data_value), = attribute.items()
+
+            if data_type == 'S':
+                target[key] = data_value
+            elif data_type == 'N':
+                target[key] = decode_number(data_value)
             elif data_type == 'M':
-                new_item[key] = remove_data_types(data_value)
+                child = {}
+                target[key] = child
+                stack.append((child, data_value.items()))
+            elif data_type == 'L':
+                child = [None] * len(data_value)
+                target[key] = child
+                stack.append((child, enumerate(data_value)))
+            elif data_type == 'BOOL':
+                # El stream entrega booleanos JSON; se acepta también la forma textual
+                target[key] = data_value is True or data_value == 'true'
+            elif data_type == 'NULL':
+                target[key] = None
+            elif data_type == 'SS' or data_type == 'BS':
+                target[key] = list(data_value)
+            elif data_type == 'NS':
+                target[key] = [decode_number(number) for number in data_value]
+            elif data_type == 'B':
+                target[key] = data_value
             else:
-                new_item[key] = data_value
-        return new_item
-    else:
-        return 'No se puede procesar, el elemento no es una lista o diccionario con estructura de items dynamo'
-    
-def send_message_to_topic_sns(topic_arn, message, attributes=None):
+                raise ValueError(f"Tipo de dato DynamoDB no soportado: {data_type}")
+    return root
+
+def send_message_to_topic_sns(topic_arn, message, attributes=None, deadline=None):
     """
-    Envía un mensaje a un tema de Amazon Simple Notification Service (SNS).
+    Envía una lista de registros a un tema de Amazon Simple Notification Service (SNS).
+
+    Los registros se empaquetan en tantos mensajes como sea necesario para que cada uno
+    (cuerpo JSON + atributos) quede por debajo del límite de 256 KB de SNS, y los mensajes
+    se publican con `PublishBatch` en grupos de hasta 10 entradas cuyo tamaño agregado
+    tampoco excede dicho límite. Si vence `deadline`, los lotes que no alcanzaron a publicarse
+    se reportan como fallidos.
+
     Args:
         topic_arn (str): ARN del tema SNS al que se enviará el mensaje.
-        message_body (dict o list): Cuerpo del mensaje a enviar en formato JSON.
-        message_attributes (dict): Atributos personalizados del mensaje.
+        message (list): Registros a enviar; cada mensaje publicado es una lista JSON de registros.
+        attributes (dict): Atributos personalizados del mensaje.
+        deadline (Deadline): Límite de tiempo de la invocación (opcional).
     Returns:
         dict: Un diccionario que indica el resultado del envío del mensaje.
-            - Si el mensaje se envía correctamente:
-                {'statusCode': 200, 'body': 'Mensaje enviado exitosamente al tema SNS.'}
-            - Si ocurre un error:
-                {'statusCode': Código de error HTTP, 'body': 'Mensaje de error correspondiente.'}
-    """
-    # Convierte el cuerpo del mensaje a formato JSON
-    body = json.dumps(message)
-    # Crea una instancia del cliente SNS
-    sns = boto3.client('sns')
-    # Verifica si el mensaje excede el límite de tamaño máximo de 256 KB
-    if len(body.encode('utf-8')) > 256 * 1024:
+            - Si todos los registros se envían correctamente:
+                {'statusCode': 200, 'body': 'Mensaje enviado exitosamente al tema SNS.', 'failedRecords': [],
+                 'oversizedRecords': []}
+            - Si algún registro no pudo enviarse:
+                {'statusCode': 500, 'body': 'Mensaje de error correspondiente.',
+                 'failedRecords': [índices en `message` de los registros no enviados],
+                 'oversizedRecords': [índices de los que por sí solos exceden el límite de SNS]}
+    """
+    att_dict = build_message_attributes(attributes)
+    attributes_size = get_attributes_size(att_dict)
+
+    # Empaquetar los registros en mensajes que respeten el límite de tamaño
+    messages, oversized = pack_messages(message, SNS_MAX_MESSAGE_BYTES - attributes_size)
+    failed_records = list(oversized)
+
+    # Cliente SNS compartido por las invocaciones del contenedor
+    sns = runtime.get_client('sns')
+    for batch in group_publish_batches(messages, attributes_size):
+        if deadline is not None and deadline.expired():
+            print("Tiempo agotado: lote sin publicar en SNS")
+            for _body, _size, indexes in batch:
+                failed_records.extend(indexes)
+            continue
+        entries = [
+            {'Id': str(position), 'Message': body, 'MessageAttributes': att_dict}
+            for position, (body, _size, _indexes) in enumerate(batch)
+        ]
+        try:
+            response = sns.publish_batch(TopicArn=topic_arn, PublishBatchRequestEntries=entries)
+        except ClientError as e:
+            print(f"Error al publicar el lote en SNS: {e}")
+            for _body, _size, indexes in batch:
+                failed_records.extend(indexes)
+            continue
+
+        # Registrar los registros de las entradas que SNS rechazó
+        for failure in response.get('Failed', []):
+            print(f"Entrada rechazada por SNS: {failure}")
+            failed_records.extend(batch[int(failure['Id'])][2])
+
+    if failed_records:
         return {
             'statusCode': 500,
-            'body': f"Tamaño del mensaje = {len(body.encode('utf-8'))} bytes, el cual excede el tamaño máximo."
+            'body': f"Error al enviar {len(failed_records)} registro(s) al tema SNS.",
+            'failedRecords': sorted(failed_records),
+            'oversizedRecords': oversized
         }
-    else:
-        # El mensaje no excede el límite de tamaño, enviarlo completo al tema SNS
-        # Incluye message_attributes si se proporcionan
-        att_dict = {}
-        for key, value in attributes.items():
-            if isinstance(value, str):
-                att_dict[key] = {"DataType": "String", "StringValue": value}
-            elif isinstance(value, bytes):
-                att_dict[key] = {"DataType": "Binary", "BinaryValue": value}
-        response = sns.publish(
-            TopicArn=topic_arn,
-            Message=body,
-            MessageAttributes=att_dict
-        )
-        # Verifica si el envío fue exitoso
-        if response['ResponseMetadata']['HTTPStatusCode'] == 200:
-            return {
-                'statusCode': 200,
-                'body': 'Mensaje enviado exitosamente al tema SNS.'
-            }
-        else:
-            return {
-                'statusCode': response['ResponseMetadata']['HTTPStatusCode'],
-                'body': 'Error al enviar el mensaje al tema SNS.'
-            }
\ No newline at end of file
+    return {
+        'statusCode': 200,
+        'body': 'Mensaje enviado exitosamente al tema SNS.',
+        'failedRecords': [],
+        'oversizedRecords': []
+    }
+
+def build_message_attributes(attributes):
+    """
+    Convierte un diccionario simple de atributos al formato `MessageAttributes` de SNS.
+
+    Args:
+        attributes (dict or None): Atributos con valores `str` o `bytes`.
+
+    Returns:
+        dict: Atributos en formato SNS ({"DataType": ..., "StringValue"/"BinaryValue": ...}).
+    """
+    att_dict = {}
+    for key, value in (attributes or {}).items():
+        if isinstance(value, str):
+            att_dict[key] = {"DataType": "String", "StringValue": value}
+        elif isinstance(value, bytes):
+            att_dict[key] = {"DataType": "Binary", "BinaryValue": value}
+    return att_dict
+
+def get_attributes_size(att_dict):
+    """
+    Calcula cuántos bytes aportan los atributos al tamaño de cada mensaje SNS
+    (nombre, tipo de dato y valor de cada atributo).
+    """
+    size = 0
+    for key, value in att_dict.items():
+        data = value.get('StringValue', value.get('BinaryValue', b''))
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        size += len(key.encode('utf-8')) + len(value['DataType']) + len(data)
+    return size
+
+def pack_messages(records, max_message_bytes):
+    """
+    Agrupa registros en cuerpos JSON (listas) cuyo tamaño no excede `max_message_bytes`.
+
+    Cada registro se serializa una sola vez y con `ensure_ascii=True`, de modo que la
+    longitud del texto producido es exactamente su tamaño en bytes UTF-8; el tamaño de
+    cada mensaje se acumula mientras se codifica, sin volver a serializar ni a codificar.
+
+    Args:
+        records (list): Registros a empaquetar.
+        max_message_bytes (int): Tamaño máximo en bytes del cuerpo de cada mensaje.
+
+    Returns:
+        tuple: (messages, oversized)
+            - messages: lista de tuplas (cuerpo, tamaño en bytes, índices de los registros incluidos).
+            - oversized: índices de los registros que por sí solos exceden el tamaño máximo.
+    """
+    messages = []
+    oversized = []
+    parts, indexes, size = [], [], 2  # 2 bytes de los corchetes de la lista JSON
+
+    for index, record in enumerate(records):
+        encoded = json.dumps(record, ensure_ascii=True, separators=(',', ':'))
+        encoded_size = len(encoded)
+
+        if encoded_size + 2 > max_message_bytes:
+            print(f"Registro {index} de {encoded_size} bytes excede el tamaño máximo del mensaje.")
+            oversized.append(index)
+            continue
+
+        # Cerrar el mensaje actual si el registro (más la coma separadora) no cabe
+        if parts and size + 1 + encoded_size > max_message_bytes:
+            messages.append(('[' + ','.join(parts) + ']', size, indexes))
+            parts, indexes, size = [], [], 2
+
+        size += encoded_size + (1 if parts else 0)
+        parts.append(encoded)
+        indexes.append(index)
+
+    if parts:
+        messages.append(('[' + ','.join(parts) + ']', size, indexes))
+    return messages, oversized
+
+def group_publish_batches(messages, attributes_size):
+    """
+    Agrupa mensajes en lotes para `PublishBatch`: como máximo `SNS_MAX_BATCH_ENTRIES`
+    entradas por lote y un tamaño agregado (cuerpos + atributos) de `SNS_MAX_BATCH_BYTES`.
+
+    Args:
+        messages (list): Tuplas (cuerpo, tamaño, índices) producidas por `pack_messages`.
+        attributes_size (int): Bytes que aportan los atributos a cada entrada.
+
+    Returns:
+        list: Lista de lotes, cada uno una lista de tuplas (cuerpo, tamaño, índices).
+    """
+    batches = []
+    batch, batch_size = [], 0
+    for entry in messages:
+        entry_size = entry[1] + attributes_size
+        if batch and (len(batch) == SNS_MAX_BATCH_ENTRIES or batch_size + entry_size > SNS_MAX_BATCH_BYTES):
+            batches.append(batch)
+            batch, batch_size = [], 0
+        batch.append(entry)
+        batch_size += entry_size
+    if batch:
+        batches.append(batch)
+    return batches
@@ -1,18 +1,122 @@
 import os
 import json
-import requests
-from datetime import datetime, timedelta
-import boto3
-from botocore.exceptions import ClientError
+import base64
+import binascii
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from uva_common.cache import MISSING, TwoTierCache
+from uva_common.deadline import Deadline
+from uva_common.graphql import (GraphQLCircuitOpen, GraphQLDeadlineExceeded, GraphQLError, GraphQLResponseError,
+                                Operation, get_graphql_client)
+from uva_common.last_seen import get_last_seen
 
+# Consultas simultáneas máximas al consultar varias UVAs (`/all/connection`)
+CONNECTION_CONCURRENCY = int(os.environ.get('ConnectionConcurrency', '16'))
+# Límite de tiempo (segundos) de una petición `/all/connection`; API Gateway corta a los 29 s
+CONNECTION_DEADLINE = float(os.environ.get('ConnectionDeadline', '25'))
+# Alias máximos por documento GraphQL en `/all/connection` (dos por UVA)
+CONNECTION_MAX_ALIASES = int(os.environ.get('ConnectionMaxAliases', '50'))
+# Tabla del índice de última conexión por UVA; sin ella (o sin registro) se consulta AppSync
+LAST_SEEN_TABLE = os.environ.get('LastSeenTable')
+# Segundos durante los que un estado cacheado se sirve sin revalidar, y segundos adicionales
+# durante los que se sirve vencido mientras se revalida en segundo plano (stale-while-revalidate)
+CONNECTION_CACHE_TTL = int(os.environ.get('ConnectionCacheTTL', '15'))
+CONNECTION_CACHE_STALE_TTL = int(os.environ.get('ConnectionCacheStaleTTL', '60'))
+# Si las consultas de última medición se envían duplicadas cuando superan el p95 de latencia
+CONNECTION_HEDGED_READS = os.environ.get('ConnectionHedgedReads', 'false').lower() == 'true'
+# Ids máximos en `?id=` de `/all/connection` y en el cuerpo de `POST /connection`
+CONNECTION_MAX_IDS = int(os.environ.get('ConnectionMaxIds', '100'))
+CONNECTION_MAX_BODY_IDS = int(os.environ.get('ConnectionMaxBodyIds', '10000'))
+# Longitud máxima de un id de UVA, racimo o código de vinculación
+MAX_ID_LENGTH = 128
+# UVAs por página de `/connection` (por defecto y máximo que puede pedir el cliente con `limit`)
+CONNECTION_PAGE_SIZE = int(os.environ.get('ConnectionPageSize', '100'))
+CONNECTION_MAX_PAGE_SIZE = int(os.environ.get('ConnectionMaxPageSize', '500'))
+# Segundos que se cachea cada página de racimos de un código de vinculación
+RACIMO_LIST_TTL = int(os.environ.get('RacimoListTTL', '300'))
 
-import json
+# Última conexión por UVA ({"ts", "storedAt"}), solo en memoria del contenedor
+connection_cache = TwoTierCache(
+    'connection', max_entries=4096, ttl=CONNECTION_CACHE_TTL + CONNECTION_CACHE_STALE_TTL, persistent=False
+)
+# Fecha de creación (UNIX ms) de las UVAs sin mediciones: no cambia, así que se memoriza por
+# tiempo indefinido, acotada por número de entradas en memoria y en /tmp
+CREATION_DATE_MAX_ENTRIES = int(os.environ.get('CreationDateMaxEntries', '10000'))
+creation_dates = TwoTierCache(
+    'uva-created-at', max_entries=min(4096, CREATION_DATE_MAX_ENTRIES), ttl=10 * 365 * 24 * 3600,
+    max_disk_entries=CREATION_DATE_MAX_ENTRIES
+)
+# Páginas de `listRACIMOS` de cada código de vinculación (organización), por `nextToken`
+racimo_pages_cache = TwoTierCache('racimo-pages-by-linkage-code', max_entries=1024, ttl=RACIMO_LIST_TTL)
+
+# Última medición y fecha de creación de una UVA en una sola consulta
+LAST_CONNECTION_QUERY = """
+query lastConnection($uvaID: ID!) {
+    measurementsByUvaIDAndTs(uvaID: $uvaID, sortDirection: DESC, limit: 1) {
+        items {
+            ts
+        }
+    }
+    getUVA(id: $uvaID) {
+        createdAt
+    }
+}
+"""
+# Solo la última medición (cuando la fecha de creación ya está memorizada)
+LAST_MEASUREMENT_QUERY = """
+query lastMeasurement($uvaID: ID!) {
+    measurementsByUvaIDAndTs(uvaID: $uvaID, sortDirection: DESC, limit: 1) {
+        items {
+            ts
+        }
+    }
+}
+"""
+
+# Racimos de una organización (su código de vinculación), página a página
+RACIMOS_BY_LINKAGE_CODE_QUERY = """
+query racimosByLinkageCode($linkageCode: String!, $nextToken: String) {
+    listRACIMOS(filter: {LinkageCode: {eq: $linkageCode}}, limit: 1000, nextToken: $nextToken) {
+        items {
+            id
+        }
+        nextToken
+    }
+}
+"""
+# UVAs de un racimo por el índice de `racimoID`, página a página
+UVAS_BY_RACIMO_QUERY = """
+query uvasByRacimo($racimoID: ID!, $limit: Int, $nextToken: String) {
+    uVASByRacimoID(racimoID: $racimoID, limit: $limit, nextToken: $nextToken) {
+        items {
+            id
+        }
+        nextToken
+    }
+}
+"""
+
+# Un solo hilo de revalidación: las UVAs vencidas se refrescan una vez, en orden de llegada
+_revalidator = ThreadPoolExecutor(max_workers=1)
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+class RequestError(ValueError):
+    """Parámetros inválidos en la petición; se responde 400 con el mensaje."""
 
 def lambda_handler(event, context):
     """
     Manejador principal para la Lambda. Obtiene el estado de conexión de una UVA 
     basándose en la última medición registrada.
 
+    Rutas:
+        - `GET /{id_uva}/connection`: una UVA.
+        - `GET /all/connection?id=a,b`: varias UVAs (a lo sumo `CONNECTION_MAX_IDS`).
+        - `GET|POST /connection`: UVAs de un racimo o de una organización, o lista de ids en el
+          cuerpo, paginadas con `nextToken` (ver `handle_bulk_request`).
+
     Args:
         event (dict): Evento recibido, incluye parámetros de entrada.
         context (object): Contexto de ejecución de AWS Lambda.
@@ -27,39 +131,596 @@ def lambda_handler(event, context):
 
 
     # Obtener el ID de la UVA desde los parámetros de la ruta del evento
-    uva_id = event['pathParameters']['id_uva']
+    uva_id = (event.get('pathParameters') or {}).get('id_uva')
     query_params = event.get("queryStringParameters") or {}
 
-    results = {}
+    # Límite de tiempo de la invocación: las UVAs que no alcanzan a consultarse se marcan como
+    # {"error": "timeout"} y la respuesta sale con los resultados parciales
+    deadline = Deadline.from_context(context)
+
+    try:
+        if uva_id is None:
+            # Consulta paginada `/connection`
+            return handle_bulk_request(event, appsync_url, api_key, deadline)
+        if uva_id == 'all':
+            ids = parse_id_list(query_params.get("id"))
+    except RequestError as e:
+        return error_response(400, str(e))
+
     if uva_id == 'all':
-        ids_ = query_params.get("id")
-        ids = ids_.split(',')
-        for id in ids:
-            results[id] = get_connection_status(id, appsync_url, api_key)
+        results = get_cached_statuses(
+            ids, lambda missing, deadline: get_connection_statuses(missing, appsync_url, api_key, deadline), deadline
+        )
     else:
-        results[uva_id] = get_connection_status(uva_id, appsync_url, api_key)
+        results = get_cached_statuses(
+            [uva_id],
+            lambda missing, deadline: {id: get_connection_status(id, appsync_url, api_key, deadline) for id in missing},
+            deadline
+        )
+
+    # Retornar la respuesta con código HTTP 200 (o 304 si el cliente ya tiene este cuerpo)
+    return build_response(results, event.get('headers'))
+
+def parse_id_list(value):
+    """
+    Valida la lista de ids separados por coma de `?id=` en `/all/connection`.
+
+    Returns:
+        list: Identificadores en el orden recibido.
+
+    Raises:
+        RequestError: Si falta el parámetro, trae más de `CONNECTION_MAX_IDS` ids o un id
+                      supera `MAX_ID_LENGTH` caracteres.
+    """
+    if value is None:
+        raise RequestError("Falta el parámetro 'id' (ids separados por coma)")
+    ids = value.split(',')
+    if len(ids) > CONNECTION_MAX_IDS:
+        raise RequestError(
+            f"Se permiten a lo sumo {CONNECTION_MAX_IDS} ids en 'id'; use POST /connection para listas mayores"
+        )
+    validate_ids(ids)
+    return ids
+
+def validate_ids(ids):
+    """
+    Raises:
+        RequestError: Si algún id no es texto o supera `MAX_ID_LENGTH` caracteres.
+    """
+    for uva_id in ids:
+        if not isinstance(uva_id, str) or len(uva_id) > MAX_ID_LENGTH:
+            raise RequestError(
+                f"Id inválido (texto de a lo sumo {MAX_ID_LENGTH} caracteres): {str(uva_id)[:MAX_ID_LENGTH]!r}"
+            )
+
+def error_response(status_code, message):
+    """Respuesta de error para API Gateway con cuerpo {"error": mensaje}."""
+    return {
+        "statusCode": status_code,
+        "headers": {"Content-Type": "application/json", "Cache-Control": "no-store"},
+        "body": json.dumps({"error": message})
+    }
+
+def handle_bulk_request(event, appsync_url, api_key, deadline):
+    """
+    Atiende `GET|POST /connection`: estado de conexión de muchas UVAs, página a página.
+
+    La fuente de las UVAs es una de:
+        - `racimo`: id de un racimo; sus UVAs se recorren con el índice `uVASByRacimoID`.
+        - `linkageCode`: código de vinculación de una organización; se recorren las UVAs de
+          cada uno de sus racimos.
+        - `ids` (solo en el cuerpo de un POST): lista de ids, a lo sumo `CONNECTION_MAX_BODY_IDS`.
+    En un GET los parámetros van en la query; en un POST, en el cuerpo JSON. `limit` fija las
+    UVAs por página (por defecto `CONNECTION_PAGE_SIZE`, a lo sumo `CONNECTION_MAX_PAGE_SIZE`)
+    y `nextToken` es el cursor que retornó la página anterior. Cada página se resuelve con
+    `get_connection_statuses`, con el mismo límite de tiempo y caché que `/all/connection`.
+
+    Returns:
+        dict: Respuesta para API Gateway con cuerpo {"items": {uva_id: estado}, "nextToken":
+              cursor de la página siguiente o null en la última}; 502 (503 si AppSync no
+              respondió a tiempo o su circuito está abierto) si no se pudieron listar las UVAs.
+
+    Raises:
+        RequestError: Si los parámetros o el cursor son inválidos.
+    """
+    source, limit, token = parse_bulk_request(event)
+    position = decode_cursor(token, source)
+    try:
+        ids, next_position = list_page(source, position, limit, appsync_url, api_key, deadline)
+    except GraphQLError as e:
+        print(f"Error al listar las UVAs de {source[0]} {source[1]}: {e}")
+        reason = lookup_error(e)
+        return error_response(502 if reason == "lookup_failed" else 503, f"No se pudieron listar las UVAs ({reason})")
+
+    results = get_cached_statuses(
+        ids, lambda missing, deadline: get_connection_statuses(missing, appsync_url, api_key, deadline), deadline
+    )
+    next_token = encode_cursor(source, next_position) if next_position is not None else None
+    return build_response(results, event.get('headers'), body={"items": results, "nextToken": next_token})
+
+def parse_bulk_request(event):
+    """
+    Lee la fuente, el tamaño de página y el cursor de una petición `/connection`.
+
+    Returns:
+        tuple: (fuente, limit, nextToken). La fuente es ('racimo', id), ('linkageCode', código)
+               o ('ids', lista de ids).
+
+    Raises:
+        RequestError: Si falta la fuente o hay más de una, o algún parámetro es inválido.
+    """
+    if (event.get('httpMethod') or 'GET').upper() == 'POST':
+        try:
+            params = json.loads(event.get('body') or '{}')
+        except ValueError:
+            raise RequestError("El cuerpo debe ser un objeto JSON")
+        if not isinstance(params, dict):
+            raise RequestError("El cuerpo debe ser un objeto JSON")
+    else:
+        params = event.get('queryStringParameters') or {}
+        if 'ids' in params:
+            raise RequestError("La lista 'ids' solo se acepta en el cuerpo de un POST")
+
+    sources = [name for name in ('racimo', 'linkageCode', 'ids') if params.get(name) is not None]
+    if len(sources) != 1:
+        raise RequestError("Indique exactamente uno de 'racimo', 'linkageCode' o 'ids'")
+    name = sources[0]
+    value = params[name]
+    if name == 'ids':
+        if not isinstance(value, list) or not value:
+            raise RequestError("'ids' debe ser una lista no vacía de ids")
+        if len(value) > CONNECTION_MAX_BODY_IDS:
+            raise RequestError(f"Se permiten a lo sumo {CONNECTION_MAX_BODY_IDS} ids")
+        validate_ids(value)
+    elif not isinstance(value, str) or not value or len(value) > MAX_ID_LENGTH:
+        raise RequestError(f"'{name}' debe ser un texto de 1 a {MAX_ID_LENGTH} caracteres")
+
+    limit = params.get('limit', CONNECTION_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise RequestError("'limit' debe ser un entero")
+    if not 1 <= limit <= CONNECTION_MAX_PAGE_SIZE:
+        raise RequestError(f"'limit' debe estar entre 1 y {CONNECTION_MAX_PAGE_SIZE}")
+
+    token = params.get('nextToken')
+    if token is not None and not isinstance(token, str):
+        raise RequestError("'nextToken' inválido")
+    return (name, value), limit, token
+
+def cursor_scope(source):
+    """Identifica la consulta a la que pertenece un cursor (para rechazarlo en otra distinta)."""
+    name, value = source
+    if name == 'ids':
+        return [name, len(value), hashlib.sha256('\n'.join(value).encode('utf-8')).hexdigest()[:16]]
+    return [name, value]
+
+def encode_cursor(source, position):
+    """Codifica la posición de la página siguiente como `nextToken` opaco (base64url de JSON)."""
+    payload = json.dumps({"s": cursor_scope(source), "p": position}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, source):
+    """
+    Decodifica un `nextToken` emitido por `encode_cursor` para la misma fuente.
+
+    Returns:
+        dict: Posición de la página ({} para la primera página).
+
+    Raises:
+        RequestError: Si el cursor no es válido o pertenece a otra consulta.
+    """
+    if not token:
+        return {}
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, binascii.Error):
+        raise RequestError("'nextToken' inválido")
+    if not isinstance(payload, dict) or payload.get('s') != cursor_scope(source) \
+            or not isinstance(payload.get('p'), dict):
+        raise RequestError("'nextToken' no corresponde a esta consulta")
+    return payload['p']
+
+def list_page(source, position, limit, appsync_url, api_key, deadline=None):
+    """
+    Obtiene los ids de UVA de una página de `/connection`.
+
+    Para racimos y organizaciones se consulta `uVASByRacimoID` racimo por racimo, siguiendo su
+    `nextToken`, hasta reunir `limit` UVAs o agotar los racimos. Los racimos de una organización
+    se leen página a página de `listRACIMOS` solo cuando la página de UVAs los necesita. Si se
+    agota `deadline` la página sale con las UVAs reunidas y el cursor apunta a donde se detuvo.
+
+    El cursor guarda el id del racimo, no su posición, para que agregar o quitar racimos entre
+    páginas no desplace la lectura. Si el racimo ya no está en su página de `listRACIMOS`, la
+    lectura se retoma desde el inicio de esa página (puede repetir UVAs, pero no omite ninguna).
+
+    Args:
+        source (tuple): Fuente de `parse_bulk_request`.
+        position (dict): Posición de `decode_cursor`: {"o": desplazamiento} para una lista de
+                         ids, o {"l": nextToken de la página de `listRACIMOS`, "r": id del racimo
+                         o null para el inicio de esa página, "t": nextToken de `uVASByRacimoID`}
+                         para racimos.
+
+    Returns:
+        tuple: (ids de la página, posición de la página siguiente o None si es la última).
+
+    Raises:
+        RequestError: Si el cursor está fuera de rango.
+        GraphQLError: Si falla el listado antes de reunir alguna UVA.
+    """
+    name, value = source
+    if name == 'ids':
+        offset = position.get('o', 0)
+        if not isinstance(offset, int) or not 0 <= offset < len(value):
+            raise RequestError("'nextToken' fuera de rango")
+        end = offset + limit
+        return value[offset:end], ({"o": end} if end < len(value) else None)
+
+    list_token = position.get('l')
+    racimo_id = position.get('r')
+    token = position.get('t')
+    if not all(isinstance(item, (str, type(None))) for item in (list_token, racimo_id, token)) \
+            or (racimo_id is None and token is not None) \
+            or (name == 'racimo' and (list_token is not None or racimo_id not in (None, value))):
+        raise RequestError("'nextToken' fuera de rango")
+
+    if name == 'racimo':
+        racimos, next_list_token = [value], None
+    else:
+        racimos, next_list_token = get_racimo_page(value, list_token, appsync_url, api_key, deadline)
+    if racimo_id is None:
+        index = 0
+    elif racimo_id in racimos:
+        index = racimos.index(racimo_id)
+    else:
+        print(f"El racimo {racimo_id} ya no pertenece a {value}; se retoma desde el inicio de su página")
+        index, token = 0, None
+
+    client = get_graphql_client(appsync_url, api_key)
+    ids = []
+    while len(ids) < limit and (deadline is None or not deadline.expired()):
+        if index == len(racimos):
+            if not next_list_token:
+                break
+            try:
+                racimos, following = get_racimo_page(value, next_list_token, appsync_url, api_key, deadline)
+            except GraphQLError as e:
+                if not ids:
+                    raise
+                # Página parcial: el cursor apunta al inicio de la página de racimos que falló
+                print(f"Error al listar los racimos de {value}: {e}")
+                break
+            list_token, next_list_token, index = next_list_token, following, 0
+            continue
+        try:
+            data = client.execute(
+                UVAS_BY_RACIMO_QUERY,
+                {"racimoID": racimos[index], "limit": limit - len(ids), "nextToken": token},
+                deadline=deadline
+            )
+        except GraphQLError as e:
+            if not ids:
+                raise
+            # Página parcial: el cursor apunta a la consulta que falló
+            print(f"Error al listar las UVAs del racimo {racimos[index]}: {e}")
+            break
+        page = data.get('uVASByRacimoID') or {}
+        ids.extend(item['id'] for item in page.get('items') or [] if item and item.get('id'))
+        token = page.get('nextToken')
+        if not token:
+            index += 1
+
+    if index < len(racimos):
+        return ids, {"l": list_token, "r": racimos[index], "t": token}
+    if next_list_token:
+        return ids, {"l": next_list_token, "r": None, "t": None}
+    return ids, None
+
+def get_racimo_page(linkage_code, list_token, appsync_url, api_key, deadline=None):
+    """
+    Lee una página de los racimos de una organización (su código de vinculación) con
+    `listRACIMOS`. Cada página se cachea `RACIMO_LIST_TTL` segundos.
+
+    Args:
+        linkage_code (str): Código de vinculación de la organización.
+        list_token (str | None): nextToken de la página (None para la primera).
+
+    Returns:
+        tuple: (ids de los racimos de la página en el orden de AppSync, sin repetir; nextToken
+               de la página siguiente o None si es la última).
+    """
+    def load():
+        data = get_graphql_client(appsync_url, api_key).execute(
+            RACIMOS_BY_LINKAGE_CODE_QUERY, {"linkageCode": linkage_code, "nextToken": list_token}, deadline=deadline
+        )
+        page = data.get('listRACIMOS') or {}
+        racimos = [item['id'] for item in page.get('items') or [] if item and item.get('id')]
+        return {"ids": list(dict.fromkeys(racimos)), "nextToken": page.get('nextToken')}
+
+    page = racimo_pages_cache.get_or_load(json.dumps([linkage_code, list_token]), load)
+    return page['ids'], page['nextToken']
+
+def build_response(results, request_headers=None, body=None):
+    """
+    Construye la respuesta HTTP con encabezados `ETag` y `Cache-Control`.
+
+    Si el encabezado `If-None-Match` de la petición contiene el ETag del cuerpo, responde 304
+    sin cuerpo. Las respuestas con errores por UVA no se cachean en el cliente.
+
+    Args:
+        results (dict): Estado de conexión por UVA.
+        request_headers (dict): Encabezados de la petición (sin distinguir mayúsculas).
+        body (dict): Cuerpo de la respuesta, si no es `results` (por ejemplo una página).
+
+    Returns:
+        dict: Respuesta para API Gateway.
+    """
+    body = json.dumps(results if body is None else body)
+    etag = '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"'
+    if any(isinstance(status, dict) and 'error' in status for status in results.values()):
+        cache_control = 'no-store'
+    else:
+        cache_control = f"private, max-age={CONNECTION_CACHE_TTL}, stale-while-revalidate={CONNECTION_CACHE_STALE_TTL}"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    if_none_match = next(
+        (value for name, value in (request_headers or {}).items() if name.lower() == 'if-none-match'), None
+    )
+    if if_none_match and cache_control != 'no-store':
+        candidates = {candidate.strip().removeprefix('W/') for candidate in if_none_match.split(',')}
+        if etag in candidates or '*' in candidates:
+            return {"statusCode": 304, "headers": headers, "body": ""}
 
-    # Retornar la respuesta con código HTTP 200 y el resultado en formato JSON
     return {
         "statusCode": 200,
-        "body": json.dumps(results)
+        "headers": headers,
+        "body": body
     }
 
-def get_connection_status(uva_id, appsync_url, api_key):
+def get_cached_statuses(ids, load, deadline=None):
     """
-    Obtiene el estado de conexión de una UVA basada en la última medición registrada.
+    Retorna el estado de conexión de las UVAs desde `connection_cache` con semántica
+    stale-while-revalidate.
+
+    - Entrada vigente (menos de `CONNECTION_CACHE_TTL` segundos): se sirve sin consultar.
+    - Entrada vencida (hasta `CONNECTION_CACHE_STALE_TTL` segundos más): se sirve y se
+      revalida en segundo plano con `load`.
+    - Sin entrada: se consulta con `load` y se guarda.
+
+    Se cachea el timestamp de la última conexión y no el indicador `connection`, que se
+    recalcula en cada respuesta para respetar el límite de 24 horas. Los errores por UVA no se
+    cachean.
+
+    Args:
+        ids (list): Identificadores de las UVAs.
+        load (callable): Función `load(ids, deadline) -> {uva_id: estado}` que consulta las UVAs
+                         dentro del límite de tiempo `deadline`.
+        deadline (Deadline): Límite de tiempo de la petición, para las UVAs sin entrada. La
+                             revalidación en segundo plano usa su propio límite.
+
+    Returns:
+        dict: {uva_id: estado} en el orden de `ids`.
+    """
+    ids = list(dict.fromkeys(ids))
+    now = connection_cache.clock()
+    results = {}
+    missing = []
+    stale = []
+    for uva_id in ids:
+        entry = connection_cache.get(uva_id)
+        if entry is MISSING:
+            missing.append(uva_id)
+            continue
+        results[uva_id] = build_status(entry['ts'])
+        if now - entry['storedAt'] >= CONNECTION_CACHE_TTL:
+            stale.append(uva_id)
+
+    if missing:
+        results.update(load_and_cache(missing, load, deadline))
+    if stale:
+        revalidate(stale, load)
+    return {uva_id: results[uva_id] for uva_id in ids}
+
+def load_and_cache(ids, load, deadline=None):
+    """Consulta las UVAs con `load` y guarda en `connection_cache` los resultados sin error."""
+    statuses = load(ids, deadline)
+    stored_at = connection_cache.clock()
+    for uva_id, status in statuses.items():
+        if status is None or 'error' not in status:
+            connection_cache.set(uva_id, {'ts': status['ts'] if status else None, 'storedAt': stored_at})
+    return statuses
+
+def revalidate(ids, load):
+    """
+    Refresca en segundo plano las UVAs vencidas que no se estén revalidando ya.
+
+    En Lambda el hilo continúa mientras la invocación siga activa y, si el entorno se congela
+    al responder, termina en la siguiente invocación del mismo contenedor. Por eso cada
+    refresco crea su propio `Deadline(CONNECTION_DEADLINE)` al empezar, en lugar de heredar el
+    de la petición que lo programó, que puede haber vencido para entonces.
+    """
+    with _revalidating_lock:
+        ids = [uva_id for uva_id in ids if uva_id not in _revalidating]
+        _revalidating.update(ids)
+    if not ids:
+        return
+
+    def refresh():
+        try:
+            load_and_cache(ids, load, Deadline(CONNECTION_DEADLINE))
+        except Exception as e:
+            print(f"Error al revalidar la conexión de {', '.join(ids)}: {e!r}")
+        finally:
+            with _revalidating_lock:
+                _revalidating.difference_update(ids)
+
+    _revalidator.submit(refresh)
+
+def get_connection_statuses(ids, appsync_url, api_key, deadline=None):
+    """
+    Obtiene el estado de conexión de varias UVAs. Las que tienen registro en el índice de
+    última conexión (`LAST_SEEN_TABLE`) se resuelven con un `BatchGetItem`; las demás se
+    consultan en AppSync con documentos GraphQL con alias: cada documento trae la última
+    medición y la fecha de creación de hasta `CONNECTION_MAX_ALIASES / 2` UVAs en una sola
+    petición HTTP. Los documentos se envían en paralelo, con a lo sumo `CONNECTION_CONCURRENCY`
+    peticiones simultáneas.
+
+    Cada UVA se resuelve de forma aislada: si su consulta falla o su documento no termina antes
+    del límite de tiempo, solo esas UVAs se reportan con un error y las demás conservan su
+    resultado. Se espera como máximo `CONNECTION_DEADLINE` segundos o el tiempo restante de la
+    invocación, lo que ocurra primero.
+
+    Args:
+        ids (list): Identificadores de las UVAs (los repetidos se consultan una vez).
+        deadline (Deadline): Límite de tiempo de la invocación (opcional).
+
+    Returns:
+        dict: {uva_id: resultado como el de `get_connection_status`, o {"error": motivo}} en
+              el orden de `ids`. El motivo es "timeout" o "lookup_failed".
+    """
+    wait_timeout = CONNECTION_DEADLINE if deadline is None else min(CONNECTION_DEADLINE, deadline.remaining())
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return {}
+
+    statuses = {}
+    if LAST_SEEN_TABLE:
+        for uva_id, last_connection in get_last_seen(LAST_SEEN_TABLE, ids, deadline).items():
+            statuses[uva_id] = build_status(last_connection)
+    pending = [uva_id for uva_id in ids if uva_id not in statuses]
+    if not pending:
+        return {uva_id: statuses[uva_id] for uva_id in ids}
+
+    # Dos alias por UVA: última medición y fecha de creación
+    ids_per_document = max(1, CONNECTION_MAX_ALIASES // 2)
+    chunks = [pending[start:start + ids_per_document] for start in range(0, len(pending), ids_per_document)]
+
+    executor = ThreadPoolExecutor(max_workers=min(CONNECTION_CONCURRENCY, len(chunks)))
+    futures = [executor.submit(get_connection_chunk, chunk, appsync_url, api_key, deadline) for chunk in chunks]
+    done, _ = wait(futures, timeout=wait_timeout)
+    # No esperar a las consultas pendientes: la respuesta sale con lo obtenido hasta el límite
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    for chunk, future in zip(chunks, futures):
+        if future not in done:
+            print(f"Tiempo agotado al consultar la conexión de {', '.join(chunk)}")
+            statuses.update((uva_id, {"error": "timeout"}) for uva_id in chunk)
+        elif future.exception() is not None:
+            print(f"Error al consultar la conexión de {', '.join(chunk)}: {future.exception()!r}")
+            statuses.update((uva_id, {"error": "lookup_failed"}) for uva_id in chunk)
+        else:
+            statuses.update(future.result())
+    return {uva_id: statuses[uva_id] for uva_id in ids}
+
+def get_connection_chunk(ids, appsync_url, api_key, deadline=None):
+    """
+    Consulta en un solo documento GraphQL la última medición de cada UVA de `ids` y, si no está
+    memorizada en `creation_dates`, su fecha de creación, y calcula su estado de conexión.
+
+    Con el índice de última conexión configurado, las UVAs con fecha de creación memorizada
+    (sin mediciones) se resuelven sin consultar AppSync, como en `get_last_connection`.
+
+    Returns:
+        dict: {uva_id: {"connection", "ts"}, None si no hay información, o
+              {"error": "lookup_failed"} si la consulta de esa UVA falló
+              ({"error": "timeout"} si fue por el límite de tiempo de la invocación y
+              {"error": "unavailable"} si el circuito de AppSync está abierto)}.
+    """
+    statuses = {}
+    operations = []
+    # (uva_id, índice de su medición en `operations`, índice de su getUVA o None)
+    queried = []
+    for uva_id in ids:
+        creation_date = creation_dates.get(uva_id)
+        if creation_date is not MISSING and LAST_SEEN_TABLE:
+            statuses[uva_id] = build_status(creation_date)
+            continue
+        queried.append((uva_id, len(operations), None if creation_date is not MISSING else len(operations) + 1))
+        operations.append(Operation(
+            'measurementsByUvaIDAndTs',
+            {'uvaID': ('ID!', uva_id), 'sortDirection': ('ModelSortDirection', 'DESC'), 'limit': ('Int', 1)},
+            selection='items { ts }',
+            input_object=False
+        ))
+        if creation_date is MISSING:
+            operations.append(Operation('getUVA', {'id': ('ID!', uva_id)}, selection='createdAt', input_object=False))
+    if not operations:
+        return statuses
+
+    results = get_graphql_client(appsync_url, api_key).execute_batch(
+        operations, kind='query', max_operations=len(operations), deadline=deadline, hedge=CONNECTION_HEDGED_READS
+    )
+
+    for uva_id, measurements_index, uva_index in queried:
+        measurements = results[measurements_index]
+        if isinstance(measurements, GraphQLError):
+            print(f"Error al consultar la última medición de {uva_id}: {measurements}")
+            statuses[uva_id] = {"error": lookup_error(measurements)}
+            continue
+        items = (measurements or {}).get('items') or []
+        last_connection = parse_timestamp(items[0].get('ts')) if items else None
+        if last_connection is None:
+            # Sin mediciones: se usa la fecha de creación, memorizada o llegada en el mismo documento
+            if uva_index is None:
+                last_connection = creation_dates.get(uva_id)
+                last_connection = None if last_connection is MISSING else last_connection
+            elif isinstance(results[uva_index], GraphQLError):
+                print(f"Error al consultar la fecha de creación de {uva_id}: {results[uva_index]}")
+                statuses[uva_id] = {"error": "lookup_failed"}
+                continue
+            else:
+                last_connection = remember_creation_date(uva_id, {'getUVA': results[uva_index]})
+        statuses[uva_id] = build_status(last_connection)
+    return statuses
+
+def lookup_error(error):
+    """
+    Motivo que se reporta para una UVA cuya consulta falló.
+
+    Returns:
+        str: "timeout" (límite de tiempo de la invocación), "unavailable" (circuito de AppSync
+             abierto) o "lookup_failed".
+    """
+    if isinstance(error, GraphQLDeadlineExceeded):
+        return "timeout"
+    if isinstance(error, GraphQLCircuitOpen):
+        return "unavailable"
+    return "lookup_failed"
+
+def get_connection_status(uva_id, appsync_url, api_key, deadline=None):
+    """
+    Obtiene el estado de conexión de una UVA basada en la última medición registrada: primero
+    en el índice de última conexión y, si no tiene registro, en AppSync.
 
     Args:
         uva_id (str): Identificador único de la UVA.
+        deadline (Deadline): Límite de tiempo de la invocación (opcional).
 
     Returns:
         dict: Diccionario con el estado de conexión (`connection`) y el timestamp (`ts`)
-              si se encontró la última conexión.
+              si se encontró la última conexión, {"error": "timeout"} si se agotó `deadline`, o
+              {"error": "unavailable"} si el circuito de AppSync está abierto.
         None: Si no se encontró información de conexión para la UVA especificada.
     """
-    # Obtener la última conexión (timestamp en UNIX ms) usando la función auxiliar
-    lastConnection = get_last_connection(uva_id, appsync_url, api_key)
+    # Leer el índice de última conexión (una lectura por clave) antes de consultar AppSync
+    lastConnection = get_last_seen(LAST_SEEN_TABLE, [uva_id], deadline).get(uva_id) if LAST_SEEN_TABLE else None
+    if lastConnection is None:
+        # Obtener la última conexión (timestamp en UNIX ms) usando la función auxiliar
+        try:
+            lastConnection = get_last_connection(uva_id, appsync_url, api_key, deadline)
+        except (GraphQLDeadlineExceeded, GraphQLCircuitOpen) as e:
+            print(f"Sin respuesta de AppSync para la conexión de {uva_id}: {e}")
+            return {"error": lookup_error(e)}
+
+    return build_status(lastConnection)
+
+def build_status(lastConnection):
+    """
+    Construye el estado de conexión a partir del timestamp de la última conexión.
 
+    Returns:
+        dict: {"connection", "ts"}, o None si no hay timestamp.
+    """
     # Validar si se obtuvo la última conexión
     if not lastConnection:
         # validar si fue creada
@@ -74,6 +735,17 @@ def get_connection_status(uva_id, appsync_url, api_key):
         "ts": lastConnection   # Timestamp de la última conexión
     }
 
+def parse_timestamp(value):
+    """
+    Convierte un timestamp ISO-8601 de AppSync (con sufijo Z) a UNIX en milisegundos.
+
+    Returns:
+        int: Timestamp en milisegundos, o None si `value` está vacío.
+    """
+    if not value:
+        return None
+    return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp() * 1000)
+
 def is_within_last_24_hours(last_connection):
     """
     Verifica si la última conexión está dentro de las últimas 24 horas (en UTC).
@@ -88,92 +760,75 @@ def is_within_last_24_hours(last_connection):
     twenty_four_hours_ago = now - (24 * 60 * 60 * 1000)  # Hace 24 horas en ms
     return twenty_four_hours_ago <= last_connection <= now
 
-def get_last_connection(uva_id, appsync_url, api_key):
+def get_last_connection(uva_id, appsync_url, api_key, deadline=None):
     """
     Obtiene la última medición registrada para un dispositivo específico (UVA) utilizando una consulta GraphQL.
 
+    La misma consulta trae la fecha de creación de la UVA (`getUVA.createdAt`), que se usa si no
+    hay mediciones, de modo que el fallback no cuesta una petición adicional. Esa fecha se
+    memoriza en `creation_dates`: con el índice de última conexión configurado, una UVA
+    memorizada sin mediciones que sigue sin registro en el índice no vuelve a consultar AppSync.
+
     Args:
         uva_id (str): Identificador único de la UVA para la cual se desea obtener la última medición.
 
     Returns:
-        int: Timestamp de la última medición en formato UNIX (milisegundos) si existe, o `None` en caso contrario.
+        int: Timestamp de la última medición (o de la creación de la UVA si no tiene mediciones)
+             en formato UNIX (milisegundos), o `None` si no se encontró ninguno.
 
     Raises:
-        ValueError: Si la respuesta de la API no tiene éxito o si hay un error al procesar los datos.
+        GraphQLDeadlineExceeded: Si se agotó `deadline` antes de obtener respuesta.
+        GraphQLCircuitOpen: Si el circuito de AppSync está abierto.
     """
+    creation_date = creation_dates.get(uva_id)
+    if creation_date is not MISSING and LAST_SEEN_TABLE:
+        # No tenía mediciones al memorizarla y, si las tuviera, el índice ya las registraría
+        return creation_date
+
     # Variables para la consulta
     variables = {
         "uvaID": uva_id
     }
 
-    # Consulta GraphQL
-    query = """
-    query lastMeasurement($uvaID: ID!) {
-        measurementsByUvaIDAndTs(uvaID: $uvaID, sortDirection: DESC, limit: 1) {
-            items {
-                ts
-                createdAt
-            }
-        }
-    }
-    """
+    # Consulta GraphQL (sin `getUVA` si la fecha de creación ya está memorizada)
+    query = LAST_MEASUREMENT_QUERY if creation_date is not MISSING else LAST_CONNECTION_QUERY
 
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": api_key  # Usamos el API Key para autenticarnos
-    }
-
-    # Realizar la solicitud POST
-    response = requests.post(
-        appsync_url,
-        headers=headers,
-        json={'query': query, 'variables': variables}
-    )
-
-    
-    if response.status_code == 200:
-        data = response.json()
-        items = data.get('data', {}).get('measurementsByUvaIDAndTs', {}).get('items', [])
-        created_at = items[0].get('ts') if items else None
-        if created_at:
-            return int(datetime.fromisoformat(created_at.replace('Z', '+00:00')).timestamp() * 1000) if created_at else None
-        else:
-            creation_date = get_creation_date(uva_id, appsync_url, api_key)
-            return creation_date
-
-    else:
+    # Ejecutar la consulta (con límite de tiempo, reintentos y, si está habilitado, petición duplicada)
+    try:
+        data = get_graphql_client(appsync_url, api_key).execute(
+            query, variables, deadline=deadline, hedge=CONNECTION_HEDGED_READS
+        )
+    except (GraphQLDeadlineExceeded, GraphQLCircuitOpen):
+        raise
+    except GraphQLResponseError as e:
+        # Respuesta parcial: un error en `getUVA` no invalida la medición y viceversa
+        print(f"Error al consultar la última conexión de {uva_id}: {e}")
+        data = e.data if isinstance(e.data, dict) else {}
+        if not data:
+            return None
+    except GraphQLError as e:
+        print(f"Error al consultar la última conexión de {uva_id}: {e}")
         return None
 
-def get_creation_date(uva_id, appsync_url, api_key):
-    # Variables para la consulta
-    variables = {
-        "uvaID": uva_id
-    }
+    items = (data.get('measurementsByUvaIDAndTs') or {}).get('items') or []
+    last_measurement = items[0].get('ts') if items else None
+    if last_measurement:
+        return parse_timestamp(last_measurement)
+    if creation_date is MISSING:
+        creation_date = remember_creation_date(uva_id, data)
+    return None if creation_date is MISSING else creation_date
 
-    # Consulta GraphQL
-    query = """
-    query lastMeasurement($uvaID: ID!) {
-        getUVA(id: $uvaID) {
-            createdAt
-        }
-    }
+def remember_creation_date(uva_id, data):
     """
+    Extrae `getUVA.createdAt` de una respuesta y lo memoriza si la consulta de `getUVA` tuvo
+    respuesta (`getUVA: null`, una UVA inexistente, se memoriza como negativo con TTL corto).
 
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": api_key  # Usamos el API Key para autenticarnos
-    }
-
-    # Realizar la solicitud POST
-    response = requests.post(
-        appsync_url,
-        headers=headers,
-        json={'query': query, 'variables': variables}
-    )
-    
-    if response.status_code == 200:
-        data = response.json()
-        created_at = data.get('data', {}).get('getUVA', {}).get('createdAt')
-        return int(datetime.fromisoformat(created_at.replace('Z', '+00:00')).timestamp() * 1000) if created_at else None
-    else:
-        return None
\ No newline at end of file
+    Returns:
+        int: Fecha de creación en milisegundos, None si la UVA no existe, o `MISSING` si la
+             respuesta no trae `getUVA`.
+    """
+    if 'getUVA' not in data:
+        return MISSING
+    creation_date = parse_timestamp((data['getUVA'] or {}).get('createdAt'))
+    creation_dates.set(uva_id, creation_date)
+    return creation_date
@@ -0,0 +1,6 @@
+"""
+Utilidades compartidas por las funciones Lambda de UVA-App-Integrations.
+
+Este paquete se despliega como una capa (Layer) de Lambda (ver `CommonLayer` en
+template.yaml) y queda disponible en `/opt/python` para todas las funciones.
+"""
@@ -0,0 +1,206 @@
+"""
+Caché de dos niveles para búsquedas que casi nunca cambian.
+
+Nivel 1: LRU en memoria con TTL, que vive mientras el contenedor de Lambda esté caliente.
+Nivel 2: almacén SQLite en `/tmp` (o `CacheDir`), que sobrevive a las invocaciones del mismo
+contenedor aunque el nivel 1 se haya vaciado y permite compartir valores entre cachés
+reconstruidas. Ambos niveles guardan también resultados negativos (valor `None`) con un TTL
+propio, más corto.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Directorio del almacén en disco (en Lambda solo /tmp es escribible)
+CACHE_DIR = os.environ.get('CacheDir', '/tmp')
+CACHE_FILE = 'uva-cache.sqlite3'
+
+# Marca de "no está en caché" (distinta de un resultado negativo cacheado, que es None)
+MISSING = object()
+
+
+class TwoTierCache:
+    """
+    Caché LRU en memoria con TTL respaldada por un almacén SQLite en disco.
+
+    :param name: Espacio de nombres de la caché dentro del almacén en disco.
+    :param max_entries: Entradas máximas en memoria (se descarta la menos usada).
+    :param ttl: Segundos de vida de un valor encontrado.
+    :param negative_ttl: Segundos de vida de un resultado negativo (`None`).
+    :param max_disk_entries: Entradas máximas de este espacio de nombres en disco.
+    :param path: Ruta del archivo SQLite; si es None se usa `CACHE_DIR/CACHE_FILE`.
+    :param persistent: Si es False solo se usa el nivel en memoria.
+    :param clock: Función que retorna la hora actual en segundos (inyectable en pruebas).
+    """
+
+    def __init__(self, name, max_entries=1024, ttl=900, negative_ttl=60, max_disk_entries=10000,
+                 path=None, persistent=True, clock=time.time):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_disk_entries = max_disk_entries
+        self.path = path or os.path.join(CACHE_DIR, CACHE_FILE)
+        self.persistent = persistent
+        self.clock = clock
+        self.hits = 0
+        self.disk_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._writes = 0
+
+    def get(self, key):
+        """
+        Busca `key` en memoria y luego en disco.
+
+        :return: El valor cacheado (puede ser None si es un resultado negativo) o `MISSING`.
+        """
+        with self._lock:
+            value, tier = self._lookup(key)
+            if value is MISSING:
+                self.misses += 1
+                return MISSING
+            if tier == 'disk':
+                self.disk_hits += 1
+            self._count_hit(value)
+            return value
+
+    def peek(self, key):
+        """Como `get`, pero sin actualizar los contadores (para planificar lecturas por lotes)."""
+        with self._lock:
+            return self._lookup(key)[0]
+
+    def set(self, key, value, ttl=None):
+        """Guarda `value` (None para un resultado negativo) en ambos niveles."""
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        expires_at = self.clock() + ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._disk_set(key, expires_at, value)
+
+    def get_or_load(self, key, loader):
+        """
+        Retorna el valor cacheado de `key` o lo obtiene con `loader()` y lo guarda.
+
+        Las excepciones de `loader` se propagan y no se cachean.
+        """
+        value = self.get(key)
+        if value is MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        """Vacía la memoria y las entradas en disco de este espacio de nombres y reinicia los contadores."""
+        with self._lock:
+            self._memory.clear()
+            db = self._connect()
+            if db is not None:
+                with db:
+                    db.execute('DELETE FROM cache WHERE namespace = ?', (self.name,))
+            self.hits = self.disk_hits = self.negative_hits = self.misses = 0
+
+    def stats(self):
+        """Contadores de aciertos y fallos para dimensionar la caché."""
+        return {
+            'cache': self.name,
+            'hits': self.hits,
+            'diskHits': self.disk_hits,
+            'negativeHits': self.negative_hits,
+            'misses': self.misses,
+            'entries': len(self._memory)
+        }
+
+    def _lookup(self, key):
+        now = self.clock()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                return value, 'memory'
+            del self._memory[key]
+
+        entry = self._disk_get(key, now)
+        if entry is not None:
+            expires_at, value = entry
+            self._remember(key, expires_at, value)
+            return value, 'disk'
+        return MISSING, None
+
+    def _count_hit(self, value):
+        self.hits += 1
+        if value is None:
+            self.negative_hits += 1
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _connect(self):
+        if not self.persistent:
+            return None
+        if self._db is None:
+            try:
+                self._db = sqlite3.connect(self.path, timeout=1, check_same_thread=False)
+                with self._db:
+                    self._db.execute(
+                        'CREATE TABLE IF NOT EXISTS cache ('
+                        ' namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT, expires_at REAL NOT NULL,'
+                        ' PRIMARY KEY (namespace, key))'
+                    )
+            except sqlite3.Error as e:
+                # Sin almacén en disco la caché sigue funcionando solo en memoria
+                print(f"Caché {self.name}: almacén en disco no disponible ({e})")
+                self.persistent = False
+                self._db = None
+        return self._db
+
+    def _disk_get(self, key, now):
+        db = self._connect()
+        if db is None:
+            return None
+        try:
+            row = db.execute(
+                'SELECT expires_at, value FROM cache WHERE namespace = ? AND key = ?', (self.name, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Caché {self.name}: error al leer del disco ({e})")
+            return None
+        if row is None or row[0] <= now:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _disk_set(self, key, expires_at, value):
+        db = self._connect()
+        if db is None:
+            return
+        try:
+            with db:
+                db.execute(
+                    'INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                    (self.name, key, json.dumps(value), expires_at)
+                )
+                self._writes += 1
+                if self._writes % 100 == 0:
+                    self._prune(db)
+        except sqlite3.Error as e:
+            print(f"Caché {self.name}: error al escribir en disco ({e})")
+
+    def _prune(self, db):
+        # Eliminar vencidos y, si aún se excede el límite, las entradas que vencen antes
+        db.execute('DELETE FROM cache WHERE namespace = ? AND expires_at <= ?', (self.name, self.clock()))
+        db.execute(
+            'DELETE FROM cache WHERE namespace = ? AND key NOT IN ('
+            ' SELECT key FROM cache WHERE namespace = ? ORDER BY expires_at DESC LIMIT ?)',
+            (self.name, self.name, self.max_disk_entries)
+        )
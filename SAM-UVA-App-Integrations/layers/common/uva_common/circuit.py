@@ -0,0 +1,174 @@
+"""
+Interruptor de circuito ("circuit breaker") por dependencia.
+
+Cada endpoint tiene un `CircuitBreaker` compartido por todas las invocaciones del contenedor
+(`get_circuit_breaker`). Mientras está cerrado registra el resultado y la latencia de las
+últimas `CircuitWindowSize` llamadas; si al menos `CircuitMinCalls` de ellas tienen una
+proporción de fallos (errores o llamadas más lentas que `CircuitSlowCallSeconds`) mayor o igual
+a `CircuitFailureRate`, se abre y rechaza las llamadas de inmediato durante `CircuitOpenSeconds`.
+Pasado ese tiempo queda semiabierto: deja pasar hasta `CircuitHalfOpenProbes` llamadas de
+prueba; si una tiene éxito se cierra y si falla vuelve a abrirse.
+
+Así una dependencia degradada no consume el tiempo de cada registro o de cada UVA esperando
+respuestas que no llegarán.
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+
+# Llamadas recientes que se consideran para calcular la proporción de fallos
+WINDOW_SIZE = int(os.environ.get('CircuitWindowSize', '20'))
+# Llamadas mínimas en la ventana antes de evaluar la proporción de fallos
+MIN_CALLS = int(os.environ.get('CircuitMinCalls', '10'))
+# Proporción de fallos (0-1) que abre el circuito
+FAILURE_RATE = float(os.environ.get('CircuitFailureRate', '0.5'))
+# Segundos a partir de los cuales una llamada exitosa cuenta como fallo por lentitud
+SLOW_CALL_SECONDS = float(os.environ.get('CircuitSlowCallSeconds', '5'))
+# Segundos que el circuito permanece abierto antes de dejar pasar llamadas de prueba
+OPEN_SECONDS = float(os.environ.get('CircuitOpenSeconds', '30'))
+# Llamadas de prueba simultáneas mientras el circuito está semiabierto
+HALF_OPEN_PROBES = int(os.environ.get('CircuitHalfOpenProbes', '1'))
+# Latencias de llamadas exitosas que se conservan para calcular percentiles
+LATENCY_SAMPLES = 100
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto (o sin cupo de prueba) y la llamada se rechazó sin ejecutarse."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuito abierto para {name}; reintentar en {retry_after:.1f} s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Interruptor de circuito de una dependencia. Es seguro entre hilos.
+
+    Uso: `acquire()` antes de cada llamada y, al terminar, `record(success, elapsed)` con su
+    resultado o `release()` si el resultado no es atribuible a la dependencia.
+
+    :param name: Nombre de la dependencia (aparece en los errores).
+    :param clock: Función monótona que retorna la hora actual en segundos (inyectable en pruebas).
+    """
+
+    def __init__(self, name, window_size=None, min_calls=None, failure_rate=None, slow_call_seconds=None,
+                 open_seconds=None, half_open_probes=None, clock=time.monotonic):
+        self.name = name
+        self.min_calls = min_calls or MIN_CALLS
+        self.failure_rate = failure_rate or FAILURE_RATE
+        self.slow_call_seconds = slow_call_seconds or SLOW_CALL_SECONDS
+        self.open_seconds = open_seconds or OPEN_SECONDS
+        self.half_open_probes = half_open_probes or HALF_OPEN_PROBES
+        self.clock = clock
+        self.state = CLOSED
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window_size or WINDOW_SIZE)
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._opened_at = None
+        self._probes = 0
+
+    def acquire(self):
+        """
+        Autoriza una llamada.
+
+        :raises CircuitOpenError: Si el circuito está abierto o ya se usaron las llamadas de prueba.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                retry_after = self._opened_at + self.open_seconds - self.clock()
+                if retry_after > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, retry_after)
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, 0.0)
+                self._probes += 1
+
+    def record(self, success, elapsed=None):
+        """
+        Registra el resultado de una llamada autorizada con `acquire`.
+
+        :param success: Si la dependencia respondió correctamente.
+        :param elapsed: Segundos que tardó la llamada; una llamada lenta cuenta como fallo.
+        """
+        failure = not success or (elapsed is not None and elapsed >= self.slow_call_seconds)
+        with self._lock:
+            if success and elapsed is not None:
+                self._latencies.append(elapsed)
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if failure:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+            elif self.state == CLOSED:
+                self._outcomes.append(failure)
+                if len(self._outcomes) >= self.min_calls \
+                        and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                    self._open()
+            # Con el circuito abierto se ignoran los resultados de llamadas iniciadas antes de abrirlo
+
+    def release(self):
+        """
+        Libera una llamada autorizada cuyo resultado no se registra (por ejemplo, se agotó el
+        tiempo del llamador).
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def latency_percentile(self, percentile, min_samples=1):
+        """
+        Percentil de la latencia de las llamadas exitosas recientes.
+
+        :param percentile: Percentil entre 0 y 1, por ejemplo 0.95.
+        :param min_samples: Muestras mínimas para calcularlo.
+        :return: Segundos, o None si no hay suficientes muestras.
+        """
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(len(samples), max(1, math.ceil(percentile * len(samples)))) - 1]
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = self.clock()
+        self._probes = 0
+        self._outcomes.clear()
+        print(f"Circuito abierto para {self.name} durante {self.open_seconds} s")
+
+
+_lock = threading.Lock()
+_breakers = {}
+
+
+def get_circuit_breaker(name):
+    """
+    Retorna el `CircuitBreaker` de la dependencia `name`, compartido por el proceso.
+
+    :param name: Identificador de la dependencia, por ejemplo la URL del endpoint.
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def reset():
+    """Descarta todos los interruptores del proceso (útil en pruebas)."""
+    with _lock:
+        _breakers.clear()
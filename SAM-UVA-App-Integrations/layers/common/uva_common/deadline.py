@@ -0,0 +1,74 @@
+"""
+Límite de tiempo de una invocación, derivado del contexto de Lambda.
+
+Un `Deadline` se crea al inicio del handler con `Deadline.from_context(context)` y se pasa a los
+helpers de DynamoDB, SNS y AppSync: antes de cada llamada verifican que quede tiempo y recortan
+su límite de tiempo por petición al tiempo restante, de modo que una dependencia degradada no
+retiene la función hasta el `Timeout` configurado. Se reserva `DEADLINE_RESERVE_MS` para que el
+handler alcance a construir su respuesta (parcial) antes de que Lambda corte la ejecución.
+"""
+import math
+import os
+import time
+
+# Milisegundos reservados al final de la invocación para construir la respuesta
+DEADLINE_RESERVE_MS = int(os.environ.get('DeadlineReserveMillis', '1000'))
+
+
+class DeadlineExceeded(Exception):
+    """No queda tiempo para iniciar la operación dentro del límite de la invocación."""
+
+
+class Deadline:
+    """
+    Instante límite de una invocación.
+
+    :param remaining: Segundos disponibles desde ahora; None para un límite infinito.
+    :param clock: Función monótona que retorna la hora actual en segundos (inyectable en pruebas).
+    """
+
+    def __init__(self, remaining=None, clock=time.monotonic):
+        self.clock = clock
+        self.expires_at = math.inf if remaining is None else clock() + remaining
+
+    @classmethod
+    def from_context(cls, context, reserve_ms=None):
+        """
+        Crea el límite a partir de `context.get_remaining_time_in_millis()`, descontando la reserva.
+
+        Sin contexto (o si no expone el tiempo restante) el límite es infinito.
+        """
+        reserve_ms = DEADLINE_RESERVE_MS if reserve_ms is None else reserve_ms
+        remaining_ms = getattr(context, 'get_remaining_time_in_millis', None)
+        if callable(remaining_ms):
+            remaining_ms = remaining_ms()
+        if not isinstance(remaining_ms, (int, float)):
+            return cls()
+        return cls(max(0.0, (remaining_ms - reserve_ms) / 1000))
+
+    def remaining(self):
+        """Segundos que quedan (0 si ya venció, `inf` si no hay límite)."""
+        return max(0.0, self.expires_at - self.clock())
+
+    def expired(self, margin=0.0):
+        """Si quedan `margin` segundos o menos."""
+        return self.remaining() <= margin
+
+    def check(self, operation='la operación'):
+        """
+        :raises DeadlineExceeded: Si ya no queda tiempo para iniciar `operation`.
+        """
+        if self.expired():
+            raise DeadlineExceeded(f"Tiempo agotado antes de {operation}")
+
+    def timeout(self, default):
+        """
+        Recorta un límite de tiempo por petición (segundos o tupla conexión/lectura) al tiempo restante.
+
+        :raises DeadlineExceeded: Si ya no queda tiempo.
+        """
+        self.check()
+        remaining = self.remaining()
+        if isinstance(default, tuple):
+            return tuple(min(value, remaining) for value in default)
+        return min(default, remaining)
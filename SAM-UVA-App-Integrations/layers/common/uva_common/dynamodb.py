@@ -0,0 +1,125 @@
+"""
+Lecturas por lotes de DynamoDB y decodificación de sus valores.
+
+`batch_get_items` reemplaza N `GetItem` secuenciales por una o dos llamadas `BatchGetItem`:
+agrupa las claves de varias tablas en peticiones de hasta 100 claves y reintenta con backoff
+las claves que DynamoDB devuelve como `UnprocessedKeys`. `decode_number` convierte los números
+de las imágenes de DynamoDB Streams, que llegan como texto.
+"""
+import os
+import random
+import time
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from uva_common import runtime
+
+# Claves máximas por petición BatchGetItem (límite de DynamoDB)
+BATCH_GET_MAX_KEYS = 100
+# Intentos máximos por petición para reintentar UnprocessedKeys (incluido el primero)
+BATCH_GET_MAX_ATTEMPTS = int(os.environ.get('BatchGetMaxAttempts', '4'))
+# Parámetros del backoff exponencial con jitter completo (segundos)
+BACKOFF_BASE = 0.05
+BACKOFF_CAP = 1.0
+
+
+def batch_get_items(keys_by_table, key_name='id', projections=None, deadline=None):
+    """
+    Lee con `BatchGetItem` los elementos de varias tablas por su clave de partición.
+
+    Las claves repetidas se piden una sola vez. Si después de `BATCH_GET_MAX_ATTEMPTS` intentos
+    quedan claves sin procesar, o si una petición falla (error de DynamoDB o de transporte, como
+    un límite de tiempo agotado), esas claves no aparecen en `found` ni en `missing` para que el
+    llamador pueda consultarlas individualmente.
+
+    :param keys_by_table: dict {nombre de tabla: iterable de valores de clave}.
+    :param key_name: Nombre del atributo clave de partición (el mismo en todas las tablas).
+    :param projections: dict opcional {nombre de tabla: lista de atributos a leer}.
+    :param deadline: `Deadline` de la invocación: si vence, no se envían más peticiones ni
+                     reintentos y las claves pendientes quedan como no leídas.
+    :return: Tupla (found, missing): found es {tabla: {clave: elemento}} y missing es
+             {tabla: set de claves que no existen en la tabla}.
+    """
+    projections = projections or {}
+    pending = [
+        (table_name, key)
+        for table_name, keys in keys_by_table.items()
+        for key in dict.fromkeys(keys)
+    ]
+    found = {table_name: {} for table_name in keys_by_table}
+    missing = {table_name: set() for table_name in keys_by_table}
+
+    for start in range(0, len(pending), BATCH_GET_MAX_KEYS):
+        if deadline is not None and deadline.expired():
+            print(f"Tiempo agotado: {len(pending) - start} claves sin leer con BatchGetItem")
+            break
+        chunk = pending[start:start + BATCH_GET_MAX_KEYS]
+        request_items = build_request_items(chunk, key_name, projections)
+        requested = {(table_name, key) for table_name, key in chunk}
+        try:
+            items_by_table, unprocessed = fetch_chunk(request_items, deadline)
+        except (ClientError, BotoCoreError) as e:
+            print(f"Error en BatchGetItem: {e}")
+            continue
+
+        for table_name, items in items_by_table.items():
+            for item in items:
+                found[table_name][item[key_name]] = item
+                requested.discard((table_name, item[key_name]))
+        for table_name, request in unprocessed.items():
+            for key in request['Keys']:
+                requested.discard((table_name, key[key_name]))
+        for table_name, key in requested:
+            missing[table_name].add(key)
+
+    return found, missing
+
+
+def build_request_items(chunk, key_name, projections):
+    """Construye el `RequestItems` de BatchGetItem para una lista de pares (tabla, clave)."""
+    request_items = {}
+    for table_name, key in chunk:
+        request = request_items.get(table_name)
+        if request is None:
+            request = request_items[table_name] = {'Keys': []}
+            attributes = projections.get(table_name)
+            if attributes:
+                names = {f"#a{i}": name for i, name in enumerate(dict.fromkeys([key_name, *attributes]))}
+                request['ProjectionExpression'] = ', '.join(names)
+                request['ExpressionAttributeNames'] = names
+        request['Keys'].append({key_name: key})
+    return request_items
+
+
+def fetch_chunk(request_items, deadline=None):
+    """
+    Ejecuta BatchGetItem y reintenta con backoff las `UnprocessedKeys` (sin reintentar si
+    vence `deadline`).
+
+    :return: Tupla ({tabla: [elementos]}, UnprocessedKeys restantes tras el último intento).
+    """
+    dynamodb = runtime.get_resource('dynamodb')
+    items_by_table = {}
+    attempt = 1
+    while True:
+        response = dynamodb.batch_get_item(RequestItems=request_items)
+        for table_name, items in response.get('Responses', {}).items():
+            items_by_table.setdefault(table_name, []).extend(items)
+        request_items = response.get('UnprocessedKeys') or {}
+        if not request_items or attempt >= BATCH_GET_MAX_ATTEMPTS \
+                or (deadline is not None and deadline.expired()):
+            return items_by_table, request_items
+        # Jitter completo: espera aleatoria entre 0 y el tope exponencial del intento
+        delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+        time.sleep(delay if deadline is None else min(delay, deadline.remaining()))
+        attempt += 1
+
+
+def decode_number(value):
+    """
+    Convierte un número de DynamoDB (texto) a int o float sin usar excepciones como control de flujo:
+    si el texto contiene punto decimal o exponente se interpreta como float, de lo contrario como int.
+    """
+    if '.' in value or 'e' in value or 'E' in value:
+        return float(value)
+    return int(value)
@@ -0,0 +1,115 @@
+"""
+Filtros declarativos de registros de DynamoDB Streams.
+
+Los patrones usan la misma sintaxis que `FilterCriteria` de los mapeos de eventos de Lambda
+(template.yaml), de modo que un mismo patrón descarta los eventos irrelevantes antes de invocar
+la función y, de forma defensiva, dentro del handler (por ejemplo en pruebas locales o si el
+mapeo se desplegó sin filtros).
+
+Se soporta el subconjunto de la sintaxis que usan los patrones del proyecto:
+    - valores exactos: {"eventName": ["INSERT", "MODIFY"]} (null coincide con un valor nulo)
+    - {"exists": true|false}
+    - {"prefix": "texto"}
+    - {"anything-but": [valores]} o {"anything-but": valor}
+"""
+import json
+import os
+
+# Variable de entorno con el patrón (objeto JSON) o la lista de patrones de la función
+RECORD_FILTERS_ENV = 'RecordFilters'
+
+_ABSENT = object()
+
+
+def compile_pattern(pattern):
+    """
+    Compila un patrón de `FilterCriteria` en un predicado.
+
+    :param pattern: dict con el patrón, o texto JSON.
+    :return: Función `predicate(record) -> bool`.
+    :raises ValueError: Si el patrón usa un operador no soportado.
+    """
+    if isinstance(pattern, str):
+        pattern = json.loads(pattern)
+    if not isinstance(pattern, dict):
+        raise ValueError(f"El patrón debe ser un objeto JSON: {pattern!r}")
+
+    checks = []
+    for key, rule in pattern.items():
+        if isinstance(rule, dict):
+            checks.append((key, compile_pattern(rule), True))
+        elif isinstance(rule, list):
+            checks.append((key, compile_matchers(rule), False))
+        else:
+            raise ValueError(f"Regla inválida para '{key}': {rule!r}")
+
+    def predicate(record):
+        if not isinstance(record, dict):
+            return False
+        for key, check, nested in checks:
+            value = record.get(key, _ABSENT)
+            if nested:
+                if value is _ABSENT or not check(value):
+                    return False
+            elif not check(value):
+                return False
+        return True
+
+    return predicate
+
+
+def compile_matchers(matchers):
+    """
+    Compila la lista de valores/operadores de una hoja del patrón (basta con que uno coincida).
+
+    :return: Función `match(value) -> bool`; `value` es `_ABSENT` si el campo no existe.
+    """
+    compiled = [compile_matcher(matcher) for matcher in matchers]
+
+    def match(value):
+        return any(matcher(value) for matcher in compiled)
+
+    return match
+
+
+def compile_matcher(matcher):
+    """Compila un valor exacto o un operador (`exists`, `prefix`, `anything-but`)."""
+    if not isinstance(matcher, dict):
+        return lambda value: value is not _ABSENT and value == matcher
+
+    (operator, operand), = matcher.items()
+    if operator == 'exists':
+        return lambda value: (value is not _ABSENT) == bool(operand)
+    if operator == 'prefix':
+        return lambda value: isinstance(value, str) and value.startswith(operand)
+    if operator == 'anything-but':
+        excluded = operand if isinstance(operand, list) else [operand]
+        return lambda value: value is not _ABSENT and value not in excluded
+    raise ValueError(f"Operador de filtro no soportado: {operator}")
+
+
+def compile_patterns(patterns):
+    """
+    Compila una lista de patrones: un registro pasa si coincide con alguno. Sin patrones,
+    todos los registros pasan.
+
+    :param patterns: Lista de patrones, un patrón (dict) o texto JSON de cualquiera de ellos.
+    :return: Función `predicate(record) -> bool`.
+    """
+    if isinstance(patterns, str):
+        patterns = json.loads(patterns) if patterns.strip() else []
+    if isinstance(patterns, dict):
+        patterns = [patterns]
+    predicates = [compile_pattern(pattern) for pattern in patterns]
+    if not predicates:
+        return lambda record: True
+    return lambda record: any(predicate(record) for predicate in predicates)
+
+
+def load_record_filter(env_name=RECORD_FILTERS_ENV):
+    """
+    Compila los patrones de la variable de entorno `env_name` (los mismos de `FilterCriteria`).
+
+    :return: Función `predicate(record) -> bool`; acepta todo si la variable no está definida.
+    """
+    return compile_patterns(os.environ.get(env_name, ''))
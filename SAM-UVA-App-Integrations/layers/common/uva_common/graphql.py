@@ -0,0 +1,425 @@
+"""
+Cliente GraphQL compartido para las APIs de AppSync.
+
+Centraliza lo que antes se repetía en cada función: construcción de encabezados, autenticación
+(API Key o IAM/SigV4), límite de tiempo por petición, reintentos con backoff exponencial con
+jitter ante throttling y errores 5xx, y validación de la respuesta, que expone los arreglos
+`errors` de GraphQL como excepciones tipadas. Cada endpoint pasa por un interruptor de circuito
+(`uva_common.circuit`) compartido por el contenedor, y las lecturas idempotentes pueden enviarse
+duplicadas ("hedged") cuando la primera petición supera el p95 de latencia del endpoint.
+"""
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import NamedTuple
+
+import requests
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.exceptions import BotoCoreError, NoCredentialsError
+
+from uva_common import runtime
+from uva_common.circuit import CircuitOpenError, get_circuit_breaker
+from uva_common.deadline import DeadlineExceeded
+
+# Límite de tiempo (segundos) para establecer la conexión y para esperar la respuesta
+CONNECT_TIMEOUT = float(os.environ.get('GraphQLConnectTimeout', '3.05'))
+READ_TIMEOUT = float(os.environ.get('GraphQLReadTimeout', '10'))
+# Número máximo de intentos por petición (incluido el primero)
+MAX_ATTEMPTS = int(os.environ.get('GraphQLMaxAttempts', '3'))
+# Parámetros del backoff exponencial con jitter completo (segundos)
+BACKOFF_BASE = 0.1
+BACKOFF_CAP = 2.0
+# Operaciones máximas por documento en `execute_batch`
+MAX_BATCH_OPERATIONS = int(os.environ.get('GraphQLMaxBatchOperations', '25'))
+# Códigos HTTP que indican throttling o fallas transitorias del servicio
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# Errores de `requests` transitorios (sin respuesta o respuesta interrumpida), que se reintentan
+# en las operaciones idempotentes y cuentan como fallas en el interruptor de circuito
+TRANSIENT_REQUEST_ERRORS = (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError)
+# Percentil de latencia del endpoint a partir del cual se envía la petición duplicada
+HEDGE_PERCENTILE = 0.95
+# Latencias mínimas registradas del endpoint antes de enviar peticiones duplicadas
+HEDGE_MIN_SAMPLES = int(os.environ.get('GraphQLHedgeMinSamples', '20'))
+
+AUTH_API_KEY = 'API_KEY'
+AUTH_IAM = 'AWS_IAM'
+
+
+class GraphQLError(Exception):
+    """Error base de las peticiones GraphQL."""
+
+
+class GraphQLTransportError(GraphQLError):
+    """La petición no obtuvo respuesta utilizable (timeout, conexión, otro error de `requests` o de firma)."""
+
+
+class GraphQLDeadlineExceeded(GraphQLTransportError):
+    """Se agotó el límite de tiempo de la invocación (`Deadline`) antes de obtener respuesta."""
+
+
+class GraphQLCircuitOpen(GraphQLTransportError):
+    """El circuito del endpoint está abierto: la petición se rechazó sin enviarse."""
+
+
+class GraphQLHTTPError(GraphQLError):
+    """AppSync respondió con un código HTTP distinto de 200."""
+
+    def __init__(self, status_code, body):
+        super().__init__(f"{status_code} - {body}")
+        self.status_code = status_code
+        self.body = body
+
+
+class GraphQLResponseError(GraphQLError):
+    """La respuesta contiene un arreglo `errors` (o no es una respuesta GraphQL válida)."""
+
+    def __init__(self, errors, data=None):
+        messages = '; '.join(str(error.get('message', error)) for error in errors)
+        super().__init__(messages)
+        self.errors = errors
+        self.data = data
+
+    @property
+    def error_types(self):
+        """Conjunto de `errorType` reportados por AppSync (por ejemplo 'DynamoDB:ConditionalCheckFailedException')."""
+        return {error.get('errorType') for error in self.errors if error.get('errorType')}
+
+
+class Operation(NamedTuple):
+    """
+    Campo raíz de una operación GraphQL que se envía junto a otras en un documento con alias.
+
+    :param field: Campo raíz, por ejemplo 'createDevice'.
+    :param arguments: dict {argumento: (tipo GraphQL, valor)}, por ejemplo {'id': ('ID!', 'uva1')}.
+    :param selection: Selección de campos de la respuesta.
+    :param input_object: Si los argumentos se envían dentro de `input: {...}` (mutaciones de Amplify).
+    """
+    field: str
+    arguments: dict
+    selection: str = 'id'
+    input_object: bool = True
+
+
+class GraphQLClient:
+    """
+    Cliente de un endpoint GraphQL de AppSync.
+
+    Usa la sesión HTTP keep-alive compartida del endpoint (`runtime.get_http_session`). Si se
+    proporciona `api_key` autentica con el encabezado `x-api-key`; de lo contrario firma cada
+    intento con SigV4 usando las credenciales de la función. Todas las peticiones al endpoint
+    pasan por su interruptor de circuito (`breaker`).
+    """
+
+    def __init__(self, url, api_key=None, region='us-east-1', timeout=None, max_attempts=None):
+        self.url = url
+        self.api_key = api_key
+        self.auth = AUTH_API_KEY if api_key else AUTH_IAM
+        self.region = region
+        self.timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+        self.max_attempts = max_attempts or MAX_ATTEMPTS
+
+    @property
+    def breaker(self):
+        """Interruptor de circuito del endpoint, compartido por todos los clientes de la misma URL."""
+        return get_circuit_breaker(self.url)
+
+    def execute(self, query, variables=None, operation_name=None, idempotent=True, timeout=None, deadline=None,
+                hedge=False):
+        """
+        Ejecuta una operación GraphQL y retorna el objeto `data` de la respuesta.
+
+        Los errores transitorios (`TRANSIENT_REQUEST_ERRORS` y HTTP 429 y 5xx) se reintentan
+        hasta `max_attempts` veces con backoff exponencial con jitter. Las operaciones no
+        idempotentes (`idempotent=False`) solo se reintentan ante HTTP 429, que AppSync rechaza
+        sin ejecutar la operación. Los demás errores de `requests` y los de credenciales al
+        firmar la petición no se reintentan y se lanzan como `GraphQLTransportError`.
+
+        Si el circuito del endpoint está abierto la petición falla de inmediato, sin reintentos.
+        Con `hedge=True` (solo para lecturas idempotentes), si la petición no responde dentro del
+        p95 de latencia del endpoint se envía una copia y se usa la primera respuesta.
+
+        :param query: Documento GraphQL.
+        :param variables: Variables de la operación.
+        :param operation_name: Nombre de la operación a ejecutar dentro del documento.
+        :param idempotent: Si la operación puede repetirse sin efectos adicionales.
+        :param timeout: Límite de tiempo de esta petición (segundos o tupla conexión/lectura).
+        :param deadline: `Deadline` de la invocación: cada intento recorta su límite de tiempo al
+                         tiempo restante y no se inicia un intento (ni una espera) si ya venció.
+        :param hedge: Si se envía una petición duplicada cuando la primera supera el p95 de latencia.
+        :return: dict con el contenido de `data`.
+        :raises GraphQLCircuitOpen: Si el circuito del endpoint está abierto.
+        :raises GraphQLDeadlineExceeded: Si se agotó `deadline` sin obtener respuesta.
+        :raises GraphQLTransportError: Si no se obtuvo una respuesta utilizable o no se pudo firmar.
+        :raises GraphQLHTTPError: Si AppSync respondió con un código distinto de 200.
+        :raises GraphQLResponseError: Si la respuesta trae `errors`; la excepción conserva `data`
+                                      para respuestas parciales.
+        """
+        payload = {'query': query, 'variables': variables or {}}
+        if operation_name:
+            payload['operationName'] = operation_name
+        body = json.dumps(payload)
+
+        attempt = 1
+        while True:
+            request_timeout = timeout or self.timeout
+            if deadline is not None:
+                try:
+                    request_timeout = deadline.timeout(request_timeout)
+                except DeadlineExceeded as e:
+                    raise GraphQLDeadlineExceeded("Tiempo agotado antes de consultar AppSync") from e
+            try:
+                response = self._post(body, request_timeout, deadline, hedge=hedge and idempotent)
+            except CircuitOpenError as e:
+                raise GraphQLCircuitOpen(str(e)) from e
+            except requests.RequestException as e:
+                if deadline is not None and deadline.expired():
+                    raise GraphQLDeadlineExceeded(f"Tiempo agotado esperando a AppSync: {e}") from e
+                if isinstance(e, TRANSIENT_REQUEST_ERRORS) and idempotent and attempt < self.max_attempts:
+                    self._backoff(attempt, deadline)
+                    attempt += 1
+                    continue
+                raise GraphQLTransportError(f"Sin respuesta de AppSync: {e}") from e
+            except BotoCoreError as e:
+                raise GraphQLTransportError(f"No se pudo firmar la petición a AppSync: {e}") from e
+
+            status_code = response.status_code
+            if status_code in RETRYABLE_STATUS_CODES and attempt < self.max_attempts \
+                    and (idempotent or status_code == 429) and (deadline is None or not deadline.expired()):
+                self._backoff(attempt, deadline)
+                attempt += 1
+                continue
+            if status_code != 200:
+                raise GraphQLHTTPError(status_code, response.text)
+            return parse_response(response)
+
+    def execute_batch(self, operations, kind='mutation', max_operations=None, idempotent=True, deadline=None,
+                      hedge=False):
+        """
+        Ejecuta varias operaciones en documentos GraphQL con alias (`op0: createDevice(...)`),
+        con a lo sumo `max_operations` operaciones por documento, en lugar de una petición HTTP
+        por operación.
+
+        Los errores se asignan a cada operación por el `path` que reporta AppSync, de modo que
+        una operación fallida no invalida a las demás del mismo documento. Si el documento
+        completo falla (sin respuesta, HTTP distinto de 200), el error se asigna a todas sus
+        operaciones.
+
+        :param operations: Lista de `Operation`.
+        :param kind: 'mutation' o 'query'.
+        :param max_operations: Operaciones máximas por documento (por defecto `MAX_BATCH_OPERATIONS`).
+        :param idempotent: Si las operaciones pueden repetirse sin efectos adicionales.
+        :param deadline: `Deadline` de la invocación (ver `execute`); los documentos que no
+                         alcanzan a enviarse fallan con `GraphQLDeadlineExceeded`.
+        :param hedge: Si los documentos se envían duplicados al superar el p95 (ver `execute`).
+        :return: Lista, en el orden de `operations`, con el resultado de cada operación
+                 (el valor de su campo en `data`) o la excepción `GraphQLError` que la hizo fallar.
+        """
+        max_operations = max_operations or MAX_BATCH_OPERATIONS
+        results = []
+        for start in range(0, len(operations), max_operations):
+            chunk = operations[start:start + max_operations]
+            document, variables = build_aliased_document(chunk, kind)
+            aliases = [f"op{i}" for i in range(len(chunk))]
+            try:
+                data = self.execute(document, variables, idempotent=idempotent, deadline=deadline, hedge=hedge)
+                errors = []
+            except GraphQLResponseError as e:
+                data = e.data if isinstance(e.data, dict) else {}
+                errors = e.errors
+            except GraphQLError as e:
+                results.extend(e for _ in chunk)
+                continue
+            results.extend(split_aliased_result(aliases, data, errors))
+        return results
+
+    def _post(self, body, timeout, deadline=None, hedge=False):
+        """
+        Envía un intento y, con `hedge`, una copia si no responde dentro del p95 del endpoint.
+
+        La petición que pierde la carrera no se puede cancelar: termina en segundo plano y su
+        resultado solo se registra en el interruptor de circuito.
+
+        :return: Respuesta HTTP de la primera petición que responda.
+        :raises CircuitOpenError: Si el circuito del endpoint está abierto.
+        :raises requests.RequestException: Si ninguna petición obtuvo respuesta (la de la primera).
+        :raises BotoCoreError: Si no se pudo firmar la petición (cliente IAM).
+        """
+        delay = self.breaker.latency_percentile(HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES) if hedge else None
+        if delay is None:
+            return self._send(body, timeout, deadline)
+
+        primary = _hedge_pool.submit(self._send, body, timeout, deadline)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        try:
+            hedge_timeout = deadline.timeout(timeout) if deadline is not None else timeout
+        except DeadlineExceeded:
+            return primary.result()
+        pending = {primary, _hedge_pool.submit(self._send, body, hedge_timeout, deadline)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+        return primary.result()
+
+    def _send(self, body, timeout, deadline=None):
+        """Envía una petición HTTP y registra su resultado y latencia en el interruptor de circuito."""
+        breaker = self.breaker
+        breaker.acquire()
+        started = time.monotonic()
+        try:
+            response = runtime.get_http_session(self.url).post(
+                self.url,
+                headers=self._headers(body),
+                data=body,
+                timeout=timeout
+            )
+        except TRANSIENT_REQUEST_ERRORS:
+            if deadline is not None and deadline.expired():
+                # Se agotó el tiempo del llamador, no necesariamente el del endpoint
+                breaker.release()
+            else:
+                breaker.record(False)
+            raise
+        except Exception:
+            breaker.release()
+            raise
+        breaker.record(response.status_code not in RETRYABLE_STATUS_CODES, time.monotonic() - started)
+        return response
+
+    def _headers(self, body):
+        if self.auth == AUTH_API_KEY:
+            return {'Content-Type': 'application/json', 'x-api-key': self.api_key}
+        return sign_request(self.url, body, self.region)
+
+    @staticmethod
+    def _backoff(attempt, deadline=None):
+        # Jitter completo: espera aleatoria entre 0 y el tope exponencial del intento, sin
+        # exceder el tiempo restante de la invocación
+        delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+        if deadline is not None:
+            delay = min(delay, deadline.remaining())
+        time.sleep(delay)
+
+
+def parse_response(response):
+    """
+    Valida el cuerpo de una respuesta HTTP 200 de AppSync.
+
+    :param response: Respuesta HTTP.
+    :return: dict con el contenido de `data`.
+    :raises GraphQLResponseError: Si el cuerpo no es JSON, trae `errors` o no trae `data`.
+    """
+    try:
+        content = response.json()
+    except ValueError:
+        raise GraphQLResponseError([{'message': f"Respuesta no JSON: {response.text}"}])
+    if not isinstance(content, dict):
+        raise GraphQLResponseError([{'message': f"Respuesta inesperada: {content}"}])
+
+    data = content.get('data')
+    errors = content.get('errors')
+    if errors:
+        raise GraphQLResponseError(errors, data)
+    if not isinstance(data, dict):
+        raise GraphQLResponseError([{'message': 'La respuesta no contiene data'}])
+    return data
+
+
+def build_aliased_document(operations, kind='mutation'):
+    """
+    Construye un documento GraphQL con un alias `op{i}` y variables `$op{i}_{argumento}` por operación.
+
+    :return: Tupla (documento, variables).
+    """
+    declarations = []
+    fields = []
+    variables = {}
+    for i, operation in enumerate(operations):
+        alias = f"op{i}"
+        arguments = []
+        for name, (graphql_type, value) in operation.arguments.items():
+            variable = f"{alias}_{name}"
+            declarations.append(f"${variable}: {graphql_type}")
+            arguments.append(f"{name}: ${variable}")
+            variables[variable] = value
+        arguments = ', '.join(arguments)
+        if operation.input_object:
+            arguments = f"input: {{{arguments}}}"
+        fields.append(f"  {alias}: {operation.field}({arguments}) {{ {operation.selection} }}")
+    document = f"{kind} batch({', '.join(declarations)}) {{\n" + '\n'.join(fields) + "\n}"
+    return document, variables
+
+
+def split_aliased_result(aliases, data, errors):
+    """
+    Reparte la respuesta de un documento con alias entre sus operaciones.
+
+    :param aliases: Alias del documento en orden.
+    :param data: Objeto `data` de la respuesta (puede ser parcial).
+    :param errors: Arreglo `errors` de la respuesta.
+    :return: Lista con el valor de cada alias o un `GraphQLResponseError` con sus errores.
+    """
+    errors_by_alias = {}
+    global_errors = []
+    for error in errors:
+        path = error.get('path') or []
+        if path and path[0] in aliases:
+            errors_by_alias.setdefault(path[0], []).append(error)
+        else:
+            global_errors.append(error)
+
+    results = []
+    for alias in aliases:
+        value = data.get(alias)
+        alias_errors = errors_by_alias.get(alias)
+        if not alias_errors and value is None and global_errors:
+            # Errores sin path (por ejemplo de validación del documento) afectan a los alias sin datos
+            alias_errors = global_errors
+        results.append(GraphQLResponseError(alias_errors, value) if alias_errors else value)
+    return results
+
+
+def sign_request(url, body, region):
+    """
+    Firma una petición POST a AppSync con IAM usando SigV4.
+
+    :return: Encabezados firmados de la petición.
+    :raises NoCredentialsError: Si no hay credenciales disponibles.
+    """
+    credentials = runtime.get_boto_session().get_credentials()
+    if credentials is None:
+        raise NoCredentialsError()
+    credentials = credentials.get_frozen_credentials()
+    request = AWSRequest(method='POST', url=url, data=body, headers={'Content-Type': 'application/json'})
+    SigV4Auth(credentials, 'appsync', region).add_auth(request)
+    return dict(request.headers.items())
+
+
+# Hilos para las peticiones duplicadas (la original y su copia se envían desde este pool)
+_hedge_pool = ThreadPoolExecutor(max_workers=2 * runtime.MAX_POOL_CONNECTIONS)
+
+_clients_lock = threading.Lock()
+_clients = {}
+
+
+def get_graphql_client(url, api_key=None, region='us-east-1'):
+    """
+    Retorna un `GraphQLClient` en caché para el endpoint y la autenticación indicados.
+
+    :param url: URL GraphQL de AppSync.
+    :param api_key: API Key; si se omite se usa IAM/SigV4.
+    :param region: Región para la firma SigV4.
+    """
+    key = (url, api_key, region)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.setdefault(key, GraphQLClient(url, api_key=api_key, region=region))
+    return client
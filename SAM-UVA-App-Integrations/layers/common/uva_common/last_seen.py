@@ -0,0 +1,83 @@
+"""
+Índice materializado de la última conexión de cada UVA.
+
+La tabla LastSeen guarda un elemento por UVA (`uvaID` → `ts`, timestamp UNIX en milisegundos de
+su medición más reciente). La escribe el procesador del stream de Measurement con una
+actualización condicional monótona, de modo que un `ts` menor nunca reemplaza a uno mayor aunque
+los registros lleguen desordenados o se reprocesen, y la lee `/connection` con `GetItem` o
+`BatchGetItem` en lugar de consultar el historial de mediciones en AppSync.
+"""
+from botocore.exceptions import BotoCoreError, ClientError
+
+from uva_common import runtime
+from uva_common.dynamodb import batch_get_items
+
+KEY_NAME = 'uvaID'
+TS_ATTRIBUTE = 'ts'
+
+
+def record_last_seen(table_name, uva_id, ts):
+    """
+    Guarda `ts` como última conexión de la UVA si es mayor que el registrado.
+
+    :param table_name: Nombre de la tabla LastSeen.
+    :param uva_id: Identificador de la UVA.
+    :param ts: Timestamp UNIX en milisegundos de la medición.
+    :return: True si se actualizó, False si ya había un `ts` igual o mayor.
+    :raises ClientError: Si DynamoDB rechaza la escritura por otro motivo.
+    """
+    try:
+        runtime.get_table(table_name).update_item(
+            Key={KEY_NAME: uva_id},
+            UpdateExpression='SET #ts = :ts',
+            ConditionExpression='attribute_not_exists(#ts) OR #ts < :ts',
+            ExpressionAttributeNames={'#ts': TS_ATTRIBUTE},
+            ExpressionAttributeValues={':ts': ts}
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return False
+        raise
+    return True
+
+
+def get_last_seen(table_name, uva_ids, deadline=None):
+    """
+    Lee la última conexión de varias UVAs: `GetItem` para una sola y `BatchGetItem` para varias.
+
+    Los errores de lectura (de DynamoDB o de transporte, como un límite de tiempo agotado) no se
+    propagan: las UVAs que no se pudieron leer simplemente no aparecen en el resultado, igual
+    que las que no tienen registro, para que el llamador use su consulta de respaldo.
+
+    :param table_name: Nombre de la tabla LastSeen.
+    :param uva_ids: Identificadores de las UVAs.
+    :param deadline: `Deadline` de la invocación; si ya venció no se lee nada.
+    :return: dict {uva_id: ts en milisegundos (int)} de las UVAs con registro.
+    """
+    uva_ids = list(dict.fromkeys(uva_ids))
+    if not uva_ids or (deadline is not None and deadline.expired()):
+        return {}
+
+    if len(uva_ids) == 1:
+        try:
+            item = runtime.get_table(table_name).get_item(
+                Key={KEY_NAME: uva_ids[0]},
+                ProjectionExpression='#ts',
+                ExpressionAttributeNames={'#ts': TS_ATTRIBUTE}
+            ).get('Item')
+        except (ClientError, BotoCoreError) as e:
+            print(f"Error al leer la última conexión de {uva_ids[0]}: {e}")
+            return {}
+        items = {uva_ids[0]: item} if item else {}
+    else:
+        found, _missing = batch_get_items(
+            {table_name: uva_ids}, key_name=KEY_NAME, projections={table_name: [TS_ATTRIBUTE]},
+            deadline=deadline
+        )
+        items = found[table_name]
+
+    return {
+        uva_id: int(item[TS_ATTRIBUTE])
+        for uva_id, item in items.items()
+        if item.get(TS_ATTRIBUTE) is not None
+    }
@@ -0,0 +1,158 @@
+"""
+Registro de clientes compartidos por todas las funciones Lambda.
+
+Los clientes y recursos de boto3 y las sesiones HTTP se crean de forma perezosa la primera
+vez que se solicitan y se reutilizan en las invocaciones siguientes del mismo contenedor,
+de modo que una invocación en caliente no paga de nuevo la creación del cliente ni el
+establecimiento de la conexión TCP+TLS.
+"""
+import os
+import threading
+from urllib.parse import urlsplit
+
+import boto3
+import requests
+from botocore.config import Config
+from requests.adapters import HTTPAdapter
+
+# Conexiones máximas por pool (por cliente de boto3 y por host HTTP)
+MAX_POOL_CONNECTIONS = int(os.environ.get('MaxPoolConnections', '25'))
+
+# Límites de tiempo (segundos) para conectar y para esperar la respuesta de boto3 (botocore usa 60 s),
+# de modo que una llamada iniciada antes del `Deadline` de la invocación no lo exceda por mucho
+BOTO_CONNECT_TIMEOUT = float(os.environ.get('BotoConnectTimeout', '3.05'))
+BOTO_READ_TIMEOUT = float(os.environ.get('BotoReadTimeout', '10'))
+
+# Configuración común de los clientes de boto3: pool ampliado, keep-alive TCP, límites de tiempo y
+# reintentos estándar
+BOTO_CONFIG = Config(
+    max_pool_connections=MAX_POOL_CONNECTIONS,
+    tcp_keepalive=True,
+    connect_timeout=BOTO_CONNECT_TIMEOUT,
+    read_timeout=BOTO_READ_TIMEOUT,
+    retries={'mode': 'standard', 'max_attempts': 3}
+)
+
+_lock = threading.RLock()
+_session = None
+_clients = {}
+_http_sessions = {}
+# Los recursos de boto3 no son seguros entre hilos, se mantiene uno por hilo
+_local = threading.local()
+# Se incrementa en `reset` para que todos los hilos (no solo el que llama) descarten sus recursos
+_generation = 0
+
+
+def get_boto_session():
+    """
+    Retorna la sesión de boto3 del proceso, creándola la primera vez.
+
+    :return: boto3.session.Session compartida.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = boto3.session.Session()
+    return _session
+
+
+def get_client(service_name, region_name=None):
+    """
+    Retorna un cliente de boto3 compartido por el proceso (los clientes son seguros entre hilos).
+
+    :param service_name: Nombre del servicio, por ejemplo 'sns' o 'dynamodb'.
+    :param region_name: Región opcional; si se omite se usa la región del entorno.
+    :return: Cliente de boto3 en caché.
+    """
+    key = (service_name, region_name)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = get_boto_session().client(service_name, region_name=region_name, config=BOTO_CONFIG)
+                _clients[key] = client
+    return client
+
+
+def get_resource(service_name, region_name=None):
+    """
+    Retorna un recurso de boto3 en caché para el hilo actual.
+
+    :param service_name: Nombre del servicio, por ejemplo 'dynamodb'.
+    :param region_name: Región opcional; si se omite se usa la región del entorno.
+    :return: Recurso de boto3 en caché.
+    """
+    local = _thread_cache()
+    resources = getattr(local, 'resources', None)
+    if resources is None:
+        resources = local.resources = {}
+    key = (service_name, region_name)
+    resource = resources.get(key)
+    if resource is None:
+        with _lock:
+            resource = get_boto_session().resource(service_name, region_name=region_name, config=BOTO_CONFIG)
+        resources[key] = resource
+    return resource
+
+
+def get_table(table_name):
+    """
+    Retorna el objeto `Table` de DynamoDB en caché para el hilo actual.
+
+    :param table_name: Nombre de la tabla DynamoDB.
+    :return: boto3 `dynamodb.Table`.
+    """
+    local = _thread_cache()
+    tables = getattr(local, 'tables', None)
+    if tables is None:
+        tables = local.tables = {}
+    table = tables.get(table_name)
+    if table is None:
+        table = tables[table_name] = get_resource('dynamodb').Table(table_name)
+    return table
+
+
+def _thread_cache():
+    """Retorna el almacenamiento del hilo actual, vaciándolo si es anterior al último `reset`."""
+    if getattr(_local, 'generation', None) != _generation:
+        _local.__dict__.clear()
+        _local.generation = _generation
+    return _local
+
+
+def get_http_session(url):
+    """
+    Retorna una sesión HTTP keep-alive compartida para el endpoint (esquema + host) de `url`.
+
+    La sesión mantiene un pool de hasta `MAX_POOL_CONNECTIONS` conexiones hacia el host, de modo
+    que las peticiones sucesivas (incluidas las concurrentes) reutilizan conexiones TLS abiertas.
+
+    :param url: URL del endpoint, por ejemplo la URL GraphQL de AppSync.
+    :return: requests.Session en caché.
+    """
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    session = _http_sessions.get(key)
+    if session is None:
+        with _lock:
+            session = _http_sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_POOL_CONNECTIONS)
+                session.mount(key, adapter)
+                _http_sessions[key] = session
+    return session
+
+
+def reset():
+    """Descarta todos los clientes, recursos y sesiones en caché (útil en pruebas)."""
+    global _session, _generation
+    with _lock:
+        for session in _http_sessions.values():
+            session.close()
+        _http_sessions.clear()
+        _clients.clear()
+        _session = None
+        _generation += 1
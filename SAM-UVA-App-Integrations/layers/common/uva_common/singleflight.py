@@ -0,0 +1,81 @@
+"""
+Coalescencia de búsquedas idénticas en curso ("single flight").
+
+Cuando varios hilos piden al mismo tiempo el mismo valor (por ejemplo el LinkageCode de un
+racimo compartido por todas las UVA de un lote), solo el primero ejecuta la búsqueda; los demás
+esperan y reciben su resultado, o la misma excepción. Una vez terminada, la siguiente llamada
+con la misma clave vuelve a ejecutarse (la retención de resultados es tarea de la caché).
+"""
+import functools
+import threading
+
+
+class _Call:
+    """Búsqueda en curso y su resultado compartido."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Grupo de búsquedas en curso indexadas por clave."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def do(self, key, function):
+        """
+        Ejecuta `function()` salvo que ya haya una ejecución en curso para `key`, en cuyo caso
+        espera a que termine y retorna su resultado.
+
+        :param key: Clave hashable que identifica la búsqueda.
+        :param function: Función sin argumentos que realiza la búsqueda.
+        :return: Resultado de la búsqueda.
+        :raises: La excepción que lanzó la búsqueda compartida.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+def single_flight(function):
+    """
+    Decorador que coalesce las llamadas concurrentes a `function` con los mismos argumentos.
+
+    El grupo de la función queda disponible en `function.flights` (por ejemplo para consultar
+    cuántas llamadas se compartieron).
+    """
+    flights = SingleFlight()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        return flights.do(key, lambda: function(*args, **kwargs))
+
+    wrapper.flights = flights
+    return wrapper
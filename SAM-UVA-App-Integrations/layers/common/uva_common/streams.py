@@ -0,0 +1,22 @@
+"""
+Respuesta de las funciones que procesan lotes de DynamoDB Streams.
+
+Los mapeos de eventos usan `ReportBatchItemFailures`: la función retorna los números de
+secuencia de los registros que fallaron y Lambda reintenta el lote desde el primero de ellos,
+sin repetir los anteriores.
+"""
+
+
+def build_batch_response(failed_sequence_numbers):
+    """
+    Construye la respuesta de fallas parciales del lote.
+
+    :param failed_sequence_numbers: Números de secuencia de los registros que fallaron; los
+                                    repetidos se reportan una sola vez, en su primer orden.
+    :return: {'batchItemFailures': [{'itemIdentifier': número de secuencia}, ...]}
+    """
+    return {
+        'batchItemFailures': [
+            {'itemIdentifier': sequence_number} for sequence_number in dict.fromkeys(failed_sequence_numbers)
+        ]
+    }
@@ -0,0 +1,125 @@
+"""
+BENCHMARK: DynamoDB-JSON decoding of Measurement stream images.
+
+Compares the iterative `remove_data_types` shipped in
+lambdas/deviceDataAccess/dynamodb_to_sns.py against the previous recursive
+implementation (kept verbatim below as `legacy_remove_data_types`) on
+realistic Measurement NewImages, and fails (exit code 1) if the new decoder is
+not faster per record.
+
+Run with:  python test/benchmark/bench_dynamodb_decoder.py
+"""
+
+import os
+import random
+import sys
+import timeit
+
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+_HANDLER_DIR = os.path.join(
+    _REPO_ROOT, "SAM-UVA-App-Integrations", "lambdas", "deviceDataAccess"
+)
+_LAYER_DIR = os.path.join(_REPO_ROOT, "SAM-UVA-App-Integrations", "layers", "common")
+for _path in (_LAYER_DIR, _HANDLER_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from dynamodb_to_sns import remove_data_types  # noqa: E402
+
+SENSORS = [
+    "temperature", "humidity", "pressure", "pm1", "pm2_5", "pm10", "co2", "voc",
+    "no2", "o3", "noise", "uv", "lux", "wind_speed", "wind_direction", "rain",
+]
+
+
+def legacy_remove_data_types(data):
+    """Previous recursive implementation, kept for comparison."""
+    if isinstance(data, list):
+        new_items = []
+        for item in data:
+            new_items.append(legacy_remove_data_types(item))
+        return new_items
+    elif isinstance(data, dict):
+        new_item = {}
+        for key, value in data.items():
+            data_type, data_value = list(value.items())[0]
+
+            if data_type == 'N':
+                try:
+                    new_item[key] = int(data_value)
+                except ValueError:
+                    new_item[key] = float(data_value)
+            elif data_type == 'BOOL':
+                new_item[key] = data_value == 'true'
+            elif data_type == 'M':
+                new_item[key] = legacy_remove_data_types(data_value)
+            else:
+                new_item[key] = data_value
+        return new_item
+    else:
+        return 'No se puede procesar, el elemento no es una lista o diccionario con estructura de items dynamo'
+
+
+def measurement_image(rng: random.Random) -> dict:
+    """Build a Measurement NewImage shaped like the ones the stream delivers."""
+    data = {}
+    for sensor in SENSORS:
+        if rng.random() < 0.5:
+            data[sensor] = {"N": f"{rng.uniform(-50, 500):.3f}"}
+        else:
+            data[sensor] = {"N": str(rng.randint(0, 5000))}
+    logs = {
+        "battery": {"N": str(rng.randint(0, 100))},
+        "rssi": {"N": str(rng.randint(-120, -30))},
+        "firmware": {"S": "2.1.3"},
+        "charging": {"BOOL": rng.random() < 0.5},
+        "errors": {"M": {"sd": {"N": "0"}, "gps": {"N": str(rng.randint(0, 3))}}},
+    }
+    return {
+        "id": {"S": f"m-{rng.randint(0, 10**9)}"},
+        "uvaID": {"S": f"uva-{rng.randint(0, 500):04d}"},
+        "type": {"S": "RAW"},
+        "ts": {"S": "2024-01-15T10:30:00.000Z"},
+        "data": {"M": data},
+        "logs": {"M": logs},
+        "createdAt": {"S": "2024-01-15T10:30:00.000Z"},
+        "updatedAt": {"S": "2024-01-15T10:30:00.000Z"},
+        "__typename": {"S": "Measurement"},
+        "_version": {"N": "1"},
+        "_lastChangedAt": {"N": "1705318200000"},
+    }
+
+
+def per_record_us(func, images, repeat: int = 5, number: int = 20) -> float:
+    """Best-of-`repeat` time in microseconds to decode one record."""
+    timer = timeit.Timer(lambda: [func(image) for image in images])
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / (number * len(images)) * 1e6
+
+
+def main() -> int:
+    rng = random.Random(42)
+    images = [measurement_image(rng) for _ in range(1000)]
+
+    # Both decoders must agree on the types the legacy function supported
+    # (the legacy BOOL handling compares against the string 'true', so it is
+    # excluded from the comparison).
+    for image in images:
+        legacy = legacy_remove_data_types(image)
+        current = remove_data_types(image)
+        legacy["logs"].pop("charging")
+        current["logs"].pop("charging")
+        assert legacy == current
+
+    legacy_us = per_record_us(legacy_remove_data_types, images)
+    current_us = per_record_us(remove_data_types, images)
+
+    print(f"records:                 {len(images)}")
+    print(f"legacy recursive:        {legacy_us:8.2f} us/record")
+    print(f"iterative decoder:       {current_us:8.2f} us/record")
+    print(f"speedup:                 {legacy_us / current_us:8.2f}x")
+    return 0 if current_us < legacy_us else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+BENCHMARK: linkage code → organization id lookup in uva_to_cloud.
+
+Runs against moto's in-process DynamoDB (the local stand-in the integration
+tests use) for growing Organization tables and compares:
+
+* legacy  — the previous single-page `Scan` + FilterExpression (kept below),
+* indexed — `query_organization_id`, the `linkage_code-index` GSI Query that
+  `get_organization_id` runs on a cache miss. It is measured directly so the
+  lookup caches (memory and /tmp) never answer in place of DynamoDB.
+
+The parallel-scan fallback is not measured here: moto ignores Segment /
+TotalSegments and returns the whole table to every segment, so its numbers
+would not reflect DynamoDB.
+
+Read units are computed with DynamoDB's rules (eventually consistent reads:
+0.5 RCU per 4 KB read; Scan reads every examined item, Query only the matching
+index entries) from the items each call examined. Latency is the wall time of
+the call against moto, which scales with the data each call has to read.
+Lookups target codes spread across the whole table. Exits with code 1 when the
+indexed lookup does not beat the legacy scan on both read units and latency.
+
+Run with:  python test/benchmark/bench_organization_lookup.py
+"""
+
+import math
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+_HANDLER_DIR = os.path.join(_REPO_ROOT, "SAM-UVA-App-Integrations", "lambdas", "cloud")
+_LAYER_DIR = os.path.join(_REPO_ROOT, "SAM-UVA-App-Integrations", "layers", "common")
+for _path in (_LAYER_DIR, _HANDLER_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+import boto3  # noqa: E402
+from moto import mock_dynamodb  # noqa: E402
+
+import uva_to_cloud  # noqa: E402
+from uva_common import runtime  # noqa: E402
+
+ITEM_PAYLOAD_BYTES = 1000          # organization metadata per item
+INDEX_ENTRY_BYTES = 100            # KEYS_ONLY index entry (id + linkage_code + overhead)
+TABLE_SIZES = (500, 2000, 8000)
+LOOKUPS = 5
+
+
+def legacy_get_organization_id(table_name, linkage_code):
+    """Previous implementation: one Scan page, no LastEvaluatedKey handling."""
+    table = runtime.get_table(table_name)
+    response = table.scan(
+        FilterExpression="linkage_code = :value",
+        ExpressionAttributeValues={":value": linkage_code},
+    )
+    items = response.get("Items", [])
+    return items[0]["id"] if items else None
+
+
+class MeteredTable:
+    """Proxy over a boto3 Table that meters the reads of scan/query calls."""
+
+    def __init__(self, table, meter):
+        self._table = table
+        self._meter = meter
+
+    def scan(self, **kwargs):
+        response = self._table.scan(**kwargs)
+        self._meter.add(response["ScannedCount"] * self._meter.item_bytes)
+        return response
+
+    def query(self, **kwargs):
+        response = self._table.query(**kwargs)
+        self._meter.add(max(response["ScannedCount"], 1) * INDEX_ENTRY_BYTES)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._table, name)
+
+
+class ReadMeter:
+    """Accumulates read units and requests of the tables handed out by runtime.get_table."""
+
+    def __init__(self, item_bytes):
+        self.item_bytes = item_bytes
+        self.rcu = 0.0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def install(self):
+        original_get_table = runtime.get_table
+        runtime.get_table = lambda name: MeteredTable(original_get_table(name), self)
+        return original_get_table
+
+    def add(self, read_bytes):
+        with self._lock:
+            self.requests += 1
+            self.rcu += math.ceil(read_bytes / 4096) * 0.5
+
+
+def create_table(client, name):
+    client.create_table(
+        TableName=name,
+        KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "id", "AttributeType": "S"},
+            {"AttributeName": "linkage_code", "AttributeType": "S"},
+        ],
+        BillingMode="PAY_PER_REQUEST",
+        GlobalSecondaryIndexes=[{
+            "IndexName": "linkage_code-index",
+            "KeySchema": [{"AttributeName": "linkage_code", "KeyType": "HASH"}],
+            "Projection": {"ProjectionType": "KEYS_ONLY"},
+        }],
+    )
+
+
+def measure(func, table_name, codes, item_bytes):
+    meter = ReadMeter(item_bytes)
+    original_get_table = meter.install()
+    found = 0
+    start = time.perf_counter()
+    try:
+        for code in codes:
+            found += func(table_name, code) is not None
+    finally:
+        runtime.get_table = original_get_table
+    elapsed_ms = (time.perf_counter() - start) * 1000 / len(codes)
+    return meter.rcu / len(codes), meter.requests / len(codes), elapsed_ms, found
+
+
+def main() -> int:
+    ok = True
+    header = f"{'items':>6} {'strategy':>9} {'RCU/lookup':>11} {'req/lookup':>11} {'ms/lookup':>10} {'found':>7}"
+    print(header)
+    print("-" * len(header))
+    for size in TABLE_SIZES:
+        with mock_dynamodb():
+            runtime.reset()
+            client = boto3.client("dynamodb", region_name="us-east-1")
+            resource = boto3.resource("dynamodb", region_name="us-east-1")
+            create_table(client, "Org-indexed")
+            with resource.Table("Org-indexed").batch_writer() as writer:
+                for i in range(size):
+                    writer.put_item(Item={
+                        "id": f"org-{i}", "linkage_code": f"LC-{i}", "meta": "x" * ITEM_PAYLOAD_BYTES
+                    })
+
+            item_bytes = ITEM_PAYLOAD_BYTES + 60
+            codes = [f"LC-{(size - 1) * k // (LOOKUPS - 1)}" for k in range(LOOKUPS)]
+            results = {
+                "legacy": measure(legacy_get_organization_id, "Org-indexed", codes, item_bytes),
+                "indexed": measure(uva_to_cloud.query_organization_id, "Org-indexed", codes, item_bytes),
+            }
+            for strategy, (rcu, requests, ms, found) in results.items():
+                print(f"{size:>6} {strategy:>9} {rcu:>11.1f} {requests:>11.1f} {ms:>10.2f} {found:>4}/{len(codes)}")
+            print()
+
+            legacy, indexed = results["legacy"], results["indexed"]
+            ok = ok and indexed[0] < legacy[0] and indexed[2] < legacy[2] and indexed[3] == len(codes)
+            runtime.reset()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,12 +21,13 @@ GROUND TRUTH (re-probed 2026-06-10, signed read-only role with
     * id_uva=all + one ?id=     -> 200  {"<id>": {...}}
     * id_uva=all + many ?id=    -> 200  {"<id>": {...}, "<id2>": {...}}
 
-  RED — honest residual handler bug, IDENTICAL on both targets:
-    * unknown uva / missing ?id / empty ?id / malformed list -> 502.
-      AppSync ``getUVA`` returns null; the handler does
-      ``data['data']['getUVA'].get('createdAt')`` on ``None`` -> AttributeError
-      (get_creation_date, last_connection.py L176) -> unhandled -> API GW 502.
-      This is asserted (not forced green) and documented as a known bug.
+  RED — unknown ids and malformed ?id lists, IDENTICAL on both targets once
+  the current handler is deployed:
+    * unknown uva / empty ?id / malformed list -> 200 with ``null`` per unknown
+      id. AppSync ``getUVA`` returns null; the handler reads it in the same
+      query as the last measurement and reports "no information" (this used to
+      be an AttributeError -> API GW 502, see docs/API_AND_TESTS.md §6).
+    * missing ?id -> 400 with an ``error`` message (used to be ``None.split`` -> 502).
     * wrong HTTP method / unknown path / missing suffix -> 4xx
       (prod: 403 Missing Authentication / 404 No method; local: 4xx).
 
@@ -126,40 +127,40 @@ class TestAllModeMultipleIds:
 # RED — error / edge behaviour (asserting the ACTUAL running-API response)
 # ===========================================================================
 class TestRedCases:
-    # ---- Known handler bug: getUVA->null -> None.get('createdAt') -> 502 ----
-    # IDENTICAL on both targets (both hit the same AppSync). Asserted, not forced
-    # green. See module docstring + docs/API_AND_TESTS.md "Known bug".
+    # ---- Unknown ids: getUVA null -> reported as null, never a 5xx ----------
+    # IDENTICAL on both targets (both hit the same AppSync). See module
+    # docstring + docs/API_AND_TESTS.md §6.
 
-    def test_nonexistent_uva_is_502(self, client):
-        """Unknown id: AppSync getUVA null -> handler AttributeError -> API GW 502.
-
-        Same on prod and local (same AppSync, same buggy code path).
-        """
+    def test_nonexistent_uva_is_null(self, client):
+        """Unknown id: AppSync getUVA null -> 200 with a null value."""
         fake = "NONEXISTENT_FAKE_UVA_zzz_999"
         resp = client.get(f"/{fake}/connection")
-        assert resp.status_code == 502, resp.text
+        assert resp.status_code == 200, resp.text
+        assert resp.json() == {fake: None}
 
-    def test_nonexistent_uva_not_2xx(self, client):
-        """Whatever the exact code, an unknown id never succeeds (no 2xx)."""
+    def test_nonexistent_uva_not_5xx(self, client):
+        """Whatever the exact body, an unknown id no longer crashes the handler."""
         fake = "NONEXISTENT_FAKE_UVA_zzz_999"
         resp = client.get(f"/{fake}/connection")
-        assert resp.status_code >= 500
-        assert resp.status_code != 200
+        assert resp.status_code < 500
 
-    def test_all_mode_missing_id_query_param_is_502(self, client):
-        """id_uva=all with no ?id= -> None.split() path -> getUVA null -> 502."""
+    def test_all_mode_missing_id_query_param_is_400(self, client):
+        """id_uva=all with no ?id= -> rejected by the handler's bounds check -> 400."""
         resp = client.get("/all/connection")
-        assert resp.status_code == 502, resp.text
+        assert resp.status_code == 400, resp.text
+        assert "error" in resp.json()
 
-    def test_all_mode_empty_id_value_is_502(self, client):
-        """id_uva=all with empty ?id= : ''.split(',') -> [''] -> getUVA null -> 502."""
+    def test_all_mode_empty_id_value_is_null(self, client):
+        """id_uva=all with empty ?id= : ''.split(',') -> [''] -> getUVA null -> null."""
         resp = client.get("/all/connection", params={"id": ""})
-        assert resp.status_code == 502, resp.text
+        assert resp.status_code == 200, resp.text
+        assert resp.json() == {"": None}
 
-    def test_malformed_id_list_trailing_comma_is_502(self, client):
-        """'FAKE_A,' -> ['FAKE_A',''] -> both nonexistent -> getUVA null -> 502."""
+    def test_malformed_id_list_trailing_comma_is_null(self, client):
+        """'FAKE_A,' -> ['FAKE_A',''] -> both nonexistent -> null for each."""
         resp = client.get("/all/connection", params={"id": "FAKE_A,"})
-        assert resp.status_code == 502, resp.text
+        assert resp.status_code == 200, resp.text
+        assert resp.json() == {"FAKE_A": None, "": None}
 
     # ---- Routing / method rejection: 4xx, never 2xx, on both targets --------
 
@@ -6,12 +6,14 @@ Handler import notes:
 - create_racimo lives in lambdas/createRacimo/  — imported by inserting that dir at sys.path[0]
 Both dirs are inserted lazily (inside each test file) to avoid module-name collisions at
 collection time.  This conftest only owns environment-variable fixtures that both test
-files share.
+files share, plus the shared layer dir (layers/common, package `uva_common`) that every
+handler imports and that Lambda mounts at /opt/python.
 """
 
 import os
 import sys
 import json
+import tempfile
 
 import pytest
 
@@ -25,6 +27,28 @@ os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
 os.environ.setdefault("AWS_SECURITY_TOKEN", "testing")
 os.environ.setdefault("AWS_SESSION_TOKEN", "testing")
 
+# Disk tier of uva_common.cache — keep it out of the real /tmp store
+os.environ.setdefault("CacheDir", tempfile.mkdtemp(prefix="uva-cache-"))
+
+# ---------------------------------------------------------------------------
+# Shared layer (uva_common) — deployed as a Lambda layer, importable by every handler.
+# ---------------------------------------------------------------------------
+_LAYER_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "SAM-UVA-App-Integrations", "layers", "common")
+)
+if _LAYER_DIR not in sys.path:
+    sys.path.insert(0, _LAYER_DIR)
+
+
+@pytest.fixture(autouse=True)
+def _reset_circuit_breakers():
+    """Circuit breakers are process-wide; give every test closed circuits."""
+    from uva_common import circuit
+
+    circuit.reset()
+    yield
+    circuit.reset()
+
 
 # ---------------------------------------------------------------------------
 # Shared AppSync URL constant
@@ -71,6 +95,25 @@ def create_racimo_env(monkeypatch):
     yield
 
 
+# ---------------------------------------------------------------------------
+# Fixtures: environment variables for uva_to_cloud handler
+# ---------------------------------------------------------------------------
+CLOUD_APPSYNC_URL = (
+    "https://bnbto5gmgvcazhjsrxdsviyv74.appsync-api.us-east-1.amazonaws.com/graphql"
+)
+
+
+@pytest.fixture()
+def uva_to_cloud_env(monkeypatch):
+    """Set env vars required by the uva_to_cloud handler."""
+    monkeypatch.setenv("RACIMOTable", "RACIMO-test")
+    monkeypatch.setenv("OrganizationTable", "Organization-test")
+    monkeypatch.setenv("LocationTable", "Location-test")
+    monkeypatch.setenv("AppSyncURL", CLOUD_APPSYNC_URL)
+    monkeypatch.setenv("ApiKey", API_KEY)
+    yield
+
+
 # ---------------------------------------------------------------------------
 # Minimal Lambda context stub
 # ---------------------------------------------------------------------------
@@ -82,7 +125,9 @@ class FakeLambdaContext:
     aws_request_id = "test-request-id"
     log_group_name = "/aws/lambda/test-function"
     log_stream_name = "2026/06/10/[$LATEST]test"
-    remaining_time_in_millis = lambda self: 30000
+
+    def get_remaining_time_in_millis(self):
+        return 30000
 
 
 @pytest.fixture()
@@ -0,0 +1,109 @@
+"""
+INTEGRATION tests for the shared two-tier lookup cache (uva_common.cache).
+
+The clock is injected so TTL expiry is deterministic, and the disk tier uses a
+SQLite file under pytest's tmp_path.
+"""
+
+from uva_common.cache import MISSING, TwoTierCache
+
+
+class FakeClock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _cache(tmp_path, clock=None, **kwargs):
+    return TwoTierCache("test", path=str(tmp_path / "cache.sqlite3"), clock=clock or FakeClock(), **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# GREEN TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestMemoryTier:
+    """LRU with TTL in memory."""
+
+    def test_value_is_returned_until_its_ttl_expires(self, tmp_path):
+        clock = FakeClock()
+        cache = _cache(tmp_path, clock, ttl=10)
+        cache.set("a", "org-1")
+
+        clock.now += 9
+        assert cache.get("a") == "org-1"
+        clock.now += 2
+        assert cache.get("a") is MISSING
+
+    def test_least_recently_used_entry_is_evicted(self, tmp_path):
+        cache = _cache(tmp_path, max_entries=2, persistent=False)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is MISSING
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_negative_results_use_the_shorter_ttl(self, tmp_path):
+        clock = FakeClock()
+        cache = _cache(tmp_path, clock, ttl=100, negative_ttl=5)
+        cache.set("missing", None)
+
+        assert cache.get("missing") is None
+        clock.now += 6
+        assert cache.get("missing") is MISSING
+
+
+class TestDiskTier:
+    """The SQLite store survives a rebuilt in-memory cache."""
+
+    def test_new_instance_reads_values_from_disk(self, tmp_path):
+        clock = FakeClock()
+        _cache(tmp_path, clock).set("a", {"organizationID": "org-1"})
+
+        cache = _cache(tmp_path, clock)
+
+        assert cache.get("a") == {"organizationID": "org-1"}
+        assert cache.stats()["diskHits"] == 1
+
+    def test_namespaces_do_not_collide(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        TwoTierCache("one", path=path).set("a", 1)
+
+        assert TwoTierCache("two", path=path).get("a") is MISSING
+
+    def test_get_or_load_only_calls_the_loader_on_a_miss(self, tmp_path):
+        cache = _cache(tmp_path)
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return "LC-1"
+
+        assert cache.get_or_load("racimo-1", loader) == "LC-1"
+        assert cache.get_or_load("racimo-1", loader) == "LC-1"
+        assert len(calls) == 1
+        assert cache.stats() == {
+            "cache": "test", "hits": 1, "diskHits": 0, "negativeHits": 0, "misses": 1, "entries": 1
+        }
+
+
+# ---------------------------------------------------------------------------
+# RED TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestUnavailableDisk:
+    """Without a writable store the cache keeps working in memory."""
+
+    def test_unwritable_path_falls_back_to_memory(self, tmp_path):
+        cache = TwoTierCache("test", path=str(tmp_path / "missing-dir" / "cache.sqlite3"))
+        cache.set("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.persistent is False
@@ -0,0 +1,133 @@
+"""
+INTEGRATION tests for the per-endpoint circuit breaker (uva_common.circuit).
+
+Time is driven by an injected clock.
+"""
+
+import pytest
+
+from uva_common import circuit
+from uva_common.circuit import CircuitBreaker, CircuitOpenError
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _breaker(clock, **kwargs):
+    options = dict(window_size=10, min_calls=4, failure_rate=0.5, slow_call_seconds=2.0, open_seconds=30)
+    options.update(kwargs)
+    return CircuitBreaker("appsync", clock=clock, **options)
+
+
+def _call(breaker, success=True, elapsed=0.1):
+    breaker.acquire()
+    breaker.record(success, elapsed)
+
+
+# ---------------------------------------------------------------------------
+# GREEN TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestClosedCircuit:
+    """Healthy or sparse traffic keeps the circuit closed."""
+
+    def test_failures_below_min_calls_do_not_open(self):
+        breaker = _breaker(_Clock())
+
+        for _ in range(3):
+            _call(breaker, success=False)
+
+        assert breaker.state == circuit.CLOSED
+
+    def test_failure_rate_at_threshold_opens(self):
+        breaker = _breaker(_Clock())
+
+        for success in (True, False, True, False):
+            _call(breaker, success=success)
+
+        assert breaker.state == circuit.OPEN
+
+
+class TestHalfOpen:
+    """After the open period one probe decides whether the circuit closes."""
+
+    def test_successful_probe_closes_the_circuit(self):
+        clock = _Clock()
+        breaker = _breaker(clock)
+        for _ in range(4):
+            _call(breaker, success=False)
+
+        clock.now += 30
+        _call(breaker, success=True)
+
+        assert breaker.state == circuit.CLOSED
+        _call(breaker)
+
+
+class TestLatencyPercentile:
+    """Successful call latencies feed the p95 used for hedging."""
+
+    def test_percentile_needs_min_samples(self):
+        breaker = _breaker(_Clock())
+        for elapsed in range(1, 21):
+            _call(breaker, elapsed=elapsed / 100)
+
+        assert breaker.latency_percentile(0.95, min_samples=21) is None
+        assert breaker.latency_percentile(0.95, min_samples=20) == pytest.approx(0.19)
+        assert breaker.latency_percentile(0.5) == pytest.approx(0.10)
+
+    def test_registry_shares_one_breaker_per_endpoint(self):
+        assert circuit.get_circuit_breaker("a") is circuit.get_circuit_breaker("a")
+        assert circuit.get_circuit_breaker("a") is not circuit.get_circuit_breaker("b")
+
+
+# ---------------------------------------------------------------------------
+# RED TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestOpenCircuit:
+    """An open circuit rejects calls without running them."""
+
+    def test_open_circuit_rejects_until_the_open_period_ends(self):
+        clock = _Clock()
+        breaker = _breaker(clock)
+        for _ in range(4):
+            _call(breaker, success=False)
+
+        clock.now += 10
+        with pytest.raises(CircuitOpenError) as exc_info:
+            breaker.acquire()
+
+        assert exc_info.value.retry_after == pytest.approx(20)
+        assert breaker.rejected == 1
+
+    def test_slow_successes_count_as_failures(self):
+        breaker = _breaker(_Clock())
+
+        for _ in range(4):
+            _call(breaker, success=True, elapsed=2.5)
+
+        assert breaker.state == circuit.OPEN
+
+    def test_failed_probe_reopens_and_extra_probes_are_rejected(self):
+        clock = _Clock()
+        breaker = _breaker(clock)
+        for _ in range(4):
+            _call(breaker, success=False)
+        clock.now += 30
+
+        breaker.acquire()
+        with pytest.raises(CircuitOpenError):
+            breaker.acquire()
+        breaker.record(False)
+
+        assert breaker.state == circuit.OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.acquire()
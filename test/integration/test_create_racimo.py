@@ -4,7 +4,8 @@ INTEGRATION tests for POST /CreateRacimo (create_racimo.lambda_handler).
 POST /CreateRacimo WRITES to AppSync (createRACIMO mutation), so per the tiering
 policy it is NEVER run against real AWS/AppSync. It is covered at the integration
 tier only: the datastore is mocked by reference (unittest.mock.patch on
-create_racimo.requests.post) so no real network call is made.
+requests.Session.post, the transport behind the shared keep-alive sessions of
+uva_common.runtime) so no real network call is made.
 
 The handler:
 1. Parses JSON body for 'name' and 'linkageCode'.
@@ -27,6 +28,7 @@ import sys
 from unittest.mock import MagicMock, patch
 
 import pytest
+import requests
 
 # ---------------------------------------------------------------------------
 # Inject the handler's source directory BEFORE importing the module.
@@ -38,7 +40,6 @@ _HANDLER_DIR = os.path.join(
 if _HANDLER_DIR not in sys.path:
     sys.path.insert(0, _HANDLER_DIR)
 
-import create_racimo as _cr_module  # noqa: E402
 from create_racimo import lambda_handler  # noqa: E402
 
 # ---------------------------------------------------------------------------
@@ -119,7 +120,7 @@ class TestCreateNewRacimo:
 
         event = _apigw_event({"name": "Racimo Test", "linkageCode": "LC-100"})
 
-        with patch.object(_cr_module.requests, "post", side_effect=side_effect):
+        with patch.object(requests.Session, "post", side_effect=side_effect):
             response = lambda_handler(event, lambda_context)
 
         assert response["statusCode"] == 200
@@ -141,7 +142,7 @@ class TestCreateNewRacimo:
 
         event = _apigw_event({"name": "Racimo Test", "linkageCode": "LC-100"})
 
-        with patch.object(_cr_module.requests, "post", side_effect=side_effect):
+        with patch.object(requests.Session, "post", side_effect=side_effect):
             response = lambda_handler(event, lambda_context)
 
         body = json.loads(response["body"])
@@ -161,7 +162,7 @@ class TestCreateNewRacimo:
 
         event = _apigw_event({"name": "New Racimo", "linkageCode": "LC-NEW"})
 
-        with patch.object(_cr_module.requests, "post", side_effect=side_effect):
+        with patch.object(requests.Session, "post", side_effect=side_effect):
             response = lambda_handler(event, lambda_context)
 
         body = json.loads(response["body"])
@@ -181,7 +182,7 @@ class TestCreateNewRacimo:
 
         event = _apigw_event({"name": "Racimo Test", "linkageCode": "LC-100"})
 
-        with patch.object(_cr_module.requests, "post", side_effect=side_effect) as mock_post:
+        with patch.object(requests.Session, "post", side_effect=side_effect) as mock_post:
             lambda_handler(event, lambda_context)
 
         assert mock_post.call_count == 2
@@ -196,7 +197,7 @@ class TestExistingRacimo:
         exists_resp = _check_exists_response(name="Racimo Test", linkage_code="LC-200")
         event = _apigw_event({"name": "Racimo Test", "linkageCode": "LC-200"})
 
-        with patch.object(_cr_module.requests, "post", return_value=exists_resp):
+        with patch.object(requests.Session, "post", return_value=exists_resp):
             response = lambda_handler(event, lambda_context)
 
         assert response["statusCode"] == 200
@@ -209,7 +210,7 @@ class TestExistingRacimo:
         exists_resp = _check_exists_response(name="Racimo Test", linkage_code="LC-200")
         event = _apigw_event({"name": "Racimo Test", "linkageCode": "LC-200"})
 
-        with patch.object(_cr_module.requests, "post", return_value=exists_resp):
+        with patch.object(requests.Session, "post", return_value=exists_resp):
             response = lambda_handler(event, lambda_context)
 
         body = json.loads(response["body"])
@@ -221,7 +222,7 @@ class TestExistingRacimo:
         exists_resp = _check_exists_response(name="Racimo Test", linkage_code="LC-200")
         event = _apigw_event({"name": "Racimo Test", "linkageCode": "LC-200"})
 
-        with patch.object(_cr_module.requests, "post", return_value=exists_resp):
+        with patch.object(requests.Session, "post", return_value=exists_resp):
             response = lambda_handler(event, lambda_context)
 
         body = json.loads(response["body"])
@@ -233,7 +234,7 @@ class TestExistingRacimo:
         exists_resp = _check_exists_response(name="Racimo Test", linkage_code="LC-200")
         event = _apigw_event({"name": "Racimo Test", "linkageCode": "LC-200"})
 
-        with patch.object(_cr_module.requests, "post", return_value=exists_resp):
+        with patch.object(requests.Session, "post", return_value=exists_resp):
             response = lambda_handler(event, lambda_context)
 
         body = json.loads(response["body"])
@@ -248,7 +249,7 @@ class TestExistingRacimo:
         exists_resp = _check_exists_response(name="Racimo Test", linkage_code="LC-200")
         event = _apigw_event({"name": "Racimo Test", "linkageCode": "LC-200"})
 
-        with patch.object(_cr_module.requests, "post", return_value=exists_resp) as mock_post:
+        with patch.object(requests.Session, "post", return_value=exists_resp) as mock_post:
             lambda_handler(event, lambda_context)
 
         assert mock_post.call_count == 1
@@ -270,7 +271,7 @@ class TestCreateRacimoResponseHeaders:
 
         event = _apigw_event({"name": "R", "linkageCode": "LC-300"})
 
-        with patch.object(_cr_module.requests, "post", side_effect=side_effect):
+        with patch.object(requests.Session, "post", side_effect=side_effect):
             response = lambda_handler(event, lambda_context)
 
         assert response["statusCode"] == 200
@@ -283,7 +284,7 @@ class TestCreateRacimoResponseHeaders:
         exists_resp = _check_exists_response(name="R", linkage_code="LC-300")
         event = _apigw_event({"name": "R", "linkageCode": "LC-300"})
 
-        with patch.object(_cr_module.requests, "post", return_value=exists_resp):
+        with patch.object(requests.Session, "post", return_value=exists_resp):
             response = lambda_handler(event, lambda_context)
 
         headers = response.get("headers", {})
@@ -302,7 +303,7 @@ class TestCreateRacimoResponseHeaders:
 
         event = _apigw_event({"name": "R", "linkageCode": "LC-300"})
 
-        with patch.object(_cr_module.requests, "post", side_effect=side_effect):
+        with patch.object(requests.Session, "post", side_effect=side_effect):
             response = lambda_handler(event, lambda_context)
 
         # Must be parseable as JSON
@@ -384,7 +385,7 @@ class TestCreateRacimoAppSyncNon200:
 
         event = _apigw_event({"name": "R", "linkageCode": "LC-ERR"})
 
-        with patch.object(_cr_module.requests, "post", side_effect=side_effect):
+        with patch.object(requests.Session, "post", side_effect=side_effect):
             with pytest.raises(Exception) as exc_info:
                 lambda_handler(event, lambda_context)
 
@@ -406,7 +407,7 @@ class TestCreateRacimoAppSyncNon200:
 
         event = _apigw_event({"name": "R", "linkageCode": "LC-UNAUTH"})
 
-        with patch.object(_cr_module.requests, "post", side_effect=side_effect):
+        with patch.object(requests.Session, "post", side_effect=side_effect):
             with pytest.raises(Exception) as exc_info:
                 lambda_handler(event, lambda_context)
 
@@ -419,7 +420,7 @@ class TestCreateRacimoAppSyncNon200:
         error_resp = _mock_response({"message": "Service Unavailable"}, status_code=503)
         event = _apigw_event({"name": "R", "linkageCode": "LC-DOWN"})
 
-        with patch.object(_cr_module.requests, "post", return_value=error_resp):
+        with patch.object(requests.Session, "post", return_value=error_resp):
             with pytest.raises(Exception):
                 lambda_handler(event, lambda_context)
 
@@ -441,7 +442,7 @@ class TestCreateRacimoAppSyncNon200:
 
         event = _apigw_event({"name": "R", "linkageCode": "LC-ERR2"})
 
-        with patch.object(_cr_module.requests, "post", side_effect=side_effect):
+        with patch.object(requests.Session, "post", side_effect=side_effect):
             with pytest.raises(Exception) as exc_info:
                 lambda_handler(event, lambda_context)
 
@@ -0,0 +1,90 @@
+"""
+INTEGRATION tests for the invocation deadline (uva_common.deadline).
+
+Time is driven by an injected clock; Lambda contexts are small stubs.
+"""
+
+import math
+
+import pytest
+
+from uva_common.deadline import Deadline, DeadlineExceeded
+
+
+class _Context:
+    """Real-shape Lambda context: exposes get_remaining_time_in_millis()."""
+
+    def __init__(self, remaining_ms):
+        self._remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self._remaining_ms
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+# ---------------------------------------------------------------------------
+# GREEN TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestFromContext:
+    """The budget comes from the context minus the reserve."""
+
+    def test_remaining_time_is_read_from_the_context(self):
+        deadline = Deadline.from_context(_Context(5000), reserve_ms=1000)
+
+        assert 3.9 < deadline.remaining() <= 4.0
+
+    def test_shared_context_stub_has_the_lambda_budget(self, lambda_context):
+        deadline = Deadline.from_context(lambda_context, reserve_ms=0)
+
+        assert 29.9 < deadline.remaining() <= 30.0
+
+    def test_missing_context_means_no_limit(self):
+        deadline = Deadline.from_context(None)
+
+        assert deadline.remaining() == math.inf
+        assert not deadline.expired()
+
+
+class TestTimeout:
+    """Per-call timeouts shrink to the time left."""
+
+    def test_timeouts_are_capped_by_the_remaining_time(self):
+        clock = _Clock()
+        deadline = Deadline(2.0, clock=clock)
+
+        assert deadline.timeout((3.05, 10)) == (2.0, 2.0)
+        clock.now += 1.5
+        assert deadline.timeout(10) == pytest.approx(0.5)
+        assert deadline.timeout((0.1, 10)) == pytest.approx((0.1, 0.5))
+
+
+# ---------------------------------------------------------------------------
+# RED TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestExpired:
+    """Nothing new starts once the budget is spent."""
+
+    def test_expired_deadline_raises_on_check_and_timeout(self):
+        clock = _Clock()
+        deadline = Deadline(1.0, clock=clock)
+        clock.now += 1.0
+
+        assert deadline.expired()
+        with pytest.raises(DeadlineExceeded):
+            deadline.check("publicar en SNS")
+        with pytest.raises(DeadlineExceeded):
+            deadline.timeout((3.05, 10))
+
+    def test_reserve_larger_than_budget_is_already_expired(self):
+        assert Deadline.from_context(_Context(500), reserve_ms=1000).expired()
@@ -0,0 +1,143 @@
+"""
+INTEGRATION tests for the shared BatchGetItem helper (uva_common.dynamodb).
+
+Reads run against moto's in-process DynamoDB; UnprocessedKeys are simulated by
+wrapping the resource's batch_get_item.
+"""
+
+from unittest.mock import patch
+
+import boto3
+import pytest
+from botocore.exceptions import ReadTimeoutError
+from moto import mock_dynamodb
+
+from uva_common import dynamodb as _dynamodb_module
+from uva_common import runtime
+from uva_common.dynamodb import batch_get_items
+
+
+@pytest.fixture()
+def tables():
+    with mock_dynamodb():
+        runtime.reset()
+        resource = boto3.resource("dynamodb", region_name="us-east-1")
+        for name in ("RACIMO-test", "Location-test"):
+            resource.create_table(
+                TableName=name,
+                KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+                AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+                BillingMode="PAY_PER_REQUEST",
+            )
+        yield resource
+        runtime.reset()
+
+
+def _put(table, count, prefix):
+    with table.batch_writer() as writer:
+        for i in range(count):
+            writer.put_item(Item={"id": f"{prefix}{i}", "LinkageCode": f"LC-{i}", "extra": "x"})
+
+
+# ---------------------------------------------------------------------------
+# GREEN TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestBatchGetItems:
+    """Keys of several tables are read in chunks of at most 100."""
+
+    def test_found_and_missing_keys_per_table(self, tables):
+        _put(tables.Table("RACIMO-test"), 3, "racimo-")
+        tables.Table("Location-test").put_item(Item={"id": "Auva-1", "latitude": "4.6"})
+
+        found, missing = batch_get_items({
+            "RACIMO-test": ["racimo-0", "racimo-2", "racimo-9", "racimo-0"],
+            "Location-test": ["Auva-1", "Auva-2"],
+        })
+
+        assert set(found["RACIMO-test"]) == {"racimo-0", "racimo-2"}
+        assert missing == {"RACIMO-test": {"racimo-9"}, "Location-test": {"Auva-2"}}
+        assert found["Location-test"]["Auva-1"]["latitude"] == "4.6"
+
+    def test_projection_limits_the_attributes_read(self, tables):
+        _put(tables.Table("RACIMO-test"), 1, "racimo-")
+
+        found, _ = batch_get_items({"RACIMO-test": ["racimo-0"]}, projections={"RACIMO-test": ["LinkageCode"]})
+
+        assert found["RACIMO-test"]["racimo-0"] == {"id": "racimo-0", "LinkageCode": "LC-0"}
+
+    def test_keys_are_chunked_at_one_hundred(self, tables):
+        _put(tables.Table("RACIMO-test"), 250, "racimo-")
+        resource = runtime.get_resource("dynamodb")
+
+        with patch.object(resource, "batch_get_item", wraps=resource.batch_get_item) as batch_get:
+            found, missing = batch_get_items({"RACIMO-test": [f"racimo-{i}" for i in range(250)]})
+
+        assert len(found["RACIMO-test"]) == 250
+        assert missing == {"RACIMO-test": set()}
+        sizes = [len(c.kwargs["RequestItems"]["RACIMO-test"]["Keys"]) for c in batch_get.call_args_list]
+        assert sizes == [100, 100, 50]
+
+    def test_unprocessed_keys_are_retried(self, tables):
+        _put(tables.Table("RACIMO-test"), 4, "racimo-")
+        resource = runtime.get_resource("dynamodb")
+        real_batch_get = resource.batch_get_item
+        calls = []
+
+        def throttled_first_call(RequestItems):
+            calls.append(RequestItems)
+            if len(calls) > 1:
+                return real_batch_get(RequestItems=RequestItems)
+            keys = RequestItems["RACIMO-test"]["Keys"]
+            response = real_batch_get(RequestItems={"RACIMO-test": {"Keys": keys[:2]}})
+            response["UnprocessedKeys"] = {"RACIMO-test": {"Keys": keys[2:]}}
+            return response
+
+        with patch.object(resource, "batch_get_item", side_effect=throttled_first_call), \
+                patch.object(_dynamodb_module.time, "sleep"):
+            found, missing = batch_get_items({"RACIMO-test": [f"racimo-{i}" for i in range(4)]})
+
+        assert len(calls) == 2
+        assert set(found["RACIMO-test"]) == {"racimo-0", "racimo-1", "racimo-2", "racimo-3"}
+        assert missing == {"RACIMO-test": set()}
+
+
+# ---------------------------------------------------------------------------
+# RED TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestBatchGetItemsFailures:
+    """Keys that could not be read are neither found nor missing."""
+
+    def test_keys_still_unprocessed_after_the_last_attempt_are_left_out(self, tables):
+        resource = runtime.get_resource("dynamodb")
+
+        def always_unprocessed(RequestItems):
+            return {"Responses": {}, "UnprocessedKeys": RequestItems}
+
+        with patch.object(resource, "batch_get_item", side_effect=always_unprocessed) as batch_get, \
+                patch.object(_dynamodb_module.time, "sleep"):
+            found, missing = batch_get_items({"RACIMO-test": ["racimo-0"]})
+
+        assert batch_get.call_count == _dynamodb_module.BATCH_GET_MAX_ATTEMPTS
+        assert found == {"RACIMO-test": {}}
+        assert missing == {"RACIMO-test": set()}
+
+    def test_client_error_leaves_the_chunk_out(self, tables):
+        found, missing = batch_get_items({"Unknown-table": ["a"]})
+
+        assert found == {"Unknown-table": {}}
+        assert missing == {"Unknown-table": set()}
+
+    def test_transport_error_leaves_the_chunk_out(self, tables):
+        _put(tables.Table("RACIMO-test"), 1, "racimo-")
+        resource = runtime.get_resource("dynamodb")
+        timeout = ReadTimeoutError(endpoint_url="https://dynamodb.us-east-1.amazonaws.com")
+
+        with patch.object(resource, "batch_get_item", side_effect=timeout):
+            found, missing = batch_get_items({"RACIMO-test": ["racimo-0", "racimo-9"]})
+
+        assert found == {"RACIMO-test": {}}
+        assert missing == {"RACIMO-test": set()}
@@ -0,0 +1,480 @@
+"""
+INTEGRATION tests for the Measurement stream processor (dynamodb_to_sns).
+
+The SNS client is mocked by reference (unittest.mock.patch on
+uva_common.runtime.get_client) so no real AWS call is made. These tests cover
+the DynamoDB-JSON decoder (remove_data_types) and the size-aware publisher:
+records are packed into messages below the SNS size limit and published through
+PublishBatch in groups of at most 10 entries.
+
+Import strategy: insert the source lambda directory at sys.path[0] here at
+module load time (before the import) to avoid picking up a stale
+.aws-sam/build copy.
+"""
+
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import boto3
+import pytest
+from botocore.exceptions import EndpointConnectionError
+from moto import mock_dynamodb
+
+from uva_common import runtime
+
+# ---------------------------------------------------------------------------
+# Inject the handler's source directory BEFORE importing the module.
+# ---------------------------------------------------------------------------
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+_HANDLER_DIR = os.path.join(
+    _REPO_ROOT, "SAM-UVA-App-Integrations", "lambdas", "deviceDataAccess"
+)
+if _HANDLER_DIR not in sys.path:
+    sys.path.insert(0, _HANDLER_DIR)
+
+import dynamodb_to_sns as _sns_module  # noqa: E402
+from dynamodb_to_sns import lambda_handler, remove_data_types, send_message_to_topic_sns  # noqa: E402
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+TOPIC_ARN = "arn:aws:sns:us-east-1:123456789012:RealTimeDeviceData-test"
+ATTRIBUTES = {"typeDevice": "UVA", "typeData": "RAW"}
+
+
+def _record(i: int, payload_bytes: int = 100) -> dict:
+    """Build a processed measurement record with a payload of roughly `payload_bytes`."""
+    return {
+        "id": f"uva-{i:04d}",
+        "type": "environment",
+        "ts": 1_705_318_200_000 + i,
+        "data": {"blob": "x" * payload_bytes},
+        "logs": {},
+    }
+
+
+def _stream_record(seq: str, ts="2024-01-15T10:30:00.000Z", uva_id="uva-001") -> dict:
+    """Build a Measurement INSERT stream record (DynamoDB-JSON)."""
+    new_image = {"uvaID": {"S": uva_id}, "type": {"S": "environment"}, "data": {"M": {"t": {"N": "21.5"}}}}
+    if ts is not None:
+        new_image["ts"] = {"S": ts}
+    return {"eventName": "INSERT", "dynamodb": {"SequenceNumber": seq, "NewImage": new_image}}
+
+
+def _sns_client_mock(failed_ids_per_call=None):
+    """SNS client mock whose publish_batch reports the given entry Ids as failed."""
+    failed_ids_per_call = list(failed_ids_per_call or [])
+    client = MagicMock()
+
+    def publish_batch(TopicArn, PublishBatchRequestEntries):
+        failed_ids = failed_ids_per_call.pop(0) if failed_ids_per_call else []
+        return {
+            "Successful": [
+                {"Id": e["Id"]} for e in PublishBatchRequestEntries if e["Id"] not in failed_ids
+            ],
+            "Failed": [{"Id": i, "Code": "InternalError", "SenderFault": False} for i in failed_ids],
+            "ResponseMetadata": {"HTTPStatusCode": 200},
+        }
+
+    client.publish_batch.side_effect = publish_batch
+    return client
+
+
+@pytest.fixture()
+def last_seen_table(monkeypatch):
+    """moto LastSeen table wired into the handler."""
+    with mock_dynamodb():
+        runtime.reset()
+        table = boto3.resource("dynamodb", region_name="us-east-1").create_table(
+            TableName="LastSeen-test",
+            KeySchema=[{"AttributeName": "uvaID", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "uvaID", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        monkeypatch.setattr(_sns_module, "LAST_SEEN_TABLE", "LastSeen-test")
+        yield table
+        runtime.reset()
+
+
+def _published_records(client) -> list:
+    """Decode every record published across all PublishBatch calls, in order."""
+    records = []
+    for call in client.publish_batch.call_args_list:
+        for entry in call.kwargs["PublishBatchRequestEntries"]:
+            records.extend(json.loads(entry["Message"]))
+    return records
+
+
+# ---------------------------------------------------------------------------
+# GREEN TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestRemoveDataTypes:
+    """DynamoDB-JSON images are decoded to native Python values."""
+
+    def test_full_dynamodb_type_set_is_decoded(self):
+        image = {
+            "s": {"S": "uva-001"},
+            "int": {"N": "42"},
+            "float": {"N": "36.5"},
+            "exp": {"N": "1E+2"},
+            "bool": {"BOOL": True},
+            "null": {"NULL": True},
+            "map": {"M": {"value": {"N": "-7"}, "unit": {"S": "celsius"}}},
+            "list": {"L": [{"N": "1"}, {"S": "a"}, {"M": {"x": {"BOOL": False}}}, {"L": []}]},
+            "ss": {"SS": ["a", "b"]},
+            "ns": {"NS": ["1", "2.5"]},
+            "b": {"B": "aGVsbG8="},
+            "bs": {"BS": ["aGVsbG8="]},
+        }
+
+        assert remove_data_types(image) == {
+            "s": "uva-001",
+            "int": 42,
+            "float": 36.5,
+            "exp": 100.0,
+            "bool": True,
+            "null": None,
+            "map": {"value": -7, "unit": "celsius"},
+            "list": [1, "a", {"x": False}, []],
+            "ss": ["a", "b"],
+            "ns": [1, 2.5],
+            "b": "aGVsbG8=",
+            "bs": ["aGVsbG8="],
+        }
+
+    def test_numbers_keep_int_or_float_type(self):
+        decoded = remove_data_types({"a": {"N": "10"}, "b": {"N": "10.0"}, "c": {"N": "-3e-2"}})
+
+        assert type(decoded["a"]) is int
+        assert type(decoded["b"]) is float
+        assert decoded["c"] == -0.03
+
+    def test_key_order_is_preserved(self):
+        image = {"z": {"N": "1"}, "a": {"M": {"y": {"N": "2"}, "b": {"N": "3"}}}, "m": {"S": "x"}}
+
+        decoded = remove_data_types(image)
+
+        assert list(decoded) == ["z", "a", "m"]
+        assert list(decoded["a"]) == ["y", "b"]
+
+    def test_list_of_images_is_decoded(self):
+        assert remove_data_types([{"a": {"N": "1"}}, {"b": {"S": "x"}}]) == [{"a": 1}, {"b": "x"}]
+
+    def test_deeply_nested_maps_do_not_hit_the_recursion_limit(self):
+        depth = sys.getrecursionlimit() * 2
+        image = {"leaf": {"N": "1"}}
+        for _ in range(depth):
+            image = {"child": {"M": image}}
+
+        decoded = remove_data_types(image)
+
+        for _ in range(depth):
+            decoded = decoded["child"]
+        assert decoded == {"leaf": 1}
+
+
+class TestSmallBatch:
+    """A small batch fits in a single message and a single PublishBatch call."""
+
+    def test_small_batch_is_sent_as_one_message(self):
+        client = _sns_client_mock()
+        records = [_record(i) for i in range(10)]
+
+        with patch.object(_sns_module.runtime, "get_client", return_value=client):
+            result = send_message_to_topic_sns(TOPIC_ARN, records, ATTRIBUTES)
+
+        assert result["statusCode"] == 200
+        assert result["failedRecords"] == []
+        assert client.publish_batch.call_count == 1
+        entries = client.publish_batch.call_args.kwargs["PublishBatchRequestEntries"]
+        assert len(entries) == 1
+        assert json.loads(entries[0]["Message"]) == records
+
+    def test_message_attributes_are_attached_to_every_entry(self):
+        client = _sns_client_mock()
+
+        with patch.object(_sns_module.runtime, "get_client", return_value=client):
+            send_message_to_topic_sns(TOPIC_ARN, [_record(0)], ATTRIBUTES)
+
+        entry = client.publish_batch.call_args.kwargs["PublishBatchRequestEntries"][0]
+        assert entry["MessageAttributes"] == {
+            "typeDevice": {"DataType": "String", "StringValue": "UVA"},
+            "typeData": {"DataType": "String", "StringValue": "RAW"},
+        }
+
+
+class TestOversizedBatch:
+    """Batches above 256 KB are split instead of being dropped."""
+
+    def test_large_batch_is_split_into_messages_below_the_limit(self):
+        client = _sns_client_mock()
+        records = [_record(i, payload_bytes=20_000) for i in range(100)]
+
+        with patch.object(_sns_module.runtime, "get_client", return_value=client):
+            result = send_message_to_topic_sns(TOPIC_ARN, records, ATTRIBUTES)
+
+        assert result["statusCode"] == 200
+        assert _published_records(client) == records
+        for call in client.publish_batch.call_args_list:
+            entries = call.kwargs["PublishBatchRequestEntries"]
+            assert len(entries) <= _sns_module.SNS_MAX_BATCH_ENTRIES
+            total = sum(len(e["Message"].encode("utf-8")) for e in entries)
+            assert total <= _sns_module.SNS_MAX_BATCH_BYTES
+
+    def test_many_small_messages_use_at_most_ten_entries_per_call(self):
+        client = _sns_client_mock()
+        # Each record fills a message on its own, forcing one message per record.
+        records = [_record(i, payload_bytes=200) for i in range(25)]
+
+        with patch.object(_sns_module, "SNS_MAX_MESSAGE_BYTES", 400):
+            with patch.object(_sns_module.runtime, "get_client", return_value=client):
+                result = send_message_to_topic_sns(TOPIC_ARN, records, ATTRIBUTES)
+
+        assert result["statusCode"] == 200
+        assert _published_records(client) == records
+        entries_per_call = [
+            len(call.kwargs["PublishBatchRequestEntries"]) for call in client.publish_batch.call_args_list
+        ]
+        assert entries_per_call == [10, 10, 5]
+
+    def test_non_ascii_payload_size_is_computed_in_bytes(self):
+        client = _sns_client_mock()
+        records = [{"id": "uva-ñ", "data": {"nota": "ñ" * 30_000}} for _ in range(20)]
+
+        with patch.object(_sns_module.runtime, "get_client", return_value=client):
+            result = send_message_to_topic_sns(TOPIC_ARN, records, ATTRIBUTES)
+
+        assert result["statusCode"] == 200
+        assert _published_records(client) == records
+        for call in client.publish_batch.call_args_list:
+            for entry in call.kwargs["PublishBatchRequestEntries"]:
+                assert len(entry["Message"].encode("utf-8")) <= _sns_module.SNS_MAX_MESSAGE_BYTES
+
+
+class TestHandlerBatchResponse:
+    """The handler reports partial batch failures (ReportBatchItemFailures)."""
+
+    def test_successful_batch_reports_no_failures(self, monkeypatch, lambda_context):
+        monkeypatch.setenv("SNSTopicARN", TOPIC_ARN)
+        client = _sns_client_mock()
+        event = {"Records": [_stream_record("1"), _stream_record("2")]}
+
+        with patch.object(_sns_module.runtime, "get_client", return_value=client):
+            response = lambda_handler(event, lambda_context)
+
+        assert response == {"batchItemFailures": []}
+        assert _published_records(client)[0]["ts"] == 1_705_314_600_000
+
+
+class TestHandlerFiltering:
+    """Events other than INSERT are neither processed nor published."""
+
+    def test_non_insert_events_are_not_published_as_null(self, monkeypatch, lambda_context):
+        monkeypatch.setenv("SNSTopicARN", TOPIC_ARN)
+        client = _sns_client_mock()
+        modify = dict(_stream_record("2"), eventName="MODIFY")
+        event = {"Records": [_stream_record("1"), modify]}
+
+        with patch.object(_sns_module.runtime, "get_client", return_value=client):
+            lambda_handler(event, lambda_context)
+
+        assert None not in _published_records(client)
+        assert len(_published_records(client)) == 1
+
+    def test_records_rejected_by_the_filter_make_no_calls(self, monkeypatch, lambda_context):
+        monkeypatch.setenv("SNSTopicARN", TOPIC_ARN)
+        client = _sns_client_mock()
+        event = {"Records": [dict(_stream_record("1"), eventName="REMOVE")]}
+
+        with patch.object(_sns_module, "RECORD_FILTER", lambda record: record["eventName"] == "INSERT"), \
+                patch.object(_sns_module.runtime, "get_client", return_value=client):
+            response = lambda_handler(event, lambda_context)
+
+        assert response == {"batchItemFailures": []}
+        client.publish_batch.assert_not_called()
+
+
+class TestLastSeenIndex:
+    """The handler keeps the per-UVA last-seen index up to date."""
+
+    def test_index_holds_the_latest_ts_of_each_uva(self, monkeypatch, lambda_context, last_seen_table):
+        monkeypatch.setenv("SNSTopicARN", TOPIC_ARN)
+        client = _sns_client_mock()
+        event = {"Records": [
+            _stream_record("1", ts="2024-01-15T10:30:00.000Z", uva_id="uva-001"),
+            _stream_record("2", ts="2024-01-15T10:35:00.000Z", uva_id="uva-001"),
+            _stream_record("3", ts="2024-01-15T10:31:00.000Z", uva_id="uva-002"),
+        ]}
+
+        with patch.object(_sns_module.runtime, "get_client", return_value=client):
+            lambda_handler(event, lambda_context)
+
+        assert last_seen_table.get_item(Key={"uvaID": "uva-001"})["Item"]["ts"] == 1_705_314_900_000
+        assert last_seen_table.get_item(Key={"uvaID": "uva-002"})["Item"]["ts"] == 1_705_314_660_000
+
+    def test_replayed_older_record_does_not_move_the_index_back(
+        self, monkeypatch, lambda_context, last_seen_table
+    ):
+        monkeypatch.setenv("SNSTopicARN", TOPIC_ARN)
+        client = _sns_client_mock()
+        newer = {"Records": [_stream_record("2", ts="2024-01-15T10:35:00.000Z")]}
+        older = {"Records": [_stream_record("1", ts="2024-01-15T10:30:00.000Z")]}
+
+        with patch.object(_sns_module.runtime, "get_client", return_value=client):
+            lambda_handler(newer, lambda_context)
+            lambda_handler(older, lambda_context)
+
+        assert last_seen_table.get_item(Key={"uvaID": "uva-001"})["Item"]["ts"] == 1_705_314_900_000
+
+
+# ---------------------------------------------------------------------------
+# RED TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestHandlerBatchFailures:
+    """Only the records that failed and can succeed on retry are returned for retry."""
+
+    def test_malformed_records_are_logged_and_acknowledged(self, monkeypatch, lambda_context, capsys):
+        monkeypatch.setenv("SNSTopicARN", TOPIC_ARN)
+        client = _sns_client_mock()
+        event = {"Records": [_stream_record("1"), _stream_record("2", ts=None), _stream_record("3", ts="ayer")]}
+
+        with patch.object(_sns_module.runtime, "get_client", return_value=client):
+            response = lambda_handler(event, lambda_context)
+
+        # Retrying cannot fix them, and reporting them would block the shard
+        assert response == {"batchItemFailures": []}
+        assert len(_published_records(client)) == 1
+        output = capsys.readouterr().out
+        assert "Registro 2 descartado" in output and "Registro 3 descartado" in output
+        assert '"ayer"' in output
+
+    def test_record_above_the_sns_limit_is_logged_and_acknowledged(self, monkeypatch, lambda_context, capsys):
+        monkeypatch.setenv("SNSTopicARN", TOPIC_ARN)
+        client = _sns_client_mock(failed_ids_per_call=[["1"]])
+        oversized = _stream_record("10")
+        oversized["dynamodb"]["NewImage"]["data"] = {"M": {"blob": {"S": "x" * 300}}}
+        event = {"Records": [oversized, _stream_record("20"), _stream_record("30")]}
+
+        # One record per message: 10 alone exceeds the limit, the entry of 30 is rejected by SNS
+        with patch.object(_sns_module, "SNS_MAX_MESSAGE_BYTES", 200), \
+                patch.object(_sns_module.runtime, "get_client", return_value=client):
+            response = lambda_handler(event, lambda_context)
+
+        assert response == {"batchItemFailures": [{"itemIdentifier": "30"}]}
+        assert "Registro 10 descartado por exceder" in capsys.readouterr().out
+
+    def test_records_rejected_by_sns_are_reported_by_sequence_number(self, monkeypatch, lambda_context):
+        monkeypatch.setenv("SNSTopicARN", TOPIC_ARN)
+        client = _sns_client_mock(failed_ids_per_call=[["1"]])
+        event = {"Records": [_stream_record(str(seq)) for seq in (10, 20, 30)]}
+
+        # One record per message so the rejected entry maps to exactly one record
+        with patch.object(_sns_module, "SNS_MAX_MESSAGE_BYTES", 200), \
+                patch.object(_sns_module.runtime, "get_client", return_value=client):
+            response = lambda_handler(event, lambda_context)
+
+        assert response == {"batchItemFailures": [{"itemIdentifier": "20"}]}
+
+
+class TestRemoveDataTypesInvalidInput:
+    """Unsupported input raises instead of returning an error string."""
+
+    def test_unsupported_attribute_type_raises_value_error(self):
+        with pytest.raises(ValueError):
+            remove_data_types({"a": {"XYZ": "1"}})
+
+    def test_non_container_input_raises_value_error(self):
+        with pytest.raises(ValueError):
+            remove_data_types("not an image")
+
+
+class TestPublishFailures:
+    """Records that cannot be delivered are reported by index."""
+
+    def test_single_record_above_the_limit_is_reported_as_failed(self):
+        client = _sns_client_mock()
+        records = [_record(0), _record(1, payload_bytes=300 * 1024), _record(2)]
+
+        with patch.object(_sns_module.runtime, "get_client", return_value=client):
+            result = send_message_to_topic_sns(TOPIC_ARN, records, ATTRIBUTES)
+
+        assert result["statusCode"] == 500
+        assert result["failedRecords"] == [1]
+        assert _published_records(client) == [records[0], records[2]]
+
+    def test_entries_rejected_by_sns_are_reported_by_record_index(self):
+        client = _sns_client_mock(failed_ids_per_call=[["1"]])
+        records = [_record(i, payload_bytes=200) for i in range(3)]
+
+        with patch.object(_sns_module, "SNS_MAX_MESSAGE_BYTES", 400):
+            with patch.object(_sns_module.runtime, "get_client", return_value=client):
+                result = send_message_to_topic_sns(TOPIC_ARN, records, ATTRIBUTES)
+
+        assert result["statusCode"] == 500
+        assert result["failedRecords"] == [1]
+
+    def test_client_error_marks_every_record_of_the_batch_as_failed(self):
+        from botocore.exceptions import ClientError
+
+        client = MagicMock()
+        client.publish_batch.side_effect = ClientError(
+            {"Error": {"Code": "Throttling", "Message": "Rate exceeded"}}, "PublishBatch"
+        )
+        records = [_record(i) for i in range(3)]
+
+        with patch.object(_sns_module.runtime, "get_client", return_value=client):
+            result = send_message_to_topic_sns(TOPIC_ARN, records, ATTRIBUTES)
+
+        assert result["statusCode"] == 500
+        assert result["failedRecords"] == [0, 1, 2]
+
+
+class TestLastSeenFailures:
+    """The last-seen index is best effort and never fails the batch."""
+
+    def test_index_write_error_still_publishes_the_batch(self, monkeypatch, lambda_context, last_seen_table):
+        monkeypatch.setenv("SNSTopicARN", TOPIC_ARN)
+        monkeypatch.setattr(_sns_module, "LAST_SEEN_TABLE", "LastSeen-missing")
+        client = _sns_client_mock()
+        event = {"Records": [_stream_record("1")]}
+
+        with patch.object(_sns_module.runtime, "get_client", return_value=client):
+            response = lambda_handler(event, lambda_context)
+
+        assert response == {"batchItemFailures": []}
+        assert len(_published_records(client)) == 1
+
+    def test_index_transport_error_still_publishes_the_batch(self, monkeypatch, lambda_context, last_seen_table):
+        monkeypatch.setenv("SNSTopicARN", TOPIC_ARN)
+        client = _sns_client_mock()
+        event = {"Records": [_stream_record("1")]}
+        error = EndpointConnectionError(endpoint_url="https://dynamodb.us-east-1.amazonaws.com")
+
+        with patch.object(_sns_module.runtime, "get_client", return_value=client), \
+                patch.object(_sns_module, "record_last_seen", side_effect=error):
+            response = lambda_handler(event, lambda_context)
+
+        assert response == {"batchItemFailures": []}
+        assert len(_published_records(client)) == 1
+
+
+class TestHandlerDeadline:
+    """When the invocation runs out of time the unprocessed records are reported."""
+
+    def test_exhausted_budget_reports_every_record_without_publishing(self, monkeypatch, lambda_context):
+        monkeypatch.setenv("SNSTopicARN", TOPIC_ARN)
+        client = _sns_client_mock()
+        lambda_context.get_remaining_time_in_millis = lambda: 500  # menos que la reserva
+        event = {"Records": [_stream_record("1"), _stream_record("2")]}
+
+        with patch.object(_sns_module.runtime, "get_client", return_value=client):
+            response = lambda_handler(event, lambda_context)
+
+        assert response == {"batchItemFailures": [{"itemIdentifier": "1"}, {"itemIdentifier": "2"}]}
+        client.publish_batch.assert_not_called()
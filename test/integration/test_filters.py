@@ -0,0 +1,94 @@
+"""
+INTEGRATION tests for the declarative stream-record filters (uva_common.filters).
+
+The patterns under test are read from the FilterCriteria parameters of
+template.yaml, so the in-handler predicate and the event source mapping are
+checked against the same source.
+"""
+
+import os
+
+import pytest
+
+from uva_common.filters import compile_pattern, compile_patterns
+
+_TEMPLATE = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", "SAM-UVA-App-Integrations", "template.yaml")
+)
+
+
+def _template_parameter(name):
+    yaml = pytest.importorskip("yaml")
+
+    class TemplateLoader(yaml.SafeLoader):
+        pass
+
+    # CloudFormation intrinsics (!Ref, !Sub, ...) are irrelevant for the parameter defaults
+    TemplateLoader.add_multi_constructor("!", lambda loader, suffix, node: None)
+    with open(_TEMPLATE) as template:
+        return yaml.load(template, Loader=TemplateLoader)["Parameters"][name]["Default"]
+
+
+def _record(event_name, **new_image):
+    dynamodb = {"SequenceNumber": "1"}
+    if new_image:
+        dynamodb["NewImage"] = new_image
+    return {"eventName": event_name, "eventSource": "aws:dynamodb", "dynamodb": dynamodb}
+
+
+@pytest.fixture(scope="module")
+def uva_filter():
+    return compile_patterns([
+        _template_parameter("UvaInsertRecordFilter"),
+        _template_parameter("UvaModifyRecordFilter"),
+        _template_parameter("UvaModifyNumericRecordFilter"),
+    ])
+
+
+# ---------------------------------------------------------------------------
+# GREEN TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestTemplatePatterns:
+    """The FilterCriteria of template.yaml keep only the events each handler uses."""
+
+    def test_measurement_filter_keeps_only_inserts(self):
+        keep = compile_patterns(_template_parameter("MeasurementRecordFilter"))
+
+        assert keep(_record("INSERT", ts={"S": "2024-01-15T10:30:00.000Z"}))
+        assert not keep(_record("MODIFY", ts={"S": "2024-01-15T10:30:00.000Z"}))
+        assert not keep(_record("REMOVE"))
+
+    def test_uva_filter_keeps_inserts_with_racimo_and_modifies_with_coordinates(self, uva_filter):
+        assert uva_filter(_record("INSERT", id={"S": "uva-1"}, racimoID={"S": "racimo-1"}))
+        assert uva_filter(_record("MODIFY", latitude={"S": "4.6"}, longitude={"S": "-74.1"}))
+        assert uva_filter(_record("MODIFY", latitude={"N": "4.6"}, longitude={"N": "-74.1"}))
+
+    def test_operators(self):
+        pattern = {"a": [{"prefix": "uva-"}], "b": [{"anything-but": ["x"]}], "c": [None, 1]}
+
+        assert compile_pattern(pattern)({"a": "uva-1", "b": "y", "c": None})
+        assert not compile_pattern(pattern)({"a": "racimo-1", "b": "y", "c": 1})
+
+    def test_no_patterns_accept_everything(self):
+        assert compile_patterns("")({"eventName": "REMOVE"})
+
+
+# ---------------------------------------------------------------------------
+# RED TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestTemplatePatternsReject:
+    """Irrelevant UVA events and unsupported operators."""
+
+    def test_uva_filter_drops_irrelevant_events(self, uva_filter):
+        assert not uva_filter(_record("INSERT", id={"S": "uva-1"}))
+        assert not uva_filter(_record("MODIFY", name={"S": "UVA renombrada"}))
+        assert not uva_filter(_record("MODIFY", latitude={"S": "4.6"}))
+        assert not uva_filter(_record("REMOVE"))
+
+    def test_unsupported_operator_raises_value_error(self):
+        with pytest.raises(ValueError):
+            compile_pattern({"ts": [{"numeric": [">", 0]}]})
@@ -0,0 +1,352 @@
+"""
+INTEGRATION tests for the shared AppSync client (uva_common.graphql).
+
+The HTTP transport is mocked by reference (unittest.mock.patch on
+requests.Session.post) and the backoff sleep is patched out, so no real network
+call or wait happens.
+"""
+
+import json
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from uva_common import graphql
+from uva_common.deadline import Deadline
+from uva_common.graphql import (
+    GraphQLCircuitOpen,
+    GraphQLClient,
+    GraphQLDeadlineExceeded,
+    GraphQLHTTPError,
+    GraphQLResponseError,
+    GraphQLTransportError,
+    Operation,
+    build_aliased_document,
+)
+
+APPSYNC_URL = "https://example.appsync-api.us-east-1.amazonaws.com/graphql"
+QUERY = "query q($id: ID!) { getUVA(id: $id) { id } }"
+
+
+def _record_calls(client, count, success=True, elapsed=0.01):
+    """Feed the endpoint's circuit breaker with past call outcomes."""
+    for _ in range(count):
+        client.breaker.acquire()
+        client.breaker.record(success, elapsed)
+
+
+def _mock_response(json_body, status_code: int = 200):
+    """Build a minimal requests.Response mock."""
+    mock = MagicMock()
+    mock.status_code = status_code
+    mock.json.return_value = json_body
+    mock.text = json.dumps(json_body)
+    return mock
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff_sleep():
+    with patch.object(graphql.time, "sleep") as sleep:
+        yield sleep
+
+
+# ---------------------------------------------------------------------------
+# GREEN TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestExecute:
+    """Successful requests return `data` and carry auth + deadline."""
+
+    def test_returns_data_and_sends_api_key(self):
+        resp = _mock_response({"data": {"getUVA": {"id": "uva-1"}}})
+        client = GraphQLClient(APPSYNC_URL, api_key="da2-key")
+
+        with patch.object(requests.Session, "post", return_value=resp) as post:
+            data = client.execute(QUERY, {"id": "uva-1"})
+
+        assert data == {"getUVA": {"id": "uva-1"}}
+        kwargs = post.call_args.kwargs
+        assert kwargs["headers"]["x-api-key"] == "da2-key"
+        assert kwargs["timeout"] == client.timeout
+        assert json.loads(kwargs["data"]) == {"query": QUERY, "variables": {"id": "uva-1"}}
+
+    def test_iam_client_signs_the_request(self, create_racimo_env):
+        resp = _mock_response({"data": {"getUVA": None}})
+        client = GraphQLClient(APPSYNC_URL)
+
+        with patch.object(requests.Session, "post", return_value=resp) as post:
+            client.execute(QUERY, {"id": "uva-1"}, operation_name="q")
+
+        headers = post.call_args.kwargs["headers"]
+        assert headers["Authorization"].startswith("AWS4-HMAC-SHA256")
+        assert "x-api-key" not in headers
+
+    def test_throttling_and_5xx_are_retried_with_backoff(self, _no_backoff_sleep):
+        responses = [
+            _mock_response({"message": "slow down"}, status_code=429),
+            _mock_response({"message": "unavailable"}, status_code=503),
+            _mock_response({"data": {"getUVA": {"id": "uva-1"}}}),
+        ]
+        client = GraphQLClient(APPSYNC_URL, api_key="k")
+
+        with patch.object(requests.Session, "post", side_effect=responses) as post:
+            data = client.execute(QUERY, {"id": "uva-1"})
+
+        assert data["getUVA"]["id"] == "uva-1"
+        assert post.call_count == 3
+        assert _no_backoff_sleep.call_count == 2
+
+    def test_timeouts_are_retried_for_idempotent_operations(self):
+        ok = _mock_response({"data": {"getUVA": {"id": "uva-1"}}})
+        client = GraphQLClient(APPSYNC_URL, api_key="k")
+
+        with patch.object(requests.Session, "post", side_effect=[requests.Timeout(), ok]) as post:
+            client.execute(QUERY, {"id": "uva-1"})
+
+        assert post.call_count == 2
+
+    def test_get_graphql_client_is_cached(self):
+        a = graphql.get_graphql_client(APPSYNC_URL, api_key="k")
+
+        assert graphql.get_graphql_client(APPSYNC_URL, api_key="k") is a
+        assert graphql.get_graphql_client(APPSYNC_URL, api_key="other") is not a
+
+
+class TestExecuteBatch:
+    """Several root fields share one aliased document."""
+
+    def test_query_aliases_use_plain_arguments(self):
+        operations = [
+            Operation("getUVA", {"id": ("ID!", "uva-1")}, selection="createdAt", input_object=False),
+            Operation("getUVA", {"id": ("ID!", "uva-2")}, selection="createdAt", input_object=False),
+        ]
+
+        document, variables = build_aliased_document(operations, kind="query")
+
+        assert document == (
+            "query batch($op0_id: ID!, $op1_id: ID!) {\n"
+            "  op0: getUVA(id: $op0_id) { createdAt }\n"
+            "  op1: getUVA(id: $op1_id) { createdAt }\n"
+            "}"
+        )
+        assert variables == {"op0_id": "uva-1", "op1_id": "uva-2"}
+
+    def test_results_come_back_in_operation_order(self):
+        operations = [Operation("getUVA", {"id": ("ID!", f"uva-{i}")}, input_object=False) for i in range(3)]
+        resp = _mock_response({
+            "data": {"op0": {"id": "uva-0"}, "op1": None, "op2": {"id": "uva-2"}},
+            "errors": [{"path": ["op1", "id"], "message": "boom"}],
+        })
+        client = GraphQLClient(APPSYNC_URL, api_key="k")
+
+        with patch.object(requests.Session, "post", return_value=resp):
+            results = client.execute_batch(operations, kind="query")
+
+        assert results[0] == {"id": "uva-0"}
+        assert isinstance(results[1], GraphQLResponseError) and str(results[1]) == "boom"
+        assert results[2] == {"id": "uva-2"}
+
+
+class TestHedgedReads:
+    """A read slower than the endpoint's p95 is sent again and the first answer wins."""
+
+    def test_slow_read_is_hedged_after_p95(self):
+        client = GraphQLClient(APPSYNC_URL, api_key="k")
+        _record_calls(client, graphql.HEDGE_MIN_SAMPLES)
+        release = threading.Event()
+        calls = []
+
+        def post(*args, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                release.wait(5)
+                return _mock_response({"data": {"getUVA": {"id": "primary"}}})
+            return _mock_response({"data": {"getUVA": {"id": "hedge"}}})
+
+        with patch.object(requests.Session, "post", side_effect=post):
+            data = client.execute(QUERY, hedge=True)
+        release.set()
+
+        assert data == {"getUVA": {"id": "hedge"}}
+        assert len(calls) == 2
+
+    def test_no_hedge_without_latency_samples_or_for_mutations(self):
+        client = GraphQLClient(APPSYNC_URL, api_key="k")
+        resp = _mock_response({"data": {"getUVA": {"id": "uva-1"}}})
+
+        with patch.object(requests.Session, "post", return_value=resp) as post:
+            client.execute(QUERY, hedge=True)
+            _record_calls(client, graphql.HEDGE_MIN_SAMPLES)
+            client.execute(QUERY, idempotent=False, hedge=True)
+
+        assert post.call_count == 2
+
+
+# ---------------------------------------------------------------------------
+# RED TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestExecuteFailures:
+    """Failures surface as typed exceptions."""
+
+    def test_graphql_errors_raise_response_error_with_partial_data(self):
+        body = {
+            "data": {"a": None, "b": {"id": "x"}},
+            "errors": [{"message": "boom", "errorType": "DynamoDB:ConditionalCheckFailedException", "path": ["a"]}],
+        }
+        client = GraphQLClient(APPSYNC_URL, api_key="k")
+
+        with patch.object(requests.Session, "post", return_value=_mock_response(body)):
+            with pytest.raises(GraphQLResponseError) as exc_info:
+                client.execute(QUERY)
+
+        assert exc_info.value.data == {"a": None, "b": {"id": "x"}}
+        assert exc_info.value.error_types == {"DynamoDB:ConditionalCheckFailedException"}
+
+    def test_non_idempotent_operation_is_not_retried_on_5xx(self):
+        client = GraphQLClient(APPSYNC_URL, api_key="k")
+        error = _mock_response({"message": "Internal"}, status_code=500)
+
+        with patch.object(requests.Session, "post", return_value=error) as post:
+            with pytest.raises(GraphQLHTTPError) as exc_info:
+                client.execute(QUERY, idempotent=False)
+
+        assert post.call_count == 1
+        assert exc_info.value.status_code == 500
+
+    def test_persistent_5xx_gives_up_after_max_attempts(self):
+        client = GraphQLClient(APPSYNC_URL, api_key="k", max_attempts=3)
+        error = _mock_response({"message": "unavailable"}, status_code=503)
+
+        with patch.object(requests.Session, "post", return_value=error) as post:
+            with pytest.raises(GraphQLHTTPError):
+                client.execute(QUERY)
+
+        assert post.call_count == 3
+
+    def test_4xx_is_not_retried(self):
+        client = GraphQLClient(APPSYNC_URL, api_key="k")
+        error = _mock_response({"message": "Unauthorized"}, status_code=401)
+
+        with patch.object(requests.Session, "post", return_value=error) as post:
+            with pytest.raises(GraphQLHTTPError):
+                client.execute(QUERY)
+
+        assert post.call_count == 1
+
+    def test_connection_errors_raise_transport_error(self):
+        client = GraphQLClient(APPSYNC_URL, api_key="k", max_attempts=2)
+
+        with patch.object(requests.Session, "post", side_effect=requests.ConnectionError("down")):
+            with pytest.raises(GraphQLTransportError):
+                client.execute(QUERY)
+
+    def test_interrupted_response_is_retried_only_for_idempotent_operations(self):
+        ok = _mock_response({"data": {"getUVA": {"id": "uva-1"}}})
+        client = GraphQLClient(APPSYNC_URL, api_key="k")
+        interrupted = requests.exceptions.ChunkedEncodingError("connection broken")
+
+        with patch.object(requests.Session, "post", side_effect=[interrupted, ok]) as post:
+            client.execute(QUERY, {"id": "uva-1"})
+        assert post.call_count == 2
+
+        with patch.object(requests.Session, "post", side_effect=interrupted) as post:
+            with pytest.raises(GraphQLTransportError):
+                client.execute(QUERY, idempotent=False)
+        assert post.call_count == 1
+
+    def test_other_request_errors_raise_transport_error_without_retry(self):
+        client = GraphQLClient(APPSYNC_URL, api_key="k")
+        error = requests.exceptions.ContentDecodingError("bad gzip")
+
+        with patch.object(requests.Session, "post", side_effect=error) as post:
+            with pytest.raises(GraphQLTransportError):
+                client.execute(QUERY)
+
+        assert post.call_count == 1
+
+    def test_missing_credentials_raise_transport_error(self, create_racimo_env):
+        client = GraphQLClient(APPSYNC_URL)
+
+        with patch.object(graphql.runtime, "get_boto_session") as get_session, \
+                patch.object(requests.Session, "post") as post:
+            get_session.return_value.get_credentials.return_value = None
+            with pytest.raises(GraphQLTransportError):
+                client.execute(QUERY)
+
+        post.assert_not_called()
+
+    def test_request_error_fails_only_the_operations_of_its_document(self):
+        client = GraphQLClient(APPSYNC_URL, api_key="k")
+        operations = [Operation("getUVA", {"id": ("ID!", f"uva-{i}")}, input_object=False) for i in range(3)]
+        responses = [requests.exceptions.ContentDecodingError("bad gzip"), _mock_response({"data": {"op0": None}})]
+
+        with patch.object(requests.Session, "post", side_effect=responses):
+            results = client.execute_batch(operations, kind="query", max_operations=2)
+
+        assert [type(result) for result in results] == [GraphQLTransportError, GraphQLTransportError, type(None)]
+
+    def test_response_without_data_raises_response_error(self):
+        client = GraphQLClient(APPSYNC_URL, api_key="k")
+
+        with patch.object(requests.Session, "post", return_value=_mock_response({"unexpected": 1})):
+            with pytest.raises(GraphQLResponseError):
+                client.execute(QUERY)
+
+
+class TestExecuteDeadline:
+    """The invocation deadline bounds every attempt."""
+
+    def test_expired_deadline_makes_no_request(self):
+        client = GraphQLClient(APPSYNC_URL, api_key="k")
+
+        with patch.object(requests.Session, "post") as post:
+            with pytest.raises(GraphQLDeadlineExceeded):
+                client.execute(QUERY, deadline=Deadline(0))
+
+        post.assert_not_called()
+
+    def test_timeout_is_shrunk_and_not_retried_after_the_deadline(self):
+        client = GraphQLClient(APPSYNC_URL, api_key="k", max_attempts=3)
+        now = {"t": 0.0}
+        deadline = Deadline(2.0, clock=lambda: now["t"])
+
+        def post(*args, **kwargs):
+            now["t"] += kwargs["timeout"][1]
+            raise requests.Timeout("slow")
+
+        with patch.object(requests.Session, "post", side_effect=post) as mock_post:
+            with pytest.raises(GraphQLDeadlineExceeded):
+                client.execute(QUERY, deadline=deadline)
+
+        assert mock_post.call_count == 1
+        assert mock_post.call_args.kwargs["timeout"] == (2.0, 2.0)
+
+
+class TestCircuitBreaker:
+    """A degraded endpoint fails fast instead of being retried."""
+
+    def test_open_circuit_makes_no_request(self):
+        client = GraphQLClient(APPSYNC_URL, api_key="k")
+        _record_calls(client, 10, success=False)
+
+        with patch.object(requests.Session, "post") as post:
+            with pytest.raises(GraphQLCircuitOpen):
+                client.execute(QUERY)
+
+        post.assert_not_called()
+
+    def test_retries_stop_once_the_circuit_opens(self):
+        client = GraphQLClient(APPSYNC_URL, api_key="k", max_attempts=3)
+        _record_calls(client, 9, success=False)
+        error = _mock_response({"message": "unavailable"}, status_code=503)
+
+        with patch.object(requests.Session, "post", return_value=error) as post:
+            with pytest.raises(GraphQLCircuitOpen):
+                client.execute(QUERY)
+
+        assert post.call_count == 1
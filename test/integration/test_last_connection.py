@@ -2,7 +2,8 @@
 INTEGRATION tests for GET /{id_uva}/connection (last_connection.lambda_handler).
 
 These exercise the handler function in-process with the AppSync HTTP datastore
-mocked by reference (unittest.mock.patch on last_connection.requests.post). No
+mocked by reference (unittest.mock.patch on requests.Session.post, the transport
+behind the shared keep-alive sessions of uva_common.runtime). No
 real AWS / AppSync connectivity is used here — the REAL end-to-end coverage for
 this endpoint lives in test/e2e/test_last_connection_e2e.py, which drives the
 deployed handler via `sam local start-api` against the real AppSync API.
@@ -15,11 +16,17 @@ than a stale .aws-sam/build copy.
 import json
 import os
 import sys
+import threading
 import time
 from datetime import datetime, timedelta, timezone
 from unittest.mock import MagicMock, patch
 
+import boto3
 import pytest
+import requests
+from moto import mock_dynamodb
+
+from uva_common import circuit, runtime
 
 # ---------------------------------------------------------------------------
 # Inject the handler's source directory BEFORE importing the module so Python
@@ -74,6 +81,122 @@ def _apigw_event(id_uva: str, query_params=None) -> dict:
     }
 
 
+@pytest.fixture(autouse=True)
+def _clear_connection_cache():
+    """Every test starts with an empty per-UVA response cache."""
+    _lc_module.connection_cache.clear()
+    _lc_module.creation_dates.clear()
+    _lc_module.racimo_pages_cache.clear()
+    yield
+    # Esperar las revalidaciones en segundo plano antes de restaurar los mocks
+    _lc_module._revalidator.submit(lambda: None).result()
+    _lc_module.connection_cache.clear()
+    _lc_module.creation_dates.clear()
+    _lc_module.racimo_pages_cache.clear()
+
+
+@pytest.fixture()
+def last_seen_table(monkeypatch):
+    """moto LastSeen table wired into the handler."""
+    with mock_dynamodb():
+        runtime.reset()
+        table = boto3.resource("dynamodb", region_name="us-east-1").create_table(
+            TableName="LastSeen-test",
+            KeySchema=[{"AttributeName": "uvaID", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "uvaID", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        monkeypatch.setattr(_lc_module, "LAST_SEEN_TABLE", "LastSeen-test")
+        yield table
+        runtime.reset()
+
+
+def _aliased_side_effect(ts_by_id, created_by_id=None, failing_ids=(), delay_by_id=None):
+    """Answer the aliased all-mode documents alias by alias.
+
+    ``ts_by_id`` maps each UVA id to its last measurement ts (None → no items),
+    ``created_by_id`` to its getUVA.createdAt (missing → getUVA null). Ids in
+    ``failing_ids`` get an AppSync error on their measurement alias and
+    ``delay_by_id`` delays the whole document by the largest delay it contains.
+    """
+    created_by_id = created_by_id or {}
+    delay_by_id = delay_by_id or {}
+
+    def side_effect(*args, **kwargs):
+        variables = json.loads(kwargs["data"])["variables"]
+        data, errors, delay = {}, [], 0
+        for name, value in variables.items():
+            alias, argument = name.split("_", 1)
+            delay = max(delay, delay_by_id.get(value, 0))
+            if argument == "uvaID":
+                if value in failing_ids:
+                    data[alias] = None
+                    errors.append({"path": [alias], "message": "boom"})
+                else:
+                    ts = ts_by_id.get(value)
+                    data[alias] = {"items": [{"ts": ts}] if ts else []}
+            elif argument == "id":
+                created_at = created_by_id.get(value)
+                data[alias] = {"createdAt": created_at} if created_at else None
+        time.sleep(delay)
+        body = {"data": data}
+        if errors:
+            body["errors"] = errors
+        return _mock_response(body)
+
+    return side_effect
+
+
+def _bulk_event(method="GET", query_params=None, body=None) -> dict:
+    """Build an API Gateway proxy event for the paged /connection route."""
+    return {
+        "resource": "/connection",
+        "pathParameters": None,
+        "queryStringParameters": query_params,
+        "httpMethod": method,
+        "headers": {},
+        "body": json.dumps(body) if body is not None else None,
+    }
+
+
+def _bulk_side_effect(uvas_by_racimo, racimos_by_code=None, ts_by_id=None, queries=None,
+                      racimo_page_size=None):
+    """Answer the listing queries of the paged route and the aliased status documents.
+
+    ``uVASByRacimoID`` honours ``limit`` and uses the offset as ``nextToken``;
+    ``listRACIMOS`` returns ``racimos_by_code[linkageCode]`` in pages of
+    ``racimo_page_size`` (one page when None), also keyed by offset. Listing
+    variables are appended to ``queries`` when given.
+    """
+    racimos_by_code = racimos_by_code or {}
+    statuses = _aliased_side_effect(ts_by_id or {})
+
+    def side_effect(*args, **kwargs):
+        payload = json.loads(kwargs["data"])
+        query, variables = payload["query"], payload["variables"]
+        if "uVASByRacimoID" in query:
+            if queries is not None:
+                queries.append(variables)
+            uvas = uvas_by_racimo.get(variables["racimoID"], [])
+            start = int(variables["nextToken"] or 0)
+            end = start + variables["limit"]
+            page = {"items": [{"id": uva_id} for uva_id in uvas[start:end]],
+                    "nextToken": str(end) if end < len(uvas) else None}
+            return _mock_response({"data": {"uVASByRacimoID": page}})
+        if "listRACIMOS" in query:
+            if queries is not None:
+                queries.append(variables)
+            racimos = racimos_by_code.get(variables["linkageCode"], [])
+            start = int(variables["nextToken"] or 0)
+            end = start + (racimo_page_size or len(racimos))
+            return _mock_response({"data": {"listRACIMOS": {
+                "items": [{"id": racimo_id} for racimo_id in racimos[start:end]],
+                "nextToken": str(end) if end < len(racimos) else None}}})
+        return statuses(*args, **kwargs)
+
+    return side_effect
+
+
 # ---------------------------------------------------------------------------
 # GREEN TESTS
 # ---------------------------------------------------------------------------
@@ -96,7 +219,7 @@ class TestSingleUvaRecentMeasurement:
             }
         )
 
-        with patch.object(_lc_module.requests, "post", return_value=measurement_resp):
+        with patch.object(requests.Session, "post", return_value=measurement_resp):
             response = lambda_handler(_apigw_event("uva-001"), lambda_context)
 
         assert response["statusCode"] == 200
@@ -121,7 +244,7 @@ class TestSingleUvaRecentMeasurement:
             }
         )
 
-        with patch.object(_lc_module.requests, "post", return_value=measurement_resp):
+        with patch.object(requests.Session, "post", return_value=measurement_resp):
             response = lambda_handler(_apigw_event("uva-001"), lambda_context)
 
         body = json.loads(response["body"])
@@ -145,7 +268,7 @@ class TestSingleUvaOldMeasurement:
             }
         )
 
-        with patch.object(_lc_module.requests, "post", return_value=measurement_resp):
+        with patch.object(requests.Session, "post", return_value=measurement_resp):
             response = lambda_handler(_apigw_event("uva-002"), lambda_context)
 
         assert response["statusCode"] == 200
@@ -168,7 +291,7 @@ class TestSingleUvaOldMeasurement:
             }
         )
 
-        with patch.object(_lc_module.requests, "post", return_value=measurement_resp):
+        with patch.object(requests.Session, "post", return_value=measurement_resp):
             response = lambda_handler(_apigw_event("uva-002"), lambda_context)
 
         body = json.loads(response["body"])
@@ -178,76 +301,62 @@ class TestSingleUvaOldMeasurement:
 
 
 class TestSingleUvaNoMeasurementFallback:
-    """No measurement items returned — handler falls back to getUVA createdAt."""
+    """No measurement items returned — handler falls back to getUVA createdAt,
+    which arrives in the same query document."""
 
     def test_single_uva_no_measurement_falls_back_to_creation_date_returns_200(
         self, last_connection_env, lambda_context
     ):
-        empty_measurement_resp = _mock_response(
-            {"data": {"measurementsByUvaIDAndTs": {"items": []}}}
-        )
-        creation_resp = _mock_response(
-            {"data": {"getUVA": {"createdAt": "2026-06-01T00:00:00Z"}}}
+        combined_resp = _mock_response(
+            {
+                "data": {
+                    "measurementsByUvaIDAndTs": {"items": []},
+                    "getUVA": {"createdAt": "2026-06-01T00:00:00Z"},
+                }
+            }
         )
 
-        call_counter = {"n": 0}
-
-        def side_effect(*args, **kwargs):
-            call_counter["n"] += 1
-            if call_counter["n"] == 1:
-                return empty_measurement_resp
-            return creation_resp
-
-        with patch.object(_lc_module.requests, "post", side_effect=side_effect):
+        with patch.object(requests.Session, "post", return_value=combined_resp):
             response = lambda_handler(_apigw_event("uva-003"), lambda_context)
 
         assert response["statusCode"] == 200
         body = json.loads(response["body"])
-        assert "uva-003" in body
+        assert body["uva-003"]["ts"] == 1780272000000
 
-    def test_single_uva_no_measurement_fallback_makes_two_appsync_calls(
+    def test_single_uva_no_measurement_fallback_makes_one_appsync_call(
         self, last_connection_env, lambda_context
     ):
-        empty_measurement_resp = _mock_response(
-            {"data": {"measurementsByUvaIDAndTs": {"items": []}}}
-        )
-        creation_resp = _mock_response(
-            {"data": {"getUVA": {"createdAt": "2026-06-01T00:00:00Z"}}}
+        combined_resp = _mock_response(
+            {
+                "data": {
+                    "measurementsByUvaIDAndTs": {"items": []},
+                    "getUVA": {"createdAt": "2026-06-01T00:00:00Z"},
+                }
+            }
         )
 
-        responses_list = [empty_measurement_resp, creation_resp]
-        call_count = {"n": 0}
-
-        def side_effect(*args, **kwargs):
-            idx = call_count["n"]
-            call_count["n"] += 1
-            return responses_list[idx]
-
-        with patch.object(_lc_module.requests, "post", side_effect=side_effect) as mock_post:
+        with patch.object(requests.Session, "post", return_value=combined_resp) as mock_post:
             lambda_handler(_apigw_event("uva-003"), lambda_context)
 
-        assert mock_post.call_count == 2
+        assert mock_post.call_count == 1
+        query = json.loads(mock_post.call_args.kwargs["data"])["query"]
+        assert "measurementsByUvaIDAndTs" in query
+        assert "getUVA" in query
 
     def test_single_uva_no_measurement_no_fallback_returns_none_for_device(
         self, last_connection_env, lambda_context
     ):
-        """When both queries return empty/None, device entry is None."""
-        empty_measurement_resp = _mock_response(
-            {"data": {"measurementsByUvaIDAndTs": {"items": []}}}
-        )
-        empty_creation_resp = _mock_response(
-            {"data": {"getUVA": {"createdAt": None}}}
+        """When both fields come back empty/None, device entry is None."""
+        empty_resp = _mock_response(
+            {
+                "data": {
+                    "measurementsByUvaIDAndTs": {"items": []},
+                    "getUVA": {"createdAt": None},
+                }
+            }
         )
 
-        responses_list = [empty_measurement_resp, empty_creation_resp]
-        call_count = {"n": 0}
-
-        def side_effect(*args, **kwargs):
-            idx = call_count["n"]
-            call_count["n"] += 1
-            return responses_list[idx]
-
-        with patch.object(_lc_module.requests, "post", side_effect=side_effect):
+        with patch.object(requests.Session, "post", return_value=empty_resp):
             response = lambda_handler(_apigw_event("uva-003"), lambda_context)
 
         assert response["statusCode"] == 200
@@ -255,34 +364,65 @@ class TestSingleUvaNoMeasurementFallback:
         # get_connection_status returns None when lastConnection is falsy
         assert body["uva-003"] is None
 
-    def test_nonexistent_uva_getuva_null_raises_attribute_error_bug(
+    def test_nonexistent_uva_getuva_null_returns_none_for_device(
         self, last_connection_env, lambda_context
     ):
-        """REAL-shape AppSync response for a nonexistent id triggers a BUG.
-
-        For an unknown id the live AppSync returns ``getUVA: null`` (NOT a dict
-        with a null field). get_creation_date then does
-        ``data.get('data', {}).get('getUVA', {}).get('createdAt')`` which becomes
-        ``None.get('createdAt')`` because the key exists with a None value ->
-        AttributeError. This is the same defect the e2e suite observes as a real
-        HTTP 502 (test_nonexistent_uva_returns_502_handler_bug).
+        """REAL-shape AppSync response for a nonexistent id: ``getUVA: null``.
+
+        This used to raise AttributeError (``None.get('createdAt')``) and surface
+        as an HTTP 502; the folded query reads it as "no information".
         """
-        empty_measurement_resp = _mock_response(
-            {"data": {"measurementsByUvaIDAndTs": {"items": []}}}
+        getuva_null_resp = _mock_response(
+            {"data": {"measurementsByUvaIDAndTs": {"items": []}, "getUVA": None}}
         )
-        getuva_null_resp = _mock_response({"data": {"getUVA": None}})
 
-        responses_list = [empty_measurement_resp, getuva_null_resp]
-        call_count = {"n": 0}
+        with patch.object(requests.Session, "post", return_value=getuva_null_resp):
+            response = lambda_handler(_apigw_event("nonexistent-uva"), lambda_context)
+
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"]) == {"nonexistent-uva": None}
+
+
+class TestCreationDateMemo:
+    """createdAt of never-connected UVAs is memoized across requests."""
+
+    _combined = {
+        "data": {
+            "measurementsByUvaIDAndTs": {"items": []},
+            "getUVA": {"createdAt": "2026-06-01T00:00:00Z"},
+        }
+    }
+
+    def test_memoized_uva_skips_getuva_without_last_seen_index(
+        self, last_connection_env, lambda_context
+    ):
+        with patch.object(requests.Session, "post", return_value=_mock_response(self._combined)):
+            lambda_handler(_apigw_event("uva-new"), lambda_context)
+        _lc_module.connection_cache.clear()
+
+        empty = _mock_response({"data": {"measurementsByUvaIDAndTs": {"items": []}}})
+        with patch.object(requests.Session, "post", return_value=empty) as mock_post:
+            response = lambda_handler(_apigw_event("uva-new"), lambda_context)
+
+        assert mock_post.call_count == 1
+        assert "getUVA" not in json.loads(mock_post.call_args.kwargs["data"])["query"]
+        assert json.loads(response["body"])["uva-new"]["ts"] == 1780272000000
 
-        def side_effect(*args, **kwargs):
-            idx = call_count["n"]
-            call_count["n"] += 1
-            return responses_list[idx]
+    def test_memoized_uva_makes_no_appsync_call_with_last_seen_index(
+        self, last_connection_env, lambda_context, last_seen_table
+    ):
+        with patch.object(requests.Session, "post", return_value=_mock_response(self._combined)):
+            lambda_handler(_apigw_event("uva-new"), lambda_context)
+        _lc_module.connection_cache.clear()
+
+        with patch.object(requests.Session, "post") as mock_post:
+            single = lambda_handler(_apigw_event("uva-new"), lambda_context)
+            _lc_module.connection_cache.clear()
+            bulk = lambda_handler(_apigw_event("all", query_params={"id": "uva-new"}), lambda_context)
 
-        with patch.object(_lc_module.requests, "post", side_effect=side_effect):
-            with pytest.raises(AttributeError):
-                lambda_handler(_apigw_event("nonexistent-uva"), lambda_context)
+        mock_post.assert_not_called()
+        assert json.loads(single["body"])["uva-new"]["ts"] == 1780272000000
+        assert json.loads(bulk["body"]) == json.loads(single["body"])
 
 
 class TestAllModeMultipleIds:
@@ -292,19 +432,10 @@ class TestAllModeMultipleIds:
         self, last_connection_env, lambda_context
     ):
         recent_ts = _now_iso_z()
-        mocked_response = _mock_response(
-            {
-                "data": {
-                    "measurementsByUvaIDAndTs": {
-                        "items": [{"ts": recent_ts, "createdAt": recent_ts}]
-                    }
-                }
-            }
-        )
-
         event = _apigw_event("all", query_params={"id": "uvaA,uvaB"})
 
-        with patch.object(_lc_module.requests, "post", return_value=mocked_response):
+        side_effect = _aliased_side_effect({"uvaA": recent_ts, "uvaB": recent_ts})
+        with patch.object(requests.Session, "post", side_effect=side_effect):
             response = lambda_handler(event, lambda_context)
 
         assert response["statusCode"] == 200
@@ -316,19 +447,10 @@ class TestAllModeMultipleIds:
         self, last_connection_env, lambda_context
     ):
         recent_ts = _now_iso_z()
-        mocked_response = _mock_response(
-            {
-                "data": {
-                    "measurementsByUvaIDAndTs": {
-                        "items": [{"ts": recent_ts, "createdAt": recent_ts}]
-                    }
-                }
-            }
-        )
-
         event = _apigw_event("all", query_params={"id": "uvaA,uvaB"})
 
-        with patch.object(_lc_module.requests, "post", return_value=mocked_response):
+        side_effect = _aliased_side_effect({"uvaA": recent_ts, "uvaB": recent_ts})
+        with patch.object(requests.Session, "post", side_effect=side_effect):
             response = lambda_handler(event, lambda_context)
 
         body = json.loads(response["body"])
@@ -341,19 +463,10 @@ class TestAllModeMultipleIds:
         self, last_connection_env, lambda_context
     ):
         recent_ts = _now_iso_z()
-        mocked_response = _mock_response(
-            {
-                "data": {
-                    "measurementsByUvaIDAndTs": {
-                        "items": [{"ts": recent_ts, "createdAt": recent_ts}]
-                    }
-                }
-            }
-        )
-
         event = _apigw_event("all", query_params={"id": "uvaOnly"})
 
-        with patch.object(_lc_module.requests, "post", return_value=mocked_response):
+        side_effect = _aliased_side_effect({"uvaOnly": recent_ts})
+        with patch.object(requests.Session, "post", side_effect=side_effect):
             response = lambda_handler(event, lambda_context)
 
         assert response["statusCode"] == 200
@@ -362,15 +475,320 @@ class TestAllModeMultipleIds:
         assert len(body) == 1
 
 
+class TestAllModeAliasedQuery:
+    """id_uva='all' asks for every id in one aliased document per chunk."""
+
+    def test_all_mode_ids_share_one_appsync_call(
+        self, last_connection_env, lambda_context
+    ):
+        recent_ts = _now_iso_z()
+        ids = [f"uva{i}" for i in range(10)]
+        event = _apigw_event("all", query_params={"id": ",".join(ids)})
+
+        side_effect = _aliased_side_effect({uva_id: recent_ts for uva_id in ids})
+        with patch.object(requests.Session, "post", side_effect=side_effect) as mock_post:
+            response = lambda_handler(event, lambda_context)
+
+        assert mock_post.call_count == 1
+        query = json.loads(mock_post.call_args.kwargs["data"])["query"]
+        assert query.count("measurementsByUvaIDAndTs(") == 10
+        assert query.count("getUVA(") == 10
+        body = json.loads(response["body"])
+        assert list(body) == ids
+
+    def test_all_mode_documents_are_chunked_by_max_aliases(
+        self, last_connection_env, lambda_context, monkeypatch
+    ):
+        monkeypatch.setattr(_lc_module, "CONNECTION_MAX_ALIASES", 4)
+        recent_ts = _now_iso_z()
+        ids = [f"uva{i}" for i in range(5)]
+        event = _apigw_event("all", query_params={"id": ",".join(ids)})
+
+        side_effect = _aliased_side_effect({uva_id: recent_ts for uva_id in ids})
+        with patch.object(requests.Session, "post", side_effect=side_effect) as mock_post:
+            response = lambda_handler(event, lambda_context)
+
+        # 2 alias por UVA, 4 alias por documento -> 3 documentos
+        assert mock_post.call_count == 3
+        assert set(json.loads(response["body"])) == set(ids)
+
+    def test_all_mode_creation_date_fallback_needs_no_extra_call(
+        self, last_connection_env, lambda_context
+    ):
+        recent_ts = _now_iso_z()
+        event = _apigw_event("all", query_params={"id": "uvaNew,uvaOld,uvaGone"})
+
+        side_effect = _aliased_side_effect(
+            {"uvaNew": None, "uvaOld": recent_ts, "uvaGone": None},
+            created_by_id={"uvaNew": "2026-06-01T00:00:00Z"},
+        )
+        with patch.object(requests.Session, "post", side_effect=side_effect) as mock_post:
+            response = lambda_handler(event, lambda_context)
+
+        assert mock_post.call_count == 1
+        body = json.loads(response["body"])
+        assert body["uvaNew"]["ts"] == 1780272000000
+        assert body["uvaOld"]["connection"] is True
+        # getUVA null en un alias no rompe la respuesta
+        assert body["uvaGone"] is None
+
+
+class TestAllModeConcurrentFanOut:
+    """id_uva='all' sends its documents concurrently, each id isolated from the others."""
+
+    def test_all_mode_documents_run_concurrently(
+        self, last_connection_env, lambda_context, monkeypatch
+    ):
+        monkeypatch.setattr(_lc_module, "CONNECTION_CONCURRENCY", 8)
+        monkeypatch.setattr(_lc_module, "CONNECTION_MAX_ALIASES", 2)
+        recent_ts = _now_iso_z()
+        ids = [f"uva{i}" for i in range(8)]
+        event = _apigw_event("all", query_params={"id": ",".join(ids)})
+
+        side_effect = _aliased_side_effect(
+            {uva_id: recent_ts for uva_id in ids},
+            delay_by_id={uva_id: 0.2 for uva_id in ids},
+        )
+        started = time.monotonic()
+        with patch.object(requests.Session, "post", side_effect=side_effect):
+            response = lambda_handler(event, lambda_context)
+        elapsed = time.monotonic() - started
+
+        body = json.loads(response["body"])
+        assert list(body) == ids
+        assert all(body[uva_id]["connection"] is True for uva_id in ids)
+        # 8 documentos de 0.2 s en serie tardarían 1.6 s
+        assert elapsed < 1.0
+
+    def test_all_mode_failing_id_does_not_fail_the_others(
+        self, last_connection_env, lambda_context
+    ):
+        recent_ts = _now_iso_z()
+        event = _apigw_event("all", query_params={"id": "uvaA,uvaBroken,uvaB"})
+
+        side_effect = _aliased_side_effect(
+            {"uvaA": recent_ts, "uvaB": recent_ts}, failing_ids={"uvaBroken"}
+        )
+        with patch.object(requests.Session, "post", side_effect=side_effect):
+            response = lambda_handler(event, lambda_context)
+
+        assert response["statusCode"] == 200
+        body = json.loads(response["body"])
+        assert body["uvaBroken"] == {"error": "lookup_failed"}
+        assert body["uvaA"]["connection"] is True
+        assert body["uvaB"]["connection"] is True
+
+    def test_all_mode_slow_document_is_reported_as_timeout(
+        self, last_connection_env, lambda_context, monkeypatch
+    ):
+        monkeypatch.setattr(_lc_module, "CONNECTION_DEADLINE", 0.3)
+        monkeypatch.setattr(_lc_module, "CONNECTION_MAX_ALIASES", 2)
+        recent_ts = _now_iso_z()
+        event = _apigw_event("all", query_params={"id": "uvaSlow,uvaFast"})
+
+        side_effect = _aliased_side_effect(
+            {"uvaSlow": recent_ts, "uvaFast": recent_ts}, delay_by_id={"uvaSlow": 1.0}
+        )
+        started = time.monotonic()
+        with patch.object(requests.Session, "post", side_effect=side_effect):
+            response = lambda_handler(event, lambda_context)
+
+        assert time.monotonic() - started < 0.9
+        body = json.loads(response["body"])
+        assert body["uvaSlow"] == {"error": "timeout"}
+        assert body["uvaFast"]["connection"] is True
+
+
+class TestLastSeenIndexReads:
+    """UVAs present in the last-seen index are answered without AppSync."""
+
+    def test_single_uva_in_index_makes_no_appsync_call(
+        self, last_connection_env, lambda_context, last_seen_table
+    ):
+        now_ms = int(time.time() * 1000)
+        last_seen_table.put_item(Item={"uvaID": "uva-001", "ts": now_ms})
+
+        with patch.object(requests.Session, "post") as mock_post:
+            response = lambda_handler(_apigw_event("uva-001"), lambda_context)
+
+        mock_post.assert_not_called()
+        assert json.loads(response["body"]) == {"uva-001": {"connection": True, "ts": now_ms}}
+
+    def test_all_mode_queries_appsync_only_for_uvas_missing_from_index(
+        self, last_connection_env, lambda_context, last_seen_table
+    ):
+        old_ms = int((time.time() - 3 * 24 * 3600) * 1000)
+        last_seen_table.put_item(Item={"uvaID": "uvaIndexed", "ts": old_ms})
+        event = _apigw_event("all", query_params={"id": "uvaNew,uvaIndexed"})
+
+        side_effect = _aliased_side_effect({"uvaNew": _now_iso_z()})
+        with patch.object(requests.Session, "post", side_effect=side_effect) as mock_post:
+            response = lambda_handler(event, lambda_context)
+
+        assert mock_post.call_count == 1
+        variables = json.loads(mock_post.call_args.kwargs["data"])["variables"]
+        assert "uvaIndexed" not in variables.values()
+        body = json.loads(response["body"])
+        assert list(body) == ["uvaNew", "uvaIndexed"]
+        assert body["uvaIndexed"] == {"connection": False, "ts": old_ms}
+        assert body["uvaNew"]["connection"] is True
+
+
+class TestResponseCache:
+    """Repeated polls are served from the per-UVA cache with ETag revalidation."""
+
+    def _single_response(self, ts):
+        return _mock_response({"data": {"measurementsByUvaIDAndTs": {"items": [{"ts": ts}]}}})
+
+    def test_repeated_poll_is_served_from_memory(self, last_connection_env, lambda_context):
+        with patch.object(requests.Session, "post", return_value=self._single_response(_now_iso_z())) as mock_post:
+            first = lambda_handler(_apigw_event("uva-001"), lambda_context)
+            second = lambda_handler(_apigw_event("uva-001"), lambda_context)
+
+        assert mock_post.call_count == 1
+        assert second["body"] == first["body"]
+        assert "max-age=" in first["headers"]["Cache-Control"]
+        assert first["headers"]["ETag"] == second["headers"]["ETag"]
+
+    def test_matching_if_none_match_returns_304_without_body(self, last_connection_env, lambda_context):
+        with patch.object(requests.Session, "post", return_value=self._single_response(_now_iso_z())):
+            first = lambda_handler(_apigw_event("uva-001"), lambda_context)
+            event = dict(_apigw_event("uva-001"), headers={"if-none-match": first["headers"]["ETag"]})
+            second = lambda_handler(event, lambda_context)
+
+        assert second["statusCode"] == 304
+        assert second["body"] == ""
+        assert second["headers"]["ETag"] == first["headers"]["ETag"]
+
+    def test_stale_entry_is_served_and_revalidated_in_background(
+        self, last_connection_env, lambda_context, monkeypatch
+    ):
+        now = {"t": 1_000.0}
+        monkeypatch.setattr(_lc_module.connection_cache, "clock", lambda: now["t"])
+        old_ts, new_ts = _old_iso_z(hours=2), _now_iso_z()
+
+        with patch.object(requests.Session, "post", return_value=self._single_response(old_ts)):
+            first = lambda_handler(_apigw_event("uva-001"), lambda_context)
+
+        now["t"] += _lc_module.CONNECTION_CACHE_TTL + 1
+        with patch.object(requests.Session, "post", return_value=self._single_response(new_ts)) as mock_post:
+            stale = lambda_handler(_apigw_event("uva-001"), lambda_context)
+            _lc_module._revalidator.submit(lambda: None).result()
+            fresh = lambda_handler(_apigw_event("uva-001"), lambda_context)
+
+        assert stale["body"] == first["body"]
+        assert mock_post.call_count == 1
+        assert fresh["body"] != first["body"]
+
+
+class TestBulkConnectionPages:
+    """/connection walks a racimo, an organization or a POSTed id list page by page."""
+
+    def test_racimo_is_paged_with_next_token(self, last_connection_env, lambda_context):
+        recent_ts = _now_iso_z()
+        queries = []
+        side_effect = _bulk_side_effect(
+            {"r1": ["u1", "u2", "u3"]}, ts_by_id={"u1": recent_ts, "u2": recent_ts, "u3": recent_ts},
+            queries=queries,
+        )
+
+        with patch.object(requests.Session, "post", side_effect=side_effect):
+            first = lambda_handler(_bulk_event(query_params={"racimo": "r1", "limit": "2"}), lambda_context)
+            first_body = json.loads(first["body"])
+            second = lambda_handler(
+                _bulk_event(query_params={"racimo": "r1", "limit": "2", "nextToken": first_body["nextToken"]}),
+                lambda_context,
+            )
+
+        assert first["statusCode"] == 200
+        assert list(first_body["items"]) == ["u1", "u2"]
+        assert first_body["items"]["u1"]["connection"] is True
+        second_body = json.loads(second["body"])
+        assert list(second_body["items"]) == ["u3"]
+        assert second_body["nextToken"] is None
+        assert [(q["racimoID"], q["limit"], q["nextToken"]) for q in queries] == [
+            ("r1", 2, None), ("r1", 2, "2"),
+        ]
+
+    def test_organization_spans_its_racimos(self, last_connection_env, lambda_context):
+        recent_ts = _now_iso_z()
+        side_effect = _bulk_side_effect(
+            {"r1": ["u1"], "r2": ["u2", "u3"]},
+            racimos_by_code={"ORG-1": ["r2", "r1"]},
+            ts_by_id={"u1": recent_ts, "u2": recent_ts, "u3": recent_ts},
+        )
+        items, token, pages = {}, None, 0
+
+        with patch.object(requests.Session, "post", side_effect=side_effect):
+            while True:
+                params = {"linkageCode": "ORG-1", "limit": "2"}
+                if token:
+                    params["nextToken"] = token
+                body = json.loads(lambda_handler(_bulk_event(query_params=params), lambda_context)["body"])
+                items.update(body["items"])
+                pages += 1
+                token = body["nextToken"]
+                if token is None:
+                    break
+
+        assert list(items) == ["u2", "u3", "u1"]
+        assert pages == 2
+
+    def test_organization_racimos_are_listed_lazily(self, last_connection_env, lambda_context):
+        recent_ts = _now_iso_z()
+        queries = []
+        side_effect = _bulk_side_effect(
+            {"r1": ["u1"], "r2": ["u2"], "r3": ["u3"]},
+            racimos_by_code={"ORG-1": ["r1", "r2", "r3"]},
+            ts_by_id={"u1": recent_ts, "u2": recent_ts, "u3": recent_ts},
+            queries=queries, racimo_page_size=1,
+        )
+        items, token = {}, None
+
+        with patch.object(requests.Session, "post", side_effect=side_effect):
+            first = json.loads(lambda_handler(
+                _bulk_event(query_params={"linkageCode": "ORG-1", "limit": "1"}), lambda_context)["body"])
+            first_listings = [q for q in queries if "linkageCode" in q]
+            token = first["nextToken"]
+            items.update(first["items"])
+            while token:
+                body = json.loads(lambda_handler(
+                    _bulk_event(query_params={"linkageCode": "ORG-1", "limit": "1", "nextToken": token}),
+                    lambda_context)["body"])
+                items.update(body["items"])
+                token = body["nextToken"]
+
+        # The first page only reads the first page of racimos
+        assert first_listings == [{"linkageCode": "ORG-1", "nextToken": None}]
+        assert list(first["items"]) == ["u1"]
+        assert list(items) == ["u1", "u2", "u3"]
+
+    def test_post_body_ids_are_paged(self, last_connection_env, lambda_context):
+        recent_ts = _now_iso_z()
+        ids = ["u1", "u2", "u3"]
+        side_effect = _bulk_side_effect({}, ts_by_id={uva_id: recent_ts for uva_id in ids})
+
+        with patch.object(requests.Session, "post", side_effect=side_effect):
+            first = json.loads(lambda_handler(
+                _bulk_event("POST", body={"ids": ids, "limit": 2}), lambda_context)["body"])
+            second = json.loads(lambda_handler(
+                _bulk_event("POST", body={"ids": ids, "limit": 2, "nextToken": first["nextToken"]}),
+                lambda_context)["body"])
+
+        assert list(first["items"]) == ["u1", "u2"]
+        assert list(second["items"]) == ["u3"]
+        assert second["nextToken"] is None
+
+
 # ---------------------------------------------------------------------------
 # RED TESTS
 # ---------------------------------------------------------------------------
 
 
 class TestMissingPathParametersIdUva:
-    """Missing pathParameters / id_uva → KeyError (no try/except in handler)."""
+    """No id_uva in the path → the paged /connection route, which needs a source → 400."""
 
-    def test_missing_path_parameters_id_uva_raises_key_error(
+    def test_missing_path_parameters_is_a_bad_request(
         self, last_connection_env, lambda_context
     ):
         event_without_path_params = {
@@ -380,10 +798,14 @@ class TestMissingPathParametersIdUva:
             "body": None,
         }
 
-        with pytest.raises(KeyError):
-            lambda_handler(event_without_path_params, lambda_context)
+        with patch.object(requests.Session, "post") as mock_post:
+            response = lambda_handler(event_without_path_params, lambda_context)
 
-    def test_missing_id_uva_key_within_path_parameters_raises_key_error(
+        mock_post.assert_not_called()
+        assert response["statusCode"] == 400
+        assert "racimo" in json.loads(response["body"])["error"]
+
+    def test_missing_id_uva_key_within_path_parameters_is_a_bad_request(
         self, last_connection_env, lambda_context
     ):
         event_with_empty_path_params = {
@@ -394,41 +816,64 @@ class TestMissingPathParametersIdUva:
             "body": None,
         }
 
-        with pytest.raises(KeyError):
-            lambda_handler(event_with_empty_path_params, lambda_context)
+        response = lambda_handler(event_with_empty_path_params, lambda_context)
 
+        assert response["statusCode"] == 400
 
-class TestAllModeWithoutIdQueryParam:
-    """id_uva='all' but no 'id' query param → AttributeError (None.split)."""
 
-    def test_all_mode_without_id_query_param_raises_attribute_error(
+class TestAllModeDuplicateIds:
+    """Repeated ids in ?id= are looked up once and appear once in the body."""
+
+    def test_all_mode_duplicate_ids_are_queried_once(
         self, last_connection_env, lambda_context
     ):
-        event = {
-            "pathParameters": {"id_uva": "all"},
-            "queryStringParameters": {},
-            "httpMethod": "GET",
-            "headers": {},
-            "body": None,
-        }
+        recent_ts = _now_iso_z()
+        event = _apigw_event("all", query_params={"id": "uvaA,uvaA,uvaA"})
 
-        with pytest.raises(AttributeError):
-            lambda_handler(event, lambda_context)
+        side_effect = _aliased_side_effect({"uvaA": recent_ts})
+        with patch.object(requests.Session, "post", side_effect=side_effect) as mock_post:
+            response = lambda_handler(event, lambda_context)
 
-    def test_all_mode_null_query_string_parameters_raises_attribute_error(
-        self, last_connection_env, lambda_context
+        assert list(json.loads(response["body"])) == ["uvaA"]
+        assert mock_post.call_count == 1
+
+
+class TestAllModeWithoutIdQueryParam:
+    """id_uva='all' without a usable 'id' query param → 400 instead of a crash."""
+
+    @pytest.mark.parametrize("query_params", [{}, None])
+    def test_all_mode_without_id_query_param_is_a_bad_request(
+        self, last_connection_env, lambda_context, query_params
     ):
-        """queryStringParameters=None collapses to {}, 'id' missing -> AttributeError."""
         event = {
             "pathParameters": {"id_uva": "all"},
-            "queryStringParameters": None,  # handled by `or {}` -> empty dict
+            "queryStringParameters": query_params,  # None collapses to {} as well
             "httpMethod": "GET",
             "headers": {},
             "body": None,
         }
 
-        with pytest.raises(AttributeError):
-            lambda_handler(event, lambda_context)
+        with patch.object(requests.Session, "post") as mock_post:
+            response = lambda_handler(event, lambda_context)
+
+        mock_post.assert_not_called()
+        assert response["statusCode"] == 400
+        assert response["headers"]["Cache-Control"] == "no-store"
+        assert "'id'" in json.loads(response["body"])["error"]
+
+    def test_too_many_or_too_long_ids_are_rejected(self, last_connection_env, lambda_context):
+        too_many = ",".join(f"uva-{i}" for i in range(_lc_module.CONNECTION_MAX_IDS + 1))
+        too_long = "x" * (_lc_module.MAX_ID_LENGTH + 1)
+
+        with patch.object(requests.Session, "post") as mock_post:
+            responses = [
+                lambda_handler(_apigw_event("all", query_params={"id": ids}), lambda_context)
+                for ids in (too_many, too_long)
+            ]
+
+        mock_post.assert_not_called()
+        assert [response["statusCode"] for response in responses] == [400, 400]
+        assert "POST /connection" in json.loads(responses[0]["body"])["error"]
 
 
 class TestMissingEnvVars:
@@ -463,3 +908,186 @@ class TestMissingEnvVars:
 
         with pytest.raises(KeyError):
             lambda_handler(event, lambda_context)
+
+
+class TestResponseCacheErrors:
+    """Per-UVA errors are neither cached by the lambda nor by the client."""
+
+    def test_failed_id_is_not_cached_and_response_is_no_store(
+        self, last_connection_env, lambda_context
+    ):
+        recent_ts = _now_iso_z()
+        event = _apigw_event("all", query_params={"id": "uvaA,uvaBroken"})
+
+        side_effect = _aliased_side_effect({"uvaA": recent_ts}, failing_ids={"uvaBroken"})
+        with patch.object(requests.Session, "post", side_effect=side_effect) as mock_post:
+            first = lambda_handler(event, lambda_context)
+            lambda_handler(event, lambda_context)
+
+        assert first["headers"]["Cache-Control"] == "no-store"
+        # La segunda petición solo vuelve a consultar la UVA que falló
+        assert mock_post.call_count == 2
+        variables = json.loads(mock_post.call_args.kwargs["data"])["variables"]
+        assert "uvaA" not in variables.values()
+
+
+class TestInvocationDeadline:
+    """The API returns partial results marked as timed out when the budget runs low."""
+
+    def test_single_uva_without_budget_is_marked_timeout(self, last_connection_env, lambda_context):
+        lambda_context.get_remaining_time_in_millis = lambda: 500  # menos que la reserva
+
+        with patch.object(requests.Session, "post") as mock_post:
+            response = lambda_handler(_apigw_event("uva-001"), lambda_context)
+
+        mock_post.assert_not_called()
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"]) == {"uva-001": {"error": "timeout"}}
+        assert response["headers"]["Cache-Control"] == "no-store"
+
+    def test_all_mode_stops_waiting_at_the_invocation_deadline(
+        self, last_connection_env, lambda_context, monkeypatch
+    ):
+        monkeypatch.setattr(_lc_module, "CONNECTION_MAX_ALIASES", 2)
+        lambda_context.get_remaining_time_in_millis = lambda: 1300  # 0.3 s tras la reserva
+        recent_ts = _now_iso_z()
+        event = _apigw_event("all", query_params={"id": "uvaSlow,uvaFast"})
+
+        side_effect = _aliased_side_effect(
+            {"uvaSlow": recent_ts, "uvaFast": recent_ts}, delay_by_id={"uvaSlow": 1.0}
+        )
+        started = time.monotonic()
+        with patch.object(requests.Session, "post", side_effect=side_effect):
+            response = lambda_handler(event, lambda_context)
+
+        assert time.monotonic() - started < 0.9
+        body = json.loads(response["body"])
+        assert body["uvaSlow"] == {"error": "timeout"}
+        assert body["uvaFast"]["connection"] is True
+
+    def test_background_refresh_gets_its_own_deadline(self, last_connection_env, lambda_context, monkeypatch):
+        now = {"t": 1_000.0}
+        monkeypatch.setattr(_lc_module.connection_cache, "clock", lambda: now["t"])
+        old_ts, new_ts = _old_iso_z(hours=2), _now_iso_z()
+
+        def single_response(ts):
+            return _mock_response({"data": {"measurementsByUvaIDAndTs": {"items": [{"ts": ts}]}}})
+
+        with patch.object(requests.Session, "post", return_value=single_response(old_ts)):
+            first = lambda_handler(_apigw_event("uva-001"), lambda_context)
+
+        now["t"] += _lc_module.CONNECTION_CACHE_TTL + 1
+        # Hold the refresh thread until the scheduling request's deadline has expired
+        release = threading.Event()
+        _lc_module._revalidator.submit(release.wait)
+        lambda_context.get_remaining_time_in_millis = lambda: 1050  # 50 ms tras la reserva
+        with patch.object(requests.Session, "post", return_value=single_response(new_ts)) as mock_post:
+            stale = lambda_handler(_apigw_event("uva-001"), lambda_context)
+            time.sleep(0.1)
+            release.set()
+            _lc_module._revalidator.submit(lambda: None).result()
+            lambda_context.get_remaining_time_in_millis = lambda: 30000
+            fresh = lambda_handler(_apigw_event("uva-001"), lambda_context)
+
+        assert stale["body"] == first["body"]
+        assert mock_post.call_count == 1
+        assert json.loads(fresh["body"])["uva-001"]["connection"] is True
+
+
+class TestAppSyncCircuitOpen:
+    """With AppSync's circuit open the API answers at once with an uncached error."""
+
+    @staticmethod
+    def _open_circuit():
+        breaker = circuit.get_circuit_breaker(APPSYNC_URL)
+        for _ in range(breaker.min_calls):
+            breaker.acquire()
+            breaker.record(False)
+
+    def test_single_uva_is_reported_unavailable(self, last_connection_env, lambda_context):
+        self._open_circuit()
+
+        with patch.object(requests.Session, "post") as mock_post:
+            response = lambda_handler(_apigw_event("uva-001"), lambda_context)
+
+        mock_post.assert_not_called()
+        assert json.loads(response["body"]) == {"uva-001": {"error": "unavailable"}}
+        assert response["headers"]["Cache-Control"] == "no-store"
+        assert _lc_module.connection_cache.get("uva-001") is _lc_module.MISSING
+
+    def test_all_mode_reports_each_uva_unavailable(self, last_connection_env, lambda_context):
+        self._open_circuit()
+        event = _apigw_event("all", query_params={"id": "uvaA,uvaB"})
+
+        with patch.object(requests.Session, "post") as mock_post:
+            response = lambda_handler(event, lambda_context)
+
+        mock_post.assert_not_called()
+        assert json.loads(response["body"]) == {
+            "uvaA": {"error": "unavailable"},
+            "uvaB": {"error": "unavailable"},
+        }
+
+
+class TestBulkConnectionErrors:
+    """Invalid sources, limits and cursors are rejected before querying AppSync."""
+
+    @pytest.mark.parametrize("event", [
+        _bulk_event(query_params={"racimo": "r1", "linkageCode": "ORG-1"}),
+        _bulk_event(query_params={"racimo": "r1", "limit": "0"}),
+        _bulk_event(query_params={"racimo": "r1", "limit": "many"}),
+        _bulk_event(query_params={"ids": "u1,u2"}),
+        _bulk_event(query_params={"racimo": "r1", "nextToken": "not-a-cursor"}),
+        _bulk_event("POST", body={"ids": []}),
+        _bulk_event("POST", body={"ids": ["u1", 2]}),
+        _bulk_event("POST", body=["u1"]),
+    ])
+    def test_bad_requests_are_rejected(self, last_connection_env, lambda_context, event):
+        with patch.object(requests.Session, "post") as mock_post:
+            response = lambda_handler(event, lambda_context)
+
+        mock_post.assert_not_called()
+        assert response["statusCode"] == 400
+        assert json.loads(response["body"])["error"]
+
+    def test_cursor_from_another_query_is_rejected(self, last_connection_env, lambda_context):
+        side_effect = _bulk_side_effect({"r1": ["u1", "u2"]}, ts_by_id={"u1": _now_iso_z()})
+
+        with patch.object(requests.Session, "post", side_effect=side_effect):
+            first = json.loads(lambda_handler(
+                _bulk_event(query_params={"racimo": "r1", "limit": "1"}), lambda_context)["body"])
+            response = lambda_handler(
+                _bulk_event(query_params={"racimo": "r2", "nextToken": first["nextToken"]}), lambda_context)
+
+        assert response["statusCode"] == 400
+
+    def test_cursor_keeps_its_racimo_when_racimos_are_added(self, last_connection_env, lambda_context):
+        recent_ts = _now_iso_z()
+        racimos_by_code = {"ORG-1": ["r1", "r2"]}
+        side_effect = _bulk_side_effect(
+            {"r0": ["u0"], "r1": ["u1"], "r2": ["u2"]}, racimos_by_code=racimos_by_code,
+            ts_by_id={"u0": recent_ts, "u1": recent_ts, "u2": recent_ts},
+        )
+
+        with patch.object(requests.Session, "post", side_effect=side_effect):
+            first = json.loads(lambda_handler(
+                _bulk_event(query_params={"linkageCode": "ORG-1", "limit": "1"}), lambda_context)["body"])
+            # A racimo is created ahead of r2 while the client is paging
+            racimos_by_code["ORG-1"] = ["r0", "r1", "r2"]
+            _lc_module.racimo_pages_cache.clear()
+            second = json.loads(lambda_handler(
+                _bulk_event(query_params={"linkageCode": "ORG-1", "limit": "1", "nextToken": first["nextToken"]}),
+                lambda_context)["body"])
+
+        assert list(first["items"]) == ["u1"]
+        assert list(second["items"]) == ["u2"]
+        assert second["nextToken"] is None
+
+    def test_listing_failure_is_a_bad_gateway(self, last_connection_env, lambda_context):
+        error = _mock_response({"message": "Unauthorized"}, status_code=401)
+
+        with patch.object(requests.Session, "post", return_value=error):
+            response = lambda_handler(_bulk_event(query_params={"racimo": "r1"}), lambda_context)
+
+        assert response["statusCode"] == 502
+        assert json.loads(response["body"]) == {"error": "No se pudieron listar las UVAs (lookup_failed)"}
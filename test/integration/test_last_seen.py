@@ -0,0 +1,92 @@
+"""
+INTEGRATION tests for the shared last-seen index (uva_common.last_seen).
+
+Reads and writes run against moto's in-process DynamoDB.
+"""
+
+from unittest.mock import patch
+
+import boto3
+import pytest
+from botocore.exceptions import ReadTimeoutError
+from moto import mock_dynamodb
+
+from uva_common import runtime
+from uva_common.last_seen import get_last_seen, record_last_seen
+
+TABLE_NAME = "LastSeen-test"
+
+
+@pytest.fixture()
+def table():
+    with mock_dynamodb():
+        runtime.reset()
+        resource = boto3.resource("dynamodb", region_name="us-east-1")
+        yield resource.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[{"AttributeName": "uvaID", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "uvaID", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        runtime.reset()
+
+
+# ---------------------------------------------------------------------------
+# GREEN TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestRecordLastSeen:
+    """The stored ts only moves forward."""
+
+    def test_newer_ts_replaces_older_one(self, table):
+        assert record_last_seen(TABLE_NAME, "uva-1", 1_000) is True
+        assert record_last_seen(TABLE_NAME, "uva-1", 2_000) is True
+
+        assert table.get_item(Key={"uvaID": "uva-1"})["Item"]["ts"] == 2_000
+
+    def test_older_or_equal_ts_is_ignored(self, table):
+        record_last_seen(TABLE_NAME, "uva-1", 2_000)
+
+        assert record_last_seen(TABLE_NAME, "uva-1", 1_000) is False
+        assert record_last_seen(TABLE_NAME, "uva-1", 2_000) is False
+        assert table.get_item(Key={"uvaID": "uva-1"})["Item"]["ts"] == 2_000
+
+
+class TestGetLastSeen:
+    """One GetItem for a single id, BatchGetItem for several."""
+
+    def test_single_id_returns_int_ts(self, table):
+        record_last_seen(TABLE_NAME, "uva-1", 1_705_314_600_000)
+
+        assert get_last_seen(TABLE_NAME, ["uva-1"]) == {"uva-1": 1_705_314_600_000}
+
+    def test_several_ids_omit_the_ones_without_record(self, table):
+        record_last_seen(TABLE_NAME, "uva-1", 1_000)
+        record_last_seen(TABLE_NAME, "uva-3", 3_000)
+
+        assert get_last_seen(TABLE_NAME, ["uva-1", "uva-2", "uva-3", "uva-1"]) == {
+            "uva-1": 1_000,
+            "uva-3": 3_000,
+        }
+
+
+# ---------------------------------------------------------------------------
+# RED TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestGetLastSeenErrors:
+    """Read errors fall back to "no record" instead of raising."""
+
+    @pytest.mark.parametrize("ids", [["uva-1"], ["uva-1", "uva-2"]])
+    def test_missing_table_returns_empty(self, table, ids):
+        assert get_last_seen("LastSeen-missing", ids) == {}
+
+    def test_transport_error_returns_empty(self, table):
+        record_last_seen(TABLE_NAME, "uva-1", 1_000)
+        timeout = ReadTimeoutError(endpoint_url="https://dynamodb.us-east-1.amazonaws.com")
+
+        with patch.object(runtime, "get_table") as get_table:
+            get_table.return_value.get_item.side_effect = timeout
+            assert get_last_seen(TABLE_NAME, ["uva-1"]) == {}
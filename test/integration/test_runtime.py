@@ -0,0 +1,81 @@
+"""
+INTEGRATION tests for the shared client registry (uva_common.runtime).
+
+boto3 clients/resources are created against fake credentials (set in conftest)
+and never used for real calls; HTTP sessions are only inspected, never used.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from uva_common import runtime
+
+
+@pytest.fixture(autouse=True)
+def _fresh_runtime():
+    runtime.reset()
+    yield
+    runtime.reset()
+
+
+class TestClientRegistry:
+    """Clients and resources are created once and reused."""
+
+    def test_client_is_cached_per_service(self):
+        assert runtime.get_client("sns") is runtime.get_client("sns")
+        assert runtime.get_client("sns") is not runtime.get_client("dynamodb")
+
+    def test_client_uses_tuned_pool_size(self):
+        client = runtime.get_client("sns")
+
+        assert client.meta.config.max_pool_connections == runtime.MAX_POOL_CONNECTIONS
+
+    def test_client_timeouts_are_bounded(self):
+        config = runtime.get_resource("dynamodb").meta.client.meta.config
+
+        assert config.connect_timeout == runtime.BOTO_CONNECT_TIMEOUT
+        assert config.read_timeout == runtime.BOTO_READ_TIMEOUT < 60
+
+    def test_table_is_cached_per_name(self):
+        table = runtime.get_table("RACIMO-test")
+
+        assert runtime.get_table("RACIMO-test") is table
+        assert table.name == "RACIMO-test"
+        assert runtime.get_table("Location-test") is not table
+
+    def test_reset_discards_cached_clients(self):
+        client = runtime.get_client("sns")
+        runtime.reset()
+
+        assert runtime.get_client("sns") is not client
+
+    def test_reset_discards_tables_cached_by_other_threads(self):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            table = executor.submit(runtime.get_table, "RACIMO-test").result()
+            assert executor.submit(runtime.get_table, "RACIMO-test").result() is table
+            runtime.reset()
+
+            assert executor.submit(runtime.get_table, "RACIMO-test").result() is not table
+
+
+class TestHttpSessions:
+    """One keep-alive session per endpoint (scheme + host)."""
+
+    def test_same_host_shares_session(self):
+        a = runtime.get_http_session("https://api1.appsync-api.us-east-1.amazonaws.com/graphql")
+        b = runtime.get_http_session("https://api1.appsync-api.us-east-1.amazonaws.com/other")
+
+        assert a is b
+
+    def test_different_hosts_get_different_sessions(self):
+        a = runtime.get_http_session("https://api1.appsync-api.us-east-1.amazonaws.com/graphql")
+        b = runtime.get_http_session("https://api2.appsync-api.us-east-1.amazonaws.com/graphql")
+
+        assert a is not b
+
+    def test_session_adapter_pool_size(self):
+        url = "https://api1.appsync-api.us-east-1.amazonaws.com/graphql"
+        adapter = runtime.get_http_session(url).get_adapter(url)
+
+        assert adapter._pool_maxsize == runtime.MAX_POOL_CONNECTIONS
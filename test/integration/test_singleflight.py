@@ -0,0 +1,96 @@
+"""
+INTEGRATION tests for the shared single-flight helper (uva_common.singleflight).
+
+Concurrency is driven with threading.Event so the tests are deterministic: the
+leader's lookup is held open until every follower is waiting on it.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from uva_common.singleflight import SingleFlight, single_flight
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+# ---------------------------------------------------------------------------
+# GREEN TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestSingleFlight:
+    """Identical in-flight lookups share one call."""
+
+    def test_concurrent_identical_calls_share_one_lookup(self):
+        release = threading.Event()
+        calls = []
+
+        @single_flight
+        def lookup(key):
+            calls.append(key)
+            release.wait(5)
+            return f"value-{key}"
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            futures = [executor.submit(lookup, "racimo-1") for _ in range(5)]
+            _wait_for(lambda: lookup.flights.shared == 4)
+            release.set()
+            results = [future.result() for future in futures]
+
+        assert results == ["value-racimo-1"] * 5
+        assert calls == ["racimo-1"]
+
+    def test_different_keys_run_independently(self):
+        group = SingleFlight()
+
+        assert group.do("a", lambda: 1) == 1
+        assert group.do("b", lambda: 2) == 2
+        assert group.shared == 0
+
+    def test_finished_lookups_are_not_retained(self):
+        calls = []
+
+        @single_flight
+        def lookup(key):
+            calls.append(key)
+            return key
+
+        lookup("a")
+        lookup("a")
+
+        assert calls == ["a", "a"]
+
+
+# ---------------------------------------------------------------------------
+# RED TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestSingleFlightFailures:
+    """Errors of the shared lookup reach every waiter and are not retained."""
+
+    def test_error_is_raised_to_every_waiter(self):
+        release = threading.Event()
+        group = SingleFlight()
+
+        def failing():
+            release.wait(5)
+            raise RuntimeError("DynamoDB no disponible")
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(group.do, "k", failing) for _ in range(3)]
+            _wait_for(lambda: group.shared == 2)
+            release.set()
+            for future in futures:
+                with pytest.raises(RuntimeError):
+                    future.result()
+
+        assert group.do("k", lambda: "ok") == "ok"
@@ -0,0 +1,24 @@
+"""
+INTEGRATION tests for the shared stream batch response (uva_common.streams).
+"""
+
+from uva_common.streams import build_batch_response
+
+
+# ---------------------------------------------------------------------------
+# GREEN TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestBuildBatchResponse:
+    """Failed sequence numbers become ReportBatchItemFailures entries."""
+
+    def test_sequence_numbers_are_reported_once_in_order(self):
+        response = build_batch_response(iter(["300", "100", "300", "200"]))
+
+        assert response == {"batchItemFailures": [
+            {"itemIdentifier": "300"}, {"itemIdentifier": "100"}, {"itemIdentifier": "200"},
+        ]}
+
+    def test_no_failures_means_an_empty_list(self):
+        assert build_batch_response([]) == {"batchItemFailures": []}
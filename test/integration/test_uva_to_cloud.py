@@ -0,0 +1,1042 @@
+"""
+INTEGRATION tests for the UVA stream → MakeSensCloud sync (uva_to_cloud.lambda_handler).
+
+DynamoDB lookups and AppSync mutations are mocked by reference
+(unittest.mock.patch on the uva_to_cloud helpers) so no real AWS call is made.
+DynamoDB access patterns themselves (index query, paginated scan fallback) run
+against moto's in-process DynamoDB.
+
+Import strategy: insert the source lambda directory at sys.path[0] here at
+module load time (before the import) to avoid picking up a stale
+.aws-sam/build copy.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import boto3
+import pytest
+import requests
+from botocore.exceptions import ClientError, ReadTimeoutError
+from moto import mock_dynamodb
+
+from uva_common import graphql, runtime
+from uva_common.deadline import Deadline, DeadlineExceeded
+
+# ---------------------------------------------------------------------------
+# Inject the handler's source directory BEFORE importing the module.
+# ---------------------------------------------------------------------------
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+_HANDLER_DIR = os.path.join(_REPO_ROOT, "SAM-UVA-App-Integrations", "lambdas", "cloud")
+if _HANDLER_DIR not in sys.path:
+    sys.path.insert(0, _HANDLER_DIR)
+
+import uva_to_cloud as _cloud_module  # noqa: E402
+from uva_to_cloud import UvaImage, get_organization_id, lambda_handler, project_record  # noqa: E402
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+CLOUD_APPSYNC_URL = "https://example.appsync-api.us-east-1.amazonaws.com/graphql"
+
+
+def _image(uva_id="uva-001", racimo_id="racimo-1", latitude=None, longitude=None, **extra) -> dict:
+    """Build a UVA NewImage/OldImage in DynamoDB-JSON."""
+    image = {"id": {"S": uva_id}, "name": {"S": f"UVA {uva_id}"}}
+    if racimo_id is not None:
+        image["racimoID"] = {"S": racimo_id}
+    # Coordinates are strings ({"S": ...}) unless a typed attribute is given
+    if latitude is not None:
+        image["latitude"] = latitude if isinstance(latitude, dict) else {"S": latitude}
+    if longitude is not None:
+        image["longitude"] = longitude if isinstance(longitude, dict) else {"S": longitude}
+    image.update(extra)
+    return image
+
+
+def _mock_response(json_body, status_code: int = 200):
+    """Build a minimal requests.Response mock."""
+    mock = MagicMock()
+    mock.status_code = status_code
+    mock.json.return_value = json_body
+    mock.text = json.dumps(json_body)
+    return mock
+
+
+def _pending(uva_id, seq, location=True):
+    """A PendingMutation for the location of `uva_id` originated by stream record `seq`."""
+    record = project_record(_stream_record(
+        "MODIFY", new_image=_image(uva_id, latitude="4.6", longitude="-74.1"), seq=seq
+    ))
+    operation = _cloud_module.update_location(uva_id, record.new_image.location) if location \
+        else _cloud_module.create_device(uva_id, "org-1")
+    return _cloud_module.PendingMutation(record, operation)
+
+
+def _stream_record(event_name, new_image=None, old_image=None, seq="100") -> dict:
+    """Build a DynamoDB stream record."""
+    dynamodb = {"SequenceNumber": seq}
+    if new_image is not None:
+        dynamodb["NewImage"] = new_image
+    if old_image is not None:
+        dynamodb["OldImage"] = old_image
+    return {"eventName": event_name, "eventSource": "aws:dynamodb", "dynamodb": dynamodb}
+
+
+@pytest.fixture(autouse=True)
+def empty_lookup_caches():
+    """Every test starts with cold lookup, location and provisioned-device state (memory and disk)."""
+    _cloud_module.linkage_code_cache.clear()
+    _cloud_module.organization_cache.clear()
+    _cloud_module._known_locations.clear()
+    _cloud_module.provisioned_devices.clear()
+    yield
+
+
+@pytest.fixture()
+def dynamodb_tables():
+    """moto DynamoDB with an Organization table (with and without the linkage_code index)."""
+    with mock_dynamodb():
+        runtime.reset()
+        client = boto3.client("dynamodb", region_name="us-east-1")
+        attribute_definitions = [
+            {"AttributeName": "id", "AttributeType": "S"},
+            {"AttributeName": "linkage_code", "AttributeType": "S"},
+        ]
+        client.create_table(
+            TableName="Organization-indexed",
+            KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+            AttributeDefinitions=attribute_definitions,
+            BillingMode="PAY_PER_REQUEST",
+            GlobalSecondaryIndexes=[{
+                "IndexName": "linkage_code-index",
+                "KeySchema": [{"AttributeName": "linkage_code", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "KEYS_ONLY"},
+            }],
+        )
+        client.create_table(
+            TableName="Organization-plain",
+            KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+            AttributeDefinitions=attribute_definitions[:1],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield boto3.resource("dynamodb", region_name="us-east-1")
+        runtime.reset()
+        _cloud_module._tables_without_linkage_index.clear()
+
+
+def _put_organizations(table, count, payload_bytes=0):
+    with table.batch_writer() as writer:
+        for i in range(count):
+            writer.put_item(Item={"id": f"org-{i}", "linkage_code": f"LC-{i}", "meta": "x" * payload_bytes})
+
+
+# ---------------------------------------------------------------------------
+# GREEN TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestProjectRecord:
+    """Only the declared attributes are decoded from NewImage/OldImage."""
+
+    def test_projects_declared_attributes_from_both_images(self):
+        record = _stream_record(
+            "MODIFY",
+            new_image=_image(latitude="4.6", longitude="-74.1", metadata={"M": {"fw": {"S": "2.1"}}}),
+            old_image=_image(latitude="4.5", longitude="-74.0"),
+            seq="42",
+        )
+
+        view = project_record(record)
+
+        assert view.event_name == "MODIFY"
+        assert view.sequence_number == "42"
+        assert view.new_image == UvaImage("uva-001", "racimo-1", "4.6", "-74.1")
+        assert view.old_image == UvaImage("uva-001", "racimo-1", "4.5", "-74.0")
+
+    def test_numeric_coordinates_are_decoded(self):
+        new_image = _image(latitude={"N": "4.6"}, longitude={"N": "-74"})
+        record = _stream_record("MODIFY", new_image=new_image)
+
+        view = project_record(record)
+
+        assert view.new_image.latitude == 4.6
+        assert view.new_image.longitude == -74
+        assert view.new_image.has_location
+
+    def test_missing_attributes_and_images_are_none(self):
+        view = project_record(_stream_record("INSERT", new_image=_image(racimo_id=None)))
+
+        assert view.new_image.racimo_id is None
+        assert view.new_image.has_location is False
+        assert view.old_image is None
+
+
+class TestGetOrganizationId:
+    """Linkage code → organization id via the index, or a paginated scan without it."""
+
+    def test_uses_the_linkage_code_index(self, dynamodb_tables):
+        _put_organizations(dynamodb_tables.Table("Organization-indexed"), 20)
+
+        with patch.object(_cloud_module, "scan_organization_id") as scan:
+            assert get_organization_id("Organization-indexed", "LC-7") == "org-7"
+
+        scan.assert_not_called()
+
+    def test_falls_back_to_scan_when_the_index_is_missing(self, dynamodb_tables):
+        _put_organizations(dynamodb_tables.Table("Organization-plain"), 20)
+
+        assert get_organization_id("Organization-plain", "LC-7") == "org-7"
+        assert "Organization-plain" in _cloud_module._tables_without_linkage_index
+
+    def test_scan_fallback_follows_pagination(self, dynamodb_tables):
+        # ~3 MB of organizations: every match beyond the first 1 MB page needs LastEvaluatedKey
+        _put_organizations(dynamodb_tables.Table("Organization-plain"), 1500, payload_bytes=2000)
+
+        found = {get_organization_id("Organization-plain", f"LC-{i}") for i in (0, 700, 1499)}
+
+        assert found == {"org-0", "org-700", "org-1499"}
+
+    def test_missing_index_is_only_probed_once(self, dynamodb_tables):
+        _put_organizations(dynamodb_tables.Table("Organization-plain"), 5)
+
+        get_organization_id("Organization-plain", "LC-1")
+        with patch.object(_cloud_module, "query_organization_id") as query:
+            assert get_organization_id("Organization-plain", "LC-2") == "org-2"
+
+        query.assert_not_called()
+
+
+class TestLookupCache:
+    """Racimo and organization lookups are served from the cache once resolved."""
+
+    def test_repeated_organization_lookup_hits_the_cache(self, dynamodb_tables):
+        _put_organizations(dynamodb_tables.Table("Organization-indexed"), 5)
+
+        assert get_organization_id("Organization-indexed", "LC-3") == "org-3"
+        with patch.object(_cloud_module, "query_organization_id") as query:
+            assert get_organization_id("Organization-indexed", "LC-3") == "org-3"
+
+        query.assert_not_called()
+        assert _cloud_module.organization_cache.stats()["hits"] == 1
+
+    def test_racimo_without_linkage_code_is_negatively_cached(self, dynamodb_tables):
+        client = boto3.client("dynamodb", region_name="us-east-1")
+        client.create_table(
+            TableName="RACIMO-test",
+            KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        dynamodb_tables.Table("RACIMO-test").put_item(Item={"id": "racimo-1"})
+
+        assert _cloud_module.get_linkage_code("RACIMO-test", "racimo-1") is None
+        with patch.object(_cloud_module.runtime, "get_table") as get_table:
+            assert _cloud_module.get_linkage_code("RACIMO-test", "racimo-1") is None
+
+        get_table.assert_not_called()
+        assert _cloud_module.linkage_code_cache.stats()["negativeHits"] == 1
+
+    def test_concurrent_lookups_of_one_racimo_share_a_single_read(self, dynamodb_tables):
+        _create_table("RACIMO-test")
+        dynamodb_tables.Table("RACIMO-test").put_item(Item={"id": "racimo-1", "LinkageCode": "LC-1"})
+        release = threading.Event()
+        reads = []
+        real_get_table = runtime.get_table
+
+        def slow_get_table(table_name):
+            reads.append(table_name)
+            release.wait(5)
+            return real_get_table(table_name)
+
+        with patch.object(_cloud_module.runtime, "get_table", side_effect=slow_get_table):
+            threads = [threading.Thread(target=_cloud_module.get_linkage_code, args=("RACIMO-test", "racimo-1"))
+                       for _ in range(4)]
+            shared_before = _cloud_module.get_linkage_code.flights.shared
+            for thread in threads:
+                thread.start()
+            while _cloud_module.get_linkage_code.flights.shared - shared_before < 3:
+                threading.Event().wait(0.001)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        assert reads == ["RACIMO-test"]
+
+    def test_dynamodb_errors_are_not_cached(self, dynamodb_tables):
+        # RACIMO-test does not exist: the lookup fails and must be retried next time
+        with pytest.raises(ClientError):
+            _cloud_module.get_linkage_code("RACIMO-test", "racimo-1")
+
+        assert _cloud_module.linkage_code_cache.get("RACIMO-test/racimo-1") is _cloud_module.MISSING
+
+
+def _create_table(name):
+    boto3.client("dynamodb", region_name="us-east-1").create_table(
+        TableName=name,
+        KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+class TestPrefetchBatch:
+    """Racimos and locations of a whole batch are read with BatchGetItem before processing."""
+
+    def test_batch_reads_feed_the_insert_and_modify_paths(self, dynamodb_tables, uva_to_cloud_env, lambda_context):
+        _create_table("RACIMO-test")
+        _create_table("Location-test")
+        dynamodb_tables.Table("RACIMO-test").put_item(Item={"id": "racimo-1", "LinkageCode": "LC-1"})
+        dynamodb_tables.Table("Location-test").put_item(Item={"id": "Auva-002", "latitude": "4.5"})
+        event = {"Records": [
+            _stream_record("INSERT", new_image=_image("uva-001", "racimo-1")),
+            _stream_record("INSERT", new_image=_image("uva-009", "racimo-404")),
+            _stream_record("MODIFY", new_image=_image("uva-002", latitude="4.6", longitude="-74.1")),
+            _stream_record("MODIFY", new_image=_image("uva-003", latitude="4.6", longitude="-74.1")),
+        ]}
+
+        with patch.object(_cloud_module, "LOCATION_UPSERT", False), \
+                patch.object(_cloud_module.runtime, "get_table", wraps=runtime.get_table) as get_table, \
+                patch.object(_cloud_module, "get_organization_id", return_value="org-1"), \
+                patch.object(_cloud_module, "execute_mutations"), \
+                patch.object(_cloud_module, "create_device") as create_device, \
+                patch.object(_cloud_module, "update_location") as update_location, \
+                patch.object(_cloud_module, "create_location") as create_location:
+            lambda_handler(event, lambda_context)
+
+        # No per-record GetItem: every lookup was answered by the batch read
+        get_table.assert_not_called()
+        assert [c.args[:2] for c in create_device.call_args_list] == [("uva-001", "org-1")]
+        assert update_location.call_args.args[0] == "uva-002"
+        assert create_location.call_args.args[0] == "uva-003"
+
+    def test_cached_racimos_are_not_read_again(self, uva_to_cloud_env):
+        _cloud_module.linkage_code_cache.set("RACIMO-test/racimo-1", "LC-1")
+        records = [project_record(_stream_record("INSERT", new_image=_image()))]
+
+        with patch.object(_cloud_module, "batch_get_items") as batch_get:
+            assert _cloud_module.prefetch_batch(records, "RACIMO-test", "Location-test") == {}
+
+        batch_get.assert_not_called()
+
+
+class TestInsertEvent:
+    """INSERT → linkage code → organization → createDevice."""
+
+    def test_insert_creates_device_for_the_organization(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [_stream_record("INSERT", new_image=_image())]}
+
+        with patch.object(_cloud_module, "prefetch_batch", return_value={}), \
+                patch.object(_cloud_module, "get_linkage_code", return_value="LC-1") as linkage, \
+                patch.object(_cloud_module, "get_organization_id", return_value="org-1") as org, \
+                patch.object(_cloud_module, "execute_mutations") as execute, \
+                patch.object(_cloud_module, "create_device") as create_device:
+            lambda_handler(event, lambda_context)
+
+        assert linkage.call_args.args == ("RACIMO-test", "racimo-1")
+        assert org.call_args.args == ("Organization-test", "LC-1")
+        assert org.call_args.kwargs["deadline"] is linkage.call_args.kwargs["deadline"] is not None
+        assert create_device.call_args.args[:2] == ("uva-001", "org-1")
+        mutation, = execute.call_args.args[0]
+        assert mutation.operation is create_device.return_value
+        assert mutation.record.sequence_number == "100"
+
+
+class TestModifyEvent:
+    """MODIFY with coordinates → createLocation or updateLocation."""
+
+    def test_modify_updates_existing_location(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [_stream_record("MODIFY", new_image=_image(latitude="4.6", longitude="-74.1"))]}
+
+        with patch.object(_cloud_module, "prefetch_batch", return_value={"uva-001": True}), \
+                patch.object(_cloud_module, "execute_mutations"), \
+                patch.object(_cloud_module, "update_location") as update_location, \
+                patch.object(_cloud_module, "create_location") as create_location:
+            lambda_handler(event, lambda_context)
+
+        assert update_location.call_args.args[:2] == ("uva-001", {"latitude": "4.6", "longitude": "-74.1"})
+        create_location.assert_not_called()
+
+    def test_modify_creates_missing_location(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [_stream_record("MODIFY", new_image=_image(latitude="4.6", longitude="-74.1"))]}
+
+        with patch.object(_cloud_module, "LOCATION_UPSERT", False), \
+                patch.object(_cloud_module, "prefetch_batch", return_value={}), \
+                patch.object(_cloud_module, "get_uva_location", return_value=False), \
+                patch.object(_cloud_module, "execute_mutations"), \
+                patch.object(_cloud_module, "update_location") as update_location, \
+                patch.object(_cloud_module, "create_location") as create_location:
+            lambda_handler(event, lambda_context)
+
+        assert create_location.call_args.args[:2] == ("uva-001", {"latitude": "4.6", "longitude": "-74.1"})
+        update_location.assert_not_called()
+
+
+class TestLocationUpsert:
+    """Upsert mode writes locations without reading the Location table first."""
+
+    def test_modify_sends_update_without_reading_the_location(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [_stream_record("MODIFY", new_image=_image(latitude="4.6", longitude="-74.1"))]}
+
+        with patch.object(_cloud_module, "batch_get_items") as batch_get, \
+                patch.object(_cloud_module, "get_uva_location") as get_location, \
+                patch.object(_cloud_module, "execute_mutations") as execute:
+            lambda_handler(event, lambda_context)
+
+        batch_get.assert_not_called()
+        get_location.assert_not_called()
+        assert [m.operation.field for m in execute.call_args.args[0]] == ["updateLocation"]
+
+    def test_missing_location_falls_back_to_create(self):
+        mutations = [_pending("uva-1", "11"), _pending("uva-2", "12")]
+        responses = [
+            _mock_response({
+                "data": {"op0": {"id": "Auva-1"}, "op1": None},
+                "errors": [{"path": ["op1"], "errorType": "DynamoDB:ConditionalCheckFailedException",
+                            "message": "The conditional request failed"}],
+            }),
+            _mock_response({"data": {"op0": {"id": "Auva-2"}}}),
+        ]
+
+        with patch.object(requests.Session, "post", side_effect=responses) as post:
+            failed = _cloud_module.execute_mutations(mutations, CLOUD_APPSYNC_URL, "k")
+
+        assert failed == []
+        fallback = json.loads(post.call_args_list[1].kwargs["data"])
+        assert "op0: createLocation(input: {" in fallback["query"]
+        assert fallback["variables"]["op0_id"] == "Auva-2"
+        assert _cloud_module._known_locations == {"uva-1": (4.6, -74.1), "uva-2": (4.6, -74.1)}
+
+    def test_location_of_a_device_created_in_the_same_batch_is_created(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [
+            _stream_record("INSERT", new_image=_image(), seq="1"),
+            _stream_record("MODIFY", new_image=_image(latitude="4.6", longitude="-74.1"), seq="2"),
+        ]}
+
+        with patch.object(_cloud_module, "prefetch_batch", return_value={}), \
+                patch.object(_cloud_module, "get_linkage_code", return_value="LC-1"), \
+                patch.object(_cloud_module, "get_organization_id", return_value="org-1"), \
+                patch.object(_cloud_module, "execute_mutations") as execute:
+            lambda_handler(event, lambda_context)
+
+        assert [m.operation.field for m in execute.call_args.args[0]] == ["createDevice", "createLocation"]
+
+    def test_known_locations_skip_the_read_without_upsert(self, uva_to_cloud_env, lambda_context):
+        _cloud_module._known_locations["uva-001"] = (4.5, -74.1)
+        event = {"Records": [_stream_record("MODIFY", new_image=_image(latitude="4.6", longitude="-74.1"))]}
+
+        with patch.object(_cloud_module, "LOCATION_UPSERT", False), \
+                patch.object(_cloud_module, "batch_get_items") as batch_get, \
+                patch.object(_cloud_module, "get_uva_location") as get_location, \
+                patch.object(_cloud_module, "execute_mutations") as execute:
+            lambda_handler(event, lambda_context)
+
+        batch_get.assert_not_called()
+        get_location.assert_not_called()
+        assert [m.operation.field for m in execute.call_args.args[0]] == ["updateLocation"]
+
+
+class TestLocationChangeDetection:
+    """Only moves beyond the GPS-jitter threshold from the last written location produce a write."""
+
+    def _modify(self, written, new, uva_id="uva-001"):
+        if written:
+            _cloud_module._known_locations[uva_id] = tuple(float(value) for value in written)
+        return _stream_record(
+            "MODIFY",
+            new_image=_image(uva_id, latitude=new[0], longitude=new[1]),
+            old_image=_image(uva_id, latitude=written[0], longitude=written[1]) if written else _image(uva_id),
+        )
+
+    def test_haversine_distance_in_meters(self):
+        # One degree of latitude is ~111.2 km
+        assert _cloud_module.haversine_distance(4.0, -74.0, 5.0, -74.0) == pytest.approx(111_195, rel=1e-3)
+
+    def test_jitter_and_unrelated_changes_make_no_calls(self, uva_to_cloud_env, lambda_context, capsys):
+        event = {"Records": [
+            self._modify(("4.60000", "-74.10000"), ("4.60000", "-74.10000")),
+            # ~3 m north: below the default 10 m threshold
+            self._modify(("4.60000", "-74.10000"), ("4.60003", "-74.10000"), "uva-002"),
+        ]}
+
+        with patch.object(_cloud_module, "batch_get_items") as batch_get, \
+                patch.object(requests.Session, "post") as post:
+            lambda_handler(event, lambda_context)
+
+        batch_get.assert_not_called()
+        post.assert_not_called()
+        assert "{'applied': 0, 'skipped': 2}" in capsys.readouterr().out
+
+    def test_moves_beyond_the_threshold_are_applied(self, uva_to_cloud_env, lambda_context, capsys):
+        event = {"Records": [
+            # ~111 m north
+            self._modify(("4.600", "-74.100"), ("4.601", "-74.100")),
+            # No written location known for the UVA
+            self._modify(None, ("4.600", "-74.100"), "uva-002"),
+        ]}
+
+        with patch.object(_cloud_module, "execute_mutations") as execute:
+            lambda_handler(event, lambda_context)
+
+        assert len(execute.call_args.args[0]) == 2
+        assert "{'applied': 2, 'skipped': 0}" in capsys.readouterr().out
+
+    def test_slow_drift_is_written_once_it_adds_up(self, uva_to_cloud_env, lambda_context):
+        # ~5.6 m north per update, each one compared with the last written location
+        latitudes = ["4.60000", "4.60005", "4.60010", "4.60015"]
+        _cloud_module._known_locations["uva-001"] = (4.6, -74.1)
+        written = []
+
+        with patch.object(_cloud_module, "execute_mutations",
+                          side_effect=lambda mutations, *args, **kwargs: written.extend(mutations) or []):
+            for previous, latitude in zip(latitudes, latitudes[1:]):
+                event = {"Records": [_stream_record(
+                    "MODIFY", new_image=_image(latitude=latitude, longitude="-74.10000"),
+                    old_image=_image(latitude=previous, longitude="-74.10000"),
+                )]}
+                lambda_handler(event, lambda_context)
+                for mutation in written:
+                    _cloud_module._known_locations["uva-001"] = _cloud_module.location_point(mutation.record.new_image)
+
+        assert [m.record.new_image.latitude for m in written] == ["4.60010"]
+
+    def test_threshold_is_configurable(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [self._modify(("4.600", "-74.100"), ("4.601", "-74.100"))]}
+
+        with patch.object(_cloud_module, "LOCATION_MIN_DISTANCE_METERS", 500.0), \
+                patch.object(_cloud_module, "execute_mutations") as execute:
+            lambda_handler(event, lambda_context)
+
+        assert execute.call_args.args[0] == []
+
+
+class TestInsertWithCoordinates:
+    """A UVA created with coordinates gets its Location even if later updates do not move it."""
+
+    def test_insert_and_status_only_modify_in_one_batch_create_the_location(
+            self, uva_to_cloud_env, lambda_context):
+        located = _image(latitude="4.6", longitude="-74.1")
+        event = {"Records": [
+            _stream_record("INSERT", new_image=located, seq="1"),
+            _stream_record("MODIFY", new_image=dict(located, status={"S": "on"}), old_image=located, seq="2"),
+        ]}
+
+        with patch.object(_cloud_module, "prefetch_batch", return_value={}), \
+                patch.object(_cloud_module, "get_linkage_code", return_value="LC-1"), \
+                patch.object(_cloud_module, "get_organization_id", return_value="org-1"), \
+                patch.object(_cloud_module, "execute_mutations", return_value=[]) as execute:
+            lambda_handler(event, lambda_context)
+
+        assert [m.operation.field for m in execute.call_args.args[0]] == ["createDevice", "createLocation"]
+
+    def test_status_only_modify_in_a_later_batch_writes_the_unknown_location(
+            self, uva_to_cloud_env, lambda_context):
+        located = _image(latitude="4.6", longitude="-74.1")
+        event = {"Records": [
+            _stream_record("MODIFY", new_image=dict(located, status={"S": "on"}), old_image=located),
+        ]}
+
+        with patch.object(_cloud_module, "execute_mutations", return_value=[]) as execute:
+            lambda_handler(event, lambda_context)
+
+        assert [m.operation.field for m in execute.call_args.args[0]] == ["updateLocation"]
+
+    def test_written_location_is_remembered_with_its_coordinates(self):
+        mutation = _pending("uva-1", "1")
+
+        with patch.object(requests.Session, "post", return_value=_mock_response({"data": {"op0": {"id": "Auva-1"}}})):
+            _cloud_module.execute_mutations([mutation], CLOUD_APPSYNC_URL, "k")
+
+        assert _cloud_module._known_locations == {"uva-1": (4.6, -74.1)}
+
+
+class TestCoalesceRecords:
+    """Repeated events of the same UVA collapse into their final effective state."""
+
+    def test_insert_and_modifies_collapse_into_create_plus_one_location_write(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [
+            _stream_record("INSERT", new_image=_image(), seq="1"),
+            _stream_record("MODIFY", new_image=_image(latitude="4.600", longitude="-74.100"),
+                           old_image=_image(), seq="2"),
+            _stream_record("MODIFY", new_image=_image("uva-002", latitude="1.0", longitude="2.0"), seq="3"),
+            _stream_record("MODIFY", new_image=_image(latitude="4.700", longitude="-74.200"),
+                           old_image=_image(latitude="4.600", longitude="-74.100"), seq="4"),
+        ]}
+
+        with patch.object(_cloud_module, "prefetch_batch", return_value={}), \
+                patch.object(_cloud_module, "get_linkage_code", return_value="LC-1"), \
+                patch.object(_cloud_module, "get_organization_id", return_value="org-1"), \
+                patch.object(_cloud_module, "execute_mutations") as execute:
+            lambda_handler(event, lambda_context)
+
+        sent = [(m.operation.field, m.record.sequence_number) for m in execute.call_args.args[0]]
+        assert sent == [("createDevice", "1"), ("createLocation", "2"), ("updateLocation", "3")]
+        final_location = execute.call_args.args[0][1].operation.arguments
+        assert final_location["latitude"][1] == "4.700"
+
+    def test_insert_with_the_final_coordinates_writes_the_location_once(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [
+            _stream_record("INSERT", new_image=_image(latitude="4.600", longitude="-74.100"), seq="1"),
+            _stream_record("MODIFY", new_image=_image(latitude="4.700", longitude="-74.200"),
+                           old_image=_image(latitude="4.600", longitude="-74.100"), seq="2"),
+            _stream_record("MODIFY", new_image=_image(latitude="4.600", longitude="-74.100"),
+                           old_image=_image(latitude="4.700", longitude="-74.200"), seq="3"),
+        ]}
+
+        with patch.object(_cloud_module, "prefetch_batch", return_value={}), \
+                patch.object(_cloud_module, "get_linkage_code", return_value="LC-1"), \
+                patch.object(_cloud_module, "get_organization_id", return_value="org-1"), \
+                patch.object(_cloud_module, "execute_mutations", return_value=[]) as execute:
+            lambda_handler(event, lambda_context)
+
+        sent = [(m.operation.field, m.record.sequence_number) for m in execute.call_args.args[0]]
+        assert sent == [("createDevice", "1"), ("createLocation", "1")]
+
+    def test_modifies_that_return_to_the_original_location_make_no_write(self):
+        records = [project_record(r) for r in (
+            _stream_record("MODIFY", new_image=_image(latitude="5.0", longitude="-74.0"),
+                           old_image=_image(latitude="4.0", longitude="-74.0"), seq="1"),
+            _stream_record("MODIFY", new_image=_image(latitude="4.0", longitude="-74.0"),
+                           old_image=_image(latitude="5.0", longitude="-74.0"), seq="2"),
+        )]
+
+        merged, = _cloud_module.coalesce_records(records)
+
+        assert merged.sequence_number == "1"
+        assert not _cloud_module.location_changed((4.0, -74.0), merged.new_image)
+
+
+class TestParallelProcessing:
+    """Different UVAs are processed concurrently, each UVA strictly in order."""
+
+    def test_different_uvas_run_concurrently(self, uva_to_cloud_env):
+        # Both lookups must be in flight at the same time to pass the barrier
+        barrier = threading.Barrier(2, timeout=5)
+        records = [project_record(_stream_record("INSERT", new_image=_image(f"uva-{i}"), seq=str(i)))
+                   for i in range(2)]
+
+        def linkage_code(table_name, racimo_id, deadline=None):
+            barrier.wait()
+            return "LC-1"
+
+        with patch.object(_cloud_module, "get_linkage_code", side_effect=linkage_code), \
+                patch.object(_cloud_module, "get_organization_id", return_value="org-1"):
+            results, mutations = _cloud_module.process_records(records, "RACIMO-test", "Organization-test",
+                                                               "Location-test")
+
+        assert results == [None, None]
+        assert [m.record.new_image.id for m in mutations] == ["uva-0", "uva-1"]
+
+    def test_records_of_one_uva_keep_their_order(self, uva_to_cloud_env):
+        records = [
+            project_record(_stream_record("INSERT", new_image=_image("uva-1"), seq="1")),
+            project_record(_stream_record("MODIFY", new_image=_image("uva-1", latitude="4", longitude="5"), seq="2")),
+            project_record(_stream_record("INSERT", new_image=_image("uva-1"), seq="3")),
+        ]
+
+        with patch.object(_cloud_module, "get_linkage_code", return_value="LC-1"), \
+                patch.object(_cloud_module, "get_organization_id", return_value="org-1"):
+            _, mutations = _cloud_module.process_records(records, "RACIMO-test", "Organization-test",
+                                                         "Location-test")
+
+        assert [m.record.sequence_number for m in mutations] == ["1", "2", "3"]
+        assert [m.operation.field for m in mutations] == ["createDevice", "createLocation", "createDevice"]
+
+    def test_worker_threads_outlive_the_invocation(self, uva_to_cloud_env):
+        records = [project_record(_stream_record("INSERT", new_image=_image(f"uva-{i}"), seq=str(i)))
+                   for i in range(8)]
+        threads = set()
+
+        def linkage_code(table_name, racimo_id, deadline=None):
+            threads.add(threading.current_thread())
+            return "LC-1"
+
+        with patch.object(_cloud_module, "get_linkage_code", side_effect=linkage_code), \
+                patch.object(_cloud_module, "get_organization_id", return_value="org-1"):
+            for _ in range(3):
+                _cloud_module.process_records(records, "RACIMO-test", "Organization-test", "Location-test")
+
+        # All three invocations run on the same pool threads (and their per-thread boto3 resources)
+        assert threads <= set(_cloud_module._executor._threads)
+        assert len(_cloud_module._executor._threads) <= _cloud_module.PROCESSING_CONCURRENCY
+
+    def test_documents_never_split_a_uva(self):
+        mutations = [_pending("uva-1", "1", location=False), _pending("uva-1", "2"), _pending("uva-2", "3"),
+                     _pending("uva-3", "4", location=False), _pending("uva-3", "5")]
+
+        documents = _cloud_module.pack_documents(mutations, 3)
+
+        assert [[m.record.sequence_number for m in d] for d in documents] == [["1", "2", "3"], ["4", "5"]]
+
+
+class TestProvisionedDevices:
+    """Duplicate INSERTs of provisioned UVAs short-circuit after one confirmation query."""
+
+    def test_confirmed_device_skips_lookups_and_create(self, uva_to_cloud_env, lambda_context):
+        _cloud_module.provisioned_devices.set("uva-001", True)
+        event = {"Records": [_stream_record("INSERT", new_image=_image())]}
+        resp = _mock_response({"data": {"op0": {"id": "uva-001"}}})
+
+        with patch.object(_cloud_module, "batch_get_items") as batch_get, \
+                patch.object(_cloud_module, "get_linkage_code") as linkage, \
+                patch.object(requests.Session, "post", return_value=resp) as post:
+            response = lambda_handler(event, lambda_context)
+
+        assert response == {"batchItemFailures": []}
+        batch_get.assert_not_called()
+        linkage.assert_not_called()
+        # Only the getDevice confirmation travelled
+        assert post.call_count == 1
+        assert "op0: getDevice(id: $op0_id) { id }" in json.loads(post.call_args.kwargs["data"])["query"]
+
+    def test_created_device_is_remembered(self):
+        resp = _mock_response({"data": {"op0": {"id": "uva-1"}}})
+
+        with patch.object(requests.Session, "post", return_value=resp):
+            _cloud_module.execute_mutations([_pending("uva-1", "1", location=False)], CLOUD_APPSYNC_URL, "k")
+
+        assert _cloud_module.provisioned_devices.peek("uva-1") is True
+
+    def test_duplicate_create_is_not_a_failure(self):
+        resp = _mock_response({
+            "data": {"op0": None},
+            "errors": [{"path": ["op0"], "errorType": "DynamoDB:ConditionalCheckFailedException",
+                        "message": "The conditional request failed"}],
+        })
+
+        with patch.object(requests.Session, "post", return_value=resp):
+            failed = _cloud_module.execute_mutations([_pending("uva-1", "1", location=False)], CLOUD_APPSYNC_URL, "k")
+
+        assert failed == []
+        assert _cloud_module.provisioned_devices.peek("uva-1") is True
+
+
+class TestExecuteMutations:
+    """The mutations of a batch travel in aliased GraphQL documents."""
+
+    def test_batch_is_sent_as_one_aliased_document(self):
+        mutations = [_pending("uva-1", "1", location=False), _pending("uva-1", "2"), _pending("uva-2", "3")]
+        resp = _mock_response({"data": {"op0": {"id": "uva-1"}, "op1": {"id": "Auva-1"}, "op2": {"id": "Auva-2"}}})
+
+        with patch.object(requests.Session, "post", return_value=resp) as post:
+            failed = _cloud_module.execute_mutations(mutations, CLOUD_APPSYNC_URL, "k")
+
+        assert failed == []
+        assert post.call_count == 1
+        payload = json.loads(post.call_args.kwargs["data"])
+        assert "op0: createDevice(input: {" in payload["query"]
+        assert "op2: updateLocation(input: {" in payload["query"]
+        assert payload["variables"]["op1_id"] == "Auva-1"
+        assert payload["variables"]["op0_organizationDevicesId"] == "org-1"
+
+    def test_documents_are_split_by_the_maximum_operation_count(self):
+        mutations = [_pending(f"uva-{i}", str(i)) for i in range(5)]
+        resp = _mock_response({"data": {f"op{i}": {"id": "x"} for i in range(2)}})
+
+        with patch.object(graphql, "MAX_BATCH_OPERATIONS", 2), \
+                patch.object(requests.Session, "post", return_value=resp) as post:
+            _cloud_module.execute_mutations(mutations, CLOUD_APPSYNC_URL, "k")
+
+        assert post.call_count == 3
+
+
+# ---------------------------------------------------------------------------
+# RED TESTS
+# ---------------------------------------------------------------------------
+
+
+class TestParallelProcessingFailures:
+    """An unexpected error in one record is returned for that record only."""
+
+    def test_error_is_isolated_to_its_record(self, uva_to_cloud_env):
+        records = [project_record(_stream_record("INSERT", new_image=_image(f"uva-{i}", f"racimo-{i}"), seq=str(i)))
+                   for i in range(3)]
+
+        def linkage_code(table_name, racimo_id, deadline=None):
+            if racimo_id == "racimo-1":
+                raise RuntimeError("boom")
+            return "LC-1"
+
+        with patch.object(_cloud_module, "get_linkage_code", side_effect=linkage_code), \
+                patch.object(_cloud_module, "get_organization_id", return_value="org-1"):
+            results, mutations = _cloud_module.process_records(records, "RACIMO-test", "Organization-test",
+                                                               "Location-test")
+
+        assert results[0] is None and results[2] is None
+        assert isinstance(results[1], RuntimeError)
+        assert [m.record.sequence_number for m in mutations] == ["0", "2"]
+
+
+class TestHandlerBatchFailures:
+    """The handler returns the sequence numbers of the records that failed."""
+
+    def test_failed_mutations_and_errors_are_reported(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [
+            _stream_record("INSERT", new_image=_image("uva-1", "racimo-1"), seq="1"),
+            _stream_record("INSERT", new_image=_image("uva-2", "racimo-2"), seq="2"),
+            _stream_record("MODIFY", new_image=_image("uva-3", latitude="4", longitude="5"), seq="3"),
+            _stream_record("MODIFY", new_image=_image("uva-4", latitude="4", longitude="5"), seq="4"),
+        ]}
+        resp = _mock_response({
+            "data": {"op0": {"id": "uva-1"}, "op1": {"id": "Auva-3"}, "op2": None},
+            "errors": [{"path": ["op2"], "errorType": "Unauthorized", "message": "denied"}],
+        })
+
+        def linkage_code(table_name, racimo_id, deadline=None):
+            if racimo_id == "racimo-2":
+                raise RuntimeError("boom")
+            return "LC-1"
+
+        with patch.object(_cloud_module, "prefetch_batch", return_value={}), \
+                patch.object(_cloud_module, "get_linkage_code", side_effect=linkage_code), \
+                patch.object(_cloud_module, "get_organization_id", return_value="org-1"), \
+                patch.object(requests.Session, "post", return_value=resp):
+            response = lambda_handler(event, lambda_context)
+
+        assert response == {"batchItemFailures": [{"itemIdentifier": "2"}, {"itemIdentifier": "4"}]}
+
+    def test_successful_batch_reports_no_failures(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [_stream_record("REMOVE", old_image=_image())]}
+
+        assert lambda_handler(event, lambda_context) == {"batchItemFailures": []}
+
+
+class TestInvalidRecordsAreIsolated:
+    """Records whose variables AppSync would reject never enter the aliased document."""
+
+    def test_insert_without_organization_does_not_fail_the_batch(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [
+            _stream_record("INSERT", new_image=_image("uva-1", "racimo-1"), seq="1"),
+            _stream_record("INSERT", new_image=_image("uva-2", "racimo-2"), seq="2"),
+            _stream_record("MODIFY", new_image=_image("uva-3", latitude="4", longitude="5"), seq="3"),
+        ]}
+        resp = _mock_response({"data": {"op0": {"id": "uva-1"}, "op1": {"id": "Auva-3"}}})
+
+        def organization_id(table_name, linkage_code, deadline=None):
+            return None if linkage_code == "LC-racimo-2" else "org-1"
+
+        with patch.object(_cloud_module, "prefetch_batch", return_value={}), \
+                patch.object(_cloud_module, "get_linkage_code", side_effect=lambda t, r, deadline=None: f"LC-{r}"), \
+                patch.object(_cloud_module, "get_organization_id", side_effect=organization_id), \
+                patch.object(requests.Session, "post", return_value=resp) as post:
+            response = lambda_handler(event, lambda_context)
+
+        assert response == {"batchItemFailures": []}
+        body = json.loads(post.call_args.kwargs["data"])
+        assert None not in body["variables"].values()
+        assert "uva-2" not in body["variables"].values()
+        assert body["query"].count("createDevice(") == 1
+
+    def test_non_numeric_coordinates_are_skipped(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [
+            _stream_record("MODIFY", new_image=_image("uva-1", latitude="norte", longitude="5"), seq="1"),
+            _stream_record("MODIFY", new_image=_image("uva-2", latitude="4", longitude="5"), seq="2"),
+        ]}
+        resp = _mock_response({"data": {"op0": {"id": "Auva-2"}}})
+
+        with patch.object(requests.Session, "post", return_value=resp) as post:
+            response = lambda_handler(event, lambda_context)
+
+        assert response == {"batchItemFailures": []}
+        body = json.loads(post.call_args.kwargs["data"])
+        assert "norte" not in body["variables"].values()
+        assert body["query"].count("updateLocation(") == 1
+
+
+class TestHandlerDeadline:
+    """Records not started before the deadline are reported for retry."""
+
+    def test_exhausted_budget_reports_every_record_without_calls(self, uva_to_cloud_env, lambda_context):
+        lambda_context.get_remaining_time_in_millis = lambda: 500  # menos que la reserva
+        event = {"Records": [
+            _stream_record("INSERT", new_image=_image("uva-1", "racimo-1"), seq="1"),
+            _stream_record("MODIFY", new_image=_image("uva-2", latitude="4", longitude="5"), seq="2"),
+        ]}
+
+        with patch.object(_cloud_module, "prefetch_batch", return_value={}), \
+                patch.object(_cloud_module, "get_linkage_code") as linkage_code, \
+                patch.object(requests.Session, "post") as post:
+            response = lambda_handler(event, lambda_context)
+
+        assert response == {"batchItemFailures": [{"itemIdentifier": "1"}, {"itemIdentifier": "2"}]}
+        linkage_code.assert_not_called()
+        post.assert_not_called()
+
+
+class TestProvisionedDevicesNotConfirmed:
+    """A probable hit that AppSync does not confirm goes through the normal INSERT path."""
+
+    def test_deleted_device_is_created_again(self, uva_to_cloud_env, lambda_context):
+        _cloud_module.provisioned_devices.set("uva-001", True)
+        event = {"Records": [_stream_record("INSERT", new_image=_image())]}
+        responses = [_mock_response({"data": {"op0": None}}), _mock_response({"data": {"op0": {"id": "uva-001"}}})]
+
+        with patch.object(_cloud_module, "prefetch_batch", return_value={}), \
+                patch.object(_cloud_module, "get_linkage_code", return_value="LC-1"), \
+                patch.object(_cloud_module, "get_organization_id", return_value="org-1"), \
+                patch.object(requests.Session, "post", side_effect=responses) as post:
+            lambda_handler(event, lambda_context)
+
+        assert "createDevice" in json.loads(post.call_args_list[1].kwargs["data"])["query"]
+        assert _cloud_module.provisioned_devices.peek("uva-001") is True
+
+
+class TestExecuteMutationsFailures:
+    """Errors are mapped back to the stream record whose mutation failed."""
+
+    def test_alias_errors_are_mapped_to_their_records(self):
+        mutations = [_pending("uva-1", "11"), _pending("uva-2", "12"), _pending("uva-3", "13")]
+        resp = _mock_response({
+            "data": {"op0": {"id": "Auva-1"}, "op1": None, "op2": {"id": "Auva-3"}},
+            "errors": [{"path": ["op1"], "errorType": "Unauthorized",
+                        "message": "Not Authorized to access updateLocation"}],
+        })
+
+        with patch.object(requests.Session, "post", return_value=resp):
+            failed = _cloud_module.execute_mutations(mutations, CLOUD_APPSYNC_URL, "k")
+
+        assert [m.record.sequence_number for m in failed] == ["12"]
+
+    def test_http_failure_fails_every_mutation_of_the_document(self):
+        mutations = [_pending("uva-1", "11"), _pending("uva-2", "12")]
+
+        with patch.object(requests.Session, "post", return_value=_mock_response({"message": "bad"}, 400)):
+            failed = _cloud_module.execute_mutations(mutations, CLOUD_APPSYNC_URL, "k")
+
+        assert [m.record.sequence_number for m in failed] == ["11", "12"]
+
+
+class TestGetOrganizationIdNotFound:
+    """Unknown linkage codes resolve to None on both paths."""
+
+    def test_unknown_linkage_code_returns_none(self, dynamodb_tables):
+        _put_organizations(dynamodb_tables.Table("Organization-indexed"), 5)
+        _put_organizations(dynamodb_tables.Table("Organization-plain"), 5)
+
+        assert get_organization_id("Organization-indexed", "LC-404") is None
+        assert get_organization_id("Organization-plain", "LC-404") is None
+
+
+class TestPrefetchBatchFailures:
+    """Keys the batch read could not fetch are looked up record by record."""
+
+    def test_transport_error_falls_back_to_single_reads(self, dynamodb_tables, uva_to_cloud_env, lambda_context):
+        _create_table("RACIMO-test")
+        dynamodb_tables.Table("RACIMO-test").put_item(Item={"id": "racimo-1", "LinkageCode": "LC-1"})
+        event = {"Records": [_stream_record("INSERT", new_image=_image("uva-001", "racimo-1"))]}
+        timeout = ReadTimeoutError(endpoint_url="https://dynamodb.us-east-1.amazonaws.com")
+
+        with patch.object(runtime.get_resource("dynamodb"), "batch_get_item", side_effect=timeout), \
+                patch.object(_cloud_module, "get_organization_id", return_value="org-1") as org, \
+                patch.object(_cloud_module, "execute_mutations", return_value=[]) as execute:
+            response = lambda_handler(event, lambda_context)
+
+        assert response == {"batchItemFailures": []}
+        assert org.call_args.args == ("Organization-test", "LC-1")
+        assert [m.operation.field for m in execute.call_args.args[0]] == ["createDevice"]
+
+
+class TestLookupErrorsAreRetried:
+    """DynamoDB errors fail the record instead of being taken as "not found"."""
+
+    def test_organization_lookup_error_raises_and_is_not_cached(self, dynamodb_tables):
+        with pytest.raises(ClientError):
+            get_organization_id("Organization-missing", "LC-1")
+
+        assert _cloud_module.organization_cache.get("Organization-missing/LC-1") is _cloud_module.MISSING
+
+    def test_lookup_error_reports_only_its_record(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [
+            _stream_record("INSERT", new_image=_image("uva-1", "racimo-1"), seq="1"),
+            _stream_record("INSERT", new_image=_image("uva-2", "racimo-2"), seq="2"),
+        ]}
+        throttled = ClientError({"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "slow"}},
+                                "Query")
+
+        def organization_id(table_name, linkage_code, deadline=None):
+            if linkage_code == "LC-racimo-2":
+                raise throttled
+            return "org-1"
+
+        with patch.object(_cloud_module, "prefetch_batch", return_value={}), \
+                patch.object(_cloud_module, "get_linkage_code", side_effect=lambda t, r, deadline=None: f"LC-{r}"), \
+                patch.object(_cloud_module, "get_organization_id", side_effect=organization_id), \
+                patch.object(requests.Session, "post", return_value=_mock_response({"data": {"op0": {"id": "uva-1"}}})):
+            response = lambda_handler(event, lambda_context)
+
+        assert response == {"batchItemFailures": [{"itemIdentifier": "2"}]}
+
+
+class TestLookupDeadline:
+    """DynamoDB lookups neither start nor keep the caller waiting once the deadline expires."""
+
+    def test_expired_deadline_skips_the_lookups_and_is_not_cached(self, dynamodb_tables):
+        _put_organizations(dynamodb_tables.Table("Organization-plain"), 5)
+        _cloud_module._tables_without_linkage_index.add("Organization-plain")
+        expired = Deadline(0)
+
+        with pytest.raises(DeadlineExceeded):
+            _cloud_module.get_linkage_code("RACIMO-test", "racimo-1", deadline=expired)
+        with pytest.raises(DeadlineExceeded):
+            get_organization_id("Organization-plain", "LC-1", deadline=expired)
+        with pytest.raises(DeadlineExceeded):
+            _cloud_module.get_uva_location("uva-1", "Location-test", expired)
+
+        # An aborted scan is not "no organization"
+        assert _cloud_module.organization_cache.get("Organization-plain/LC-1") is _cloud_module.MISSING
+
+    def test_scan_stops_waiting_for_slow_segments_at_the_deadline(self):
+        release = threading.Event()
+        table = MagicMock()
+        table.scan.side_effect = lambda **kwargs: release.wait(5) and {"Items": []}
+
+        started = time.monotonic()
+        try:
+            with patch.object(_cloud_module.runtime, "get_table", return_value=table), \
+                    pytest.raises(DeadlineExceeded):
+                _cloud_module.scan_organization_id("Organization-plain", "LC-1", total_segments=2,
+                                                   deadline=Deadline(0.2))
+        finally:
+            release.set()
+
+        assert time.monotonic() - started < 1
+
+
+class TestIgnoredEvents:
+    """Records without the data each branch needs make no calls."""
+
+    def test_insert_without_racimo_id_makes_no_lookups(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [_stream_record("INSERT", new_image=_image(racimo_id=None))]}
+
+        with patch.object(_cloud_module, "get_linkage_code") as linkage, \
+                patch.object(_cloud_module, "create_device") as create_device:
+            lambda_handler(event, lambda_context)
+
+        linkage.assert_not_called()
+        create_device.assert_not_called()
+
+    def test_modify_without_coordinates_makes_no_calls(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [_stream_record("MODIFY", new_image=_image(latitude="4.6"))]}
+
+        with patch.object(_cloud_module, "get_uva_location") as get_location, \
+                patch.object(_cloud_module, "update_location") as update_location, \
+                patch.object(_cloud_module, "create_location") as create_location:
+            lambda_handler(event, lambda_context)
+
+        get_location.assert_not_called()
+        update_location.assert_not_called()
+        create_location.assert_not_called()
+
+    def test_remove_event_is_ignored(self, uva_to_cloud_env, lambda_context):
+        event = {"Records": [_stream_record("REMOVE", old_image=_image())]}
+
+        with patch.object(_cloud_module, "get_linkage_code") as linkage, \
+                patch.object(_cloud_module, "get_uva_location") as get_location:
+            lambda_handler(event, lambda_context)
+
+        linkage.assert_not_called()
+        get_location.assert_not_called()